@@ -7,6 +7,7 @@ from datetime import timedelta
 # Importar blueprints
 from auth import auth_bp, db
 from video_routes import video_bp
+from jobs import JobScheduler
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
@@ -16,12 +17,22 @@ CORS(app, supports_credentials=True)
 # =======================
 app.config['UPLOAD_FOLDER'] = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
 app.config['PROCESSED_FOLDER'] = os.path.abspath(os.path.join(os.path.dirname(__file__), 'processed'))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'supersecretkey'
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=2)
 app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024  # 1 GB
 
+# Procesos que analizan videos (0 desactiva el planificador, p. ej. en los tests)
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 1))
+app.config['JOB_MEMORY_RESERVE'] = int(os.environ.get('JOB_MEMORY_RESERVE', 1024 * 1024 * 1024))  # 1 GB
+app.config['JOB_MAX_ATTEMPTS'] = 3
+
+# Backend de inferencia de los workers: torch, onnx u openvino (estos dos en CPU)
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'torch')
+app.config['INFERENCE_INT8'] = os.environ.get('INFERENCE_INT8', '0') == '1'
+app.config['INFERENCE_THREADS'] = int(os.environ.get('INFERENCE_THREADS', 0)) or None
+
 # Crear carpetas si no existen
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
@@ -52,5 +63,26 @@ def uploaded_file(filename):
 with app.app_context():
     db.create_all()
 
+# Iniciar el pool de workers de analisis
+def start_job_scheduler(app):
+    if app.config['JOB_WORKERS'] <= 0 or 'job_scheduler' in app.extensions:
+        return
+    scheduler = JobScheduler(app,
+                             num_workers=app.config['JOB_WORKERS'],
+                             memory_reserve=app.config['JOB_MEMORY_RESERVE'],
+                             max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+                             model_options={'backend': app.config['INFERENCE_BACKEND'],
+                                            'int8': app.config['INFERENCE_INT8'],
+                                            'num_threads': app.config['INFERENCE_THREADS']})
+    scheduler.start()
+    app.extensions['job_scheduler'] = scheduler
+
+# Al importarse (gunicorn) se inicia aqui; con `python app.py` el reloader de debug ejecuta
+# el script en dos procesos y solo el hijo (WERKZEUG_RUN_MAIN) debe tener el pool
+if __name__ != '__main__':
+    start_job_scheduler(app)
+
 if __name__ == '__main__':
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_scheduler(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
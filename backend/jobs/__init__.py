@@ -0,0 +1,5 @@
+from .models import Job, QUEUED, RUNNING, CANCELLING, DONE, FAILED, CANCELLED
+from .memory import estimate_job_memory, get_available_memory, can_admit
+from .job_queue import enqueue_job, get_job, get_job_info, cancel_job
+from .scheduler import JobScheduler
+from .worker import video_analysis_dir
\ No newline at end of file
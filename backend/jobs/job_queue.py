@@ -0,0 +1,168 @@
+import json
+from datetime import timedelta
+from auth.database import db
+from .models import (Job, QUEUED, RUNNING, CANCELLING, DONE, FAILED, CANCELLED, ACTIVE_STATUSES, utcnow)
+
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+
+
+def write_job_status(job, msg, progress=None):
+    """
+    Escribe el archivo de estado que consulta el frontend (el mismo que actualiza process_video).
+    """
+    status = {"step": msg}
+    if progress is not None:
+        status["progress"] = progress
+    with open(job.get_args()["status_path"], "w") as f:
+        json.dump(status, f)
+
+
+def enqueue_job(video_id, username, args, priority=0, memory_bytes=0):
+    """
+    Añade un trabajo a la cola. Los de mayor prioridad se procesan antes y, a igual
+    prioridad, por orden de llegada.
+    """
+    job = Job(video_id=video_id,
+              username=username,
+              args=json.dumps(args),
+              priority=min(max(priority, MIN_PRIORITY), MAX_PRIORITY),
+              memory_bytes=memory_bytes)
+    db.session.add(job)
+    db.session.commit()
+    write_job_status(job, "⏳ En cola", 0)
+    return job
+
+
+def get_job(video_id):
+    return Job.query.filter_by(video_id=video_id).first()
+
+
+def get_next_job():
+    return Job.query.filter_by(status=QUEUED).order_by(Job.priority.desc(), Job.id).first()
+
+
+def get_queue_position(job):
+    """
+    Número de trabajos en cola por delante de `job`.
+    """
+    return Job.query.filter(Job.status == QUEUED,
+                            (Job.priority > job.priority) |
+                            ((Job.priority == job.priority) & (Job.id < job.id))).count()
+
+
+def get_job_info(job):
+    info = {"status": job.status, "priority": job.priority, "attempts": job.attempts}
+    if job.status == QUEUED:
+        info["position"] = get_queue_position(job)
+    if job.error:
+        info["error"] = job.error
+    if job.started_at is not None:
+        info["queue_ms"] = round((job.started_at - job.created_at).total_seconds() * 1000, 1)
+    if job.metrics:
+        info["metrics"] = json.loads(job.metrics)
+    return info
+
+
+def claim_job(job, worker_pid):
+    """
+    Marca el trabajo como en curso si sigue en cola. La actualización es atómica, así que
+    aunque haya varios planificadores (p. ej. varios workers de gunicorn) solo uno lo obtiene.
+    """
+    now = utcnow()
+    claimed = Job.query.filter_by(id=job.id, status=QUEUED).update({
+        "status": RUNNING,
+        "attempts": Job.attempts + 1,
+        "worker_pid": worker_pid,
+        "started_at": now,
+        "heartbeat_at": now,
+    })
+    db.session.commit()
+    return claimed == 1
+
+
+def touch_jobs(job_ids):
+    """
+    Renueva el latido de los trabajos en curso de este planificador.
+    """
+    if job_ids:
+        Job.query.filter(Job.id.in_(job_ids)).update({"heartbeat_at": utcnow()})
+        db.session.commit()
+
+
+def finish_job(job_id, error=None, metrics=None):
+    """
+    Registra el resultado de un trabajo terminado y sus métricas. Si estaba cancelándose
+    pero llegó a terminar se conserva el resultado.
+    """
+    job = db.session.get(Job, job_id)
+    job.status = FAILED if error else DONE
+    job.error = error
+    job.metrics = json.dumps(metrics) if metrics is not None else None
+    job.finished_at = utcnow()
+    db.session.commit()
+    if error:
+        write_job_status(job, f"❌ Error: {error}")
+
+
+def requeue_job(job, error, max_attempts, count_attempt=True):
+    """
+    Devuelve a la cola un trabajo interrumpido (worker caído, planificador detenido...),
+    o lo da por fallido si ya ha agotado sus `max_attempts` intentos.
+    """
+    if not count_attempt:
+        job.attempts = max(job.attempts - 1, 0)
+    job.error = error
+    job.worker_pid = None
+
+    if job.attempts >= max_attempts:
+        job.status = FAILED
+        job.finished_at = utcnow()
+        db.session.commit()
+        write_job_status(job, f"❌ Error: {error}")
+        return
+
+    job.status = QUEUED
+    db.session.commit()
+    write_job_status(job, f"⏳ En cola (reintento {job.attempts + 1} de {max_attempts})", 0)
+
+
+def cancel_job(job):
+    """
+    Cancela un trabajo. Los que están en cola se cancelan directamente; los que están en
+    curso pasan a CANCELLING y el planificador detiene su worker.
+    Devuelve False si el trabajo ya había terminado.
+    """
+    if job.status == QUEUED:
+        mark_cancelled(job)
+        return True
+    if job.status == RUNNING:
+        job.status = CANCELLING
+        db.session.commit()
+        write_job_status(job, "🛑 Cancelando...")
+        return True
+    return job.status == CANCELLING
+
+
+def mark_cancelled(job):
+    job.status = CANCELLED
+    job.worker_pid = None
+    job.finished_at = utcnow()
+    db.session.commit()
+    write_job_status(job, "🚫 Cancelado")
+
+
+def requeue_stale_jobs(stale_timeout, max_attempts):
+    """
+    Recupera los trabajos en curso cuyo planificador dejó de renovar el latido hace más de
+    `stale_timeout` segundos (p. ej. la API se reinició o murió): vuelven a la cola, o se
+    cancelan si se estaban cancelando. Devuelve cuántos se han recuperado.
+    """
+    limit = utcnow() - timedelta(seconds=stale_timeout)
+    stale_jobs = Job.query.filter(Job.status.in_(ACTIVE_STATUSES), Job.heartbeat_at < limit).all()
+    for job in stale_jobs:
+        if job.status == CANCELLING:
+            mark_cancelled(job)
+        else:
+            requeue_job(job, "El análisis se interrumpió", max_attempts)
+    return len(stale_jobs)
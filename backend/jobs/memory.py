@@ -0,0 +1,53 @@
+import cv2
+
+# Memoria de un worker sin video: intérprete, PyTorch y los dos modelos YOLO
+JOB_BASE_MEMORY = 1536 * 1024 ** 2
+# En el modo por lotes se guardan todos los frames decodificados y los dibujados
+FRAME_COPIES = 2
+# Memoria que se deja siempre libre para la API y el sistema
+DEFAULT_MEMORY_RESERVE = 1024 ** 3
+
+
+def get_available_memory():
+    """
+    Memoria disponible en bytes según /proc/meminfo (MemAvailable), o None si no se puede leer.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def estimate_job_memory(video_path):
+    """
+    Estimación de la memoria máxima que necesita procesar un video con process_video.
+    """
+    vc = cv2.VideoCapture(video_path)
+    try:
+        num_frames = max(int(vc.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        width = int(vc.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(vc.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        vc.release()
+    return JOB_BASE_MEMORY + num_frames * width * height * 3 * FRAME_COPIES
+
+
+def can_admit(memory_bytes, reserved_bytes, memory_reserve=DEFAULT_MEMORY_RESERVE, available=None):
+    """
+    Decide si un trabajo que necesita `memory_bytes` puede empezar cuando los trabajos en curso
+    tienen reservados `reserved_bytes`. Se descuenta la estimación completa de los trabajos en
+    curso aunque ya hayan ocupado parte de ella: es conservador a propósito, porque en el modo
+    por lotes la memoria crece durante todo el análisis.
+    Si no hay ningún trabajo en curso siempre se admite, para que la cola no se bloquee.
+    """
+    if reserved_bytes == 0:
+        return True
+    if available is None:
+        available = get_available_memory()
+    if available is None:
+        return True
+    return available - reserved_bytes - memory_reserve >= memory_bytes
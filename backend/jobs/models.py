@@ -0,0 +1,40 @@
+import json
+from datetime import datetime, timezone
+from auth.database import db
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (RUNNING, CANCELLING)
+FINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+def utcnow():
+    # SQLite guarda las fechas sin zona horaria
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(16), unique=True, nullable=False)
+    username = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=QUEUED, index=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    args = db.Column(db.Text, nullable=False)  # argumentos de process_video en JSON
+    memory_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker_pid = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    metrics = db.Column(db.Text)  # tiempos del trabajo en el worker, en JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def get_args(self):
+        return json.loads(self.args)
@@ -0,0 +1,209 @@
+import atexit
+import multiprocessing
+import threading
+from auth.database import db
+from .models import Job, CANCELLING
+from .memory import can_admit, DEFAULT_MEMORY_RESERVE
+from .job_queue import (get_next_job, claim_job, touch_jobs, finish_job, requeue_job, mark_cancelled,
+                        requeue_stale_jobs, write_job_status)
+from .worker import run_worker
+
+
+class WorkerHandle:
+    """
+    Proceso de trabajo del pool, su conexión, el trabajo que está procesando (si hay alguno)
+    y sus tiempos de arranque (None hasta que ha cargado los modelos).
+    """
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job_id = None
+        self.memory_bytes = 0
+        self.startup = None
+        self.jobs_done = 0
+
+    @property
+    def busy(self):
+        return self.job_id is not None
+
+
+class JobScheduler:
+    """
+    Planificador de los trabajos de análisis guardados en la base de datos (ver job_queue).
+
+    Mantiene un pool acotado de `num_workers` procesos, cada uno con su propia copia de los
+    modelos, y un hilo que cada `poll_interval` segundos:
+    - recoge los resultados de los workers y los guarda en la base de datos,
+    - sustituye los workers caídos y devuelve su trabajo a la cola (hasta `max_attempts`
+      intentos por trabajo),
+    - detiene los workers de los trabajos cancelados,
+    - renueva el latido de sus trabajos y recupera los de planificadores que dejaron de
+      renovarlo hace más de `stale_timeout` segundos (p. ej. tras reiniciar la API),
+    - asigna los siguientes trabajos de la cola, por prioridad, a los workers libres mientras
+      la memoria disponible (menos `memory_reserve`) alcance para ellos (ver can_admit).
+
+    `model_options` (backend, int8, num_threads) se pasa a get_model_registry en cada worker.
+
+    Cada worker es un proceso independiente que carga los modelos una vez al arrancar y
+    los reutiliza en todos sus trabajos: si lo mata el sistema por falta de memoria, la API
+    sigue funcionando y el trabajo se reintenta. `get_stats()` resume el estado del pool.
+    """
+    def __init__(self, app, num_workers=1, memory_reserve=DEFAULT_MEMORY_RESERVE, max_attempts=3,
+                 stale_timeout=120, poll_interval=1.0, model_options=None, worker_target=run_worker):
+        if num_workers < 1:
+            raise ValueError("El pool necesita al menos un worker.")
+
+        self.app = app
+        self.num_workers = num_workers
+        self.memory_reserve = memory_reserve
+        self.max_attempts = max_attempts
+        self.stale_timeout = stale_timeout
+        self.poll_interval = poll_interval
+        self.model_options = model_options or {}
+        self.worker_target = worker_target
+
+        # spawn: los workers no heredan los hilos ni las conexiones de la API
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        self.workers = [self.spawn_worker() for _ in range(self.num_workers)]
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="job-scheduler", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """
+        Detiene el planificador y los workers. Los trabajos en curso vuelven a la cola sin
+        contar el intento, para que los retome la siguiente instancia.
+        """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+        with self.app.app_context():
+            for worker in self.workers:
+                if worker.busy:
+                    self.terminate_worker(worker)
+                    requeue_job(db.session.get(Job, worker.job_id), None, self.max_attempts, count_attempt=False)
+                else:
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+                    worker.process.join(timeout)
+                    worker.conn.close()
+        self.workers = []
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.step()
+            except Exception as e:
+                print(f"❌ Error en el planificador de trabajos: {e}")
+            self.stopping.wait(self.poll_interval)
+
+    def step(self):
+        """
+        Una iteración del planificador (el hilo la repite cada `poll_interval` segundos).
+        """
+        self.collect_results()
+        self.check_workers()
+        self.check_cancellations()
+        touch_jobs([worker.job_id for worker in self.workers if worker.busy])
+        requeue_stale_jobs(self.stale_timeout, self.max_attempts)
+        self.admit_jobs()
+
+    # =======================
+    # WORKERS
+    # =======================
+    def spawn_worker(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=self.worker_target, args=(child_conn, self.model_options),
+                                       name="video-worker")
+        process.start()
+        child_conn.close()
+        return WorkerHandle(process, parent_conn)
+
+    def terminate_worker(self, worker):
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join()
+        worker.conn.close()
+
+    def replace_worker(self, worker):
+        self.terminate_worker(worker)
+        self.workers[self.workers.index(worker)] = self.spawn_worker()
+
+    def collect_results(self):
+        for worker in self.workers:
+            try:
+                while worker.conn.poll():
+                    self.handle_message(worker, worker.conn.recv())
+            except (EOFError, OSError):
+                continue  # el worker ha caído: lo gestiona check_workers
+
+    def handle_message(self, worker, message):
+        if message[0] == "ready":
+            worker.startup = message[1]
+            return
+
+        _, job_id, error, metrics = message
+        finish_job(job_id, error, metrics)
+        worker.job_id = None
+        worker.memory_bytes = 0
+        worker.jobs_done += 1
+
+    def get_stats(self):
+        return [{"pid": worker.process.pid,
+                 "alive": worker.process.is_alive(),
+                 "busy": worker.busy,
+                 "jobs_done": worker.jobs_done,
+                 "startup": worker.startup}
+                for worker in self.workers]
+
+    def check_workers(self):
+        for worker in list(self.workers):
+            if worker.process.is_alive():
+                continue
+            if worker.busy:
+                job = db.session.get(Job, worker.job_id)
+                if job.status == CANCELLING:
+                    mark_cancelled(job)
+                else:
+                    requeue_job(job, f"El proceso de análisis terminó inesperadamente (código {worker.process.exitcode})",
+                                self.max_attempts)
+            self.replace_worker(worker)
+
+    def check_cancellations(self):
+        running = {worker.job_id: worker for worker in self.workers if worker.busy}
+        if not running:
+            return
+        for job in Job.query.filter(Job.id.in_(running), Job.status == CANCELLING).all():
+            self.replace_worker(running[job.id])
+            mark_cancelled(job)
+
+    def admit_jobs(self):
+        for worker in self.workers:
+            if worker.busy or not worker.process.is_alive():
+                continue
+
+            job = get_next_job()
+            if job is None:
+                return
+            # Orden estricto de prioridad: si el primero no cabe en memoria, se espera
+            reserved = sum(other.memory_bytes for other in self.workers if other.busy)
+            if not can_admit(job.memory_bytes, reserved, self.memory_reserve):
+                return
+            if not claim_job(job, worker.process.pid):
+                continue  # lo ha obtenido otro planificador
+
+            worker.job_id = job.id
+            worker.memory_bytes = job.memory_bytes
+            write_job_status(job, "⚙️ Procesando...", 0)
+            worker.conn.send((job.id, job.get_args()))
@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import sys
+import time
+
+# Carpeta del análisis de video (`video_analysis/main.py`)
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+video_analysis_dir = os.path.join(root_dir, 'video_analysis')
+
+
+def load_main():
+    """
+    Carga `main.py` desde `video_analysis`. Solo se hace en los procesos de trabajo: la API
+    no necesita importar PyTorch ni los modelos.
+    """
+    if video_analysis_dir not in sys.path:
+        sys.path.append(video_analysis_dir)
+    spec = importlib.util.spec_from_file_location("main", os.path.join(video_analysis_dir, 'main.py'))
+    main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+    return main
+
+
+def run_worker(conn, model_options=None):
+    """
+    Bucle de un proceso de trabajo. Al arrancar carga y calienta los modelos una sola vez
+    (ModelRegistry, con el backend y los hilos de `model_options`) y envía ("ready", tiempos
+    de arranque). Después recibe (job_id, argumentos
+    de process_video) por `conn`, procesa el video con esos mismos modelos y responde
+    ("result", job_id, error o None, métricas del trabajo). Termina al recibir None o al
+    cerrarse la conexión (el planificador se ha detenido).
+    """
+    start = time.perf_counter()
+    main = load_main()
+    registry = main.get_model_registry(main.TRACKER_MODEL_PATH, main.KEYPOINT_MODEL_PATH, **(model_options or {}))
+    stats = registry.load()
+    stats["startup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    conn.send(("ready", stats))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        job_id, args = task
+        error = None
+        try:
+            main.process_video(**args, model_registry=registry)
+        except Exception as e:
+            error = str(e)
+        conn.send(("result", job_id, error, registry.get_stats()["last_job"]))
@@ -2,6 +2,9 @@ import pytest
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + "/.."))
+# Los tests usan una base de datos en memoria y no arrancan los workers de analisis
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
 
 from app import app, db
 @pytest.fixture
@@ -0,0 +1,67 @@
+import sys
+from types import SimpleNamespace
+import numpy as np
+from jobs import video_analysis_dir
+
+if video_analysis_dir not in sys.path:
+    sys.path.append(video_analysis_dir)
+
+from trackers import BallTracker
+from trackers.tracker import Tracker
+from pipeline.streaming import StreamingPipeline
+
+
+def make_candidates(num_frames=60, missing=(5, 6, 7, 12, 13, 14, 15, 26, 27, 40)):
+    # Balón en línea recta, con huecos que cruzan los límites de los bloques de 7 frames
+    # y un falso positivo lejos del balón cada 9 frames
+    candidates = []
+    for frame_idx in range(num_frames):
+        boxes, confidence = [], []
+        if frame_idx not in missing:
+            x, y = 100 + 4 * frame_idx, 300 - 2 * frame_idx
+            boxes.append([x, y, x + 10, y + 10])
+            confidence.append(0.8)
+        if frame_idx % 9 == 0:
+            boxes.append([900, 50, 910, 60])
+            confidence.append(0.9)
+        candidates.append((np.array(boxes, dtype=np.float32).reshape(-1, 4), np.array(confidence, dtype=np.float32)))
+    return candidates
+
+
+class FakeTracker:
+    # Solo el balón: cada bloque de "frames" son los índices de sus candidatos
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.ball_tracker = BallTracker()
+
+    def get_object_tracks(self, frames, detections=None):
+        ball_boxes, _ = self.ball_tracker.track([self.candidates[frame_idx] for frame_idx in frames])
+        empty = [{} for _ in frames]
+        return {"players": empty, "referees": empty, "net": empty, "ball": self.get_ball_tracks(ball_boxes)}
+
+    get_ball_tracks = staticmethod(Tracker.get_ball_tracks)
+
+
+def test_streaming_ball_boxes_match_batch():
+    candidates = make_candidates()
+    batch_tracker = BallTracker()
+    batch_boxes, _ = batch_tracker.track(candidates)
+    expected = Tracker.get_ball_tracks(batch_boxes)
+
+    keypoint_detector = SimpleNamespace(get_court_keypoints=lambda frames, detections: [None] * len(frames))
+    pipeline = SimpleNamespace(tracker=FakeTracker(candidates), inference=None, court_keypoint_detector=keypoint_detector,
+                               tracks={"players": [], "referees": [], "ball": [], "net": []}, court_keypoints=[])
+    chunks = ((start, list(range(start, min(start + 7, len(candidates))))) for start in range(0, len(candidates), 7))
+
+    rendered = []
+    for start, frames in StreamingPipeline.detection_stage(pipeline, chunks):
+        assert frames == list(range(start, start + len(frames)))
+        # Lo que se entrega a las etapas siguientes ya tiene los huecos rellenados
+        rendered += pipeline.tracks["ball"][start:start + len(frames)]
+
+    assert rendered == expected
+    assert pipeline.tracks["ball"] == expected
+
+    stream_tracker = pipeline.tracker.ball_tracker
+    np.testing.assert_array_equal(stream_tracker.get_trajectory()["boxes"], batch_tracker.get_trajectory()["boxes"])
+    assert stream_tracker.get_stats() == batch_tracker.get_stats()
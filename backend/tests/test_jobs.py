@@ -0,0 +1,148 @@
+import io
+import os
+import time
+import uuid
+import pytest
+from app import app, db
+from jobs import JobScheduler, enqueue_job, cancel_job, get_job_info, can_admit, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from jobs.job_queue import get_next_job, MIN_PRIORITY, MAX_PRIORITY
+import video_routes.video_routes as video_routes
+
+
+# Workers de prueba (se ejecutan en procesos aparte, sin modelos)
+def finishing_worker(conn, model_options):
+    conn.send(("ready", {"load_ms": 1.0, "warmup_ms": 2.0}))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(("result", task[0], None, {"job_ms": 3.0, "cold_start": False}))
+
+
+def crashing_worker(conn, model_options):
+    conn.recv()
+    os._exit(1)
+
+
+def sleeping_worker(conn, model_options):
+    conn.recv()
+    time.sleep(60)
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_routes, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(video_routes, "PROCESSED_FOLDER", str(tmp_path / "processed"))
+    os.makedirs(video_routes.UPLOAD_FOLDER)
+    return tmp_path
+
+
+def get_token(client):
+    username = f"user_{uuid.uuid4().hex[:8]}"
+    client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": "123456"})
+    return client.post("/auth/login", json={"username": username, "password": "123456"}).json["token"]
+
+
+def add_job(tmp_path, priority=0):
+    video_id = uuid.uuid4().hex[:8]
+    return enqueue_job(video_id, "tester", {"status_path": str(tmp_path / f"status_{video_id}.json")}, priority=priority)
+
+
+def run_until(scheduler, job, statuses, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        scheduler.step()
+        db.session.refresh(job)
+        if job.status in statuses:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo sigue en estado {job.status}")
+
+
+def test_upload_enqueues_job_and_cancel(client, folders):
+    headers = {"Authorization": f"Bearer {get_token(client)}"}
+    response = client.post("/video/upload", headers=headers,
+                           data={"file": (io.BytesIO(b"video"), "partido.mp4"), "priority": "5"})
+    assert response.status_code == 200
+    # La prioridad enviada por el cliente se ignora
+    assert response.json["job"] == {"status": QUEUED, "priority": 0, "attempts": 0, "position": 0}
+
+    video_id = response.json["video_id"]
+    status = client.get(f"/video/status/{video_id}").json
+    assert status["job"]["status"] == QUEUED
+
+    other_headers = {"Authorization": f"Bearer {get_token(client)}"}
+    assert client.post(f"/video/cancel/{video_id}", headers=other_headers).status_code == 403
+
+    response = client.post(f"/video/cancel/{video_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json["job"]["status"] == CANCELLED
+    assert client.post(f"/video/cancel/{video_id}", headers=headers).status_code == 409
+
+
+def test_jobs_ordered_by_priority(client, tmp_path):
+    with app.app_context():
+        low = add_job(tmp_path, priority=0)
+        high = add_job(tmp_path, priority=3)
+        assert get_next_job().id == high.id
+        cancel_job(high)
+        assert get_next_job().id == low.id
+        cancel_job(low)
+
+
+def test_priority_clamped(client, tmp_path):
+    with app.app_context():
+        high = add_job(tmp_path, priority=1000)
+        low = add_job(tmp_path, priority=-1000)
+        assert (high.priority, low.priority) == (MAX_PRIORITY, MIN_PRIORITY)
+        cancel_job(high)
+        cancel_job(low)
+
+
+def test_memory_admission():
+    gb = 1024 ** 3
+    assert can_admit(4 * gb, 0, gb, available=gb)  # sin trabajos en curso siempre se admite
+    assert can_admit(2 * gb, 3 * gb, gb, available=8 * gb)
+    assert not can_admit(5 * gb, 3 * gb, gb, available=8 * gb)
+
+
+def test_scheduler_runs_job(client, tmp_path):
+    with app.app_context():
+        job = add_job(tmp_path)
+        scheduler = JobScheduler(app, worker_target=finishing_worker)
+        scheduler.workers = [scheduler.spawn_worker()]
+        try:
+            run_until(scheduler, job, (DONE,))
+            assert job.attempts == 1
+            assert get_job_info(job)["metrics"] == {"job_ms": 3.0, "cold_start": False}
+            assert scheduler.get_stats()[0]["startup"] == {"load_ms": 1.0, "warmup_ms": 2.0}
+            assert scheduler.get_stats()[0]["jobs_done"] == 1
+        finally:
+            scheduler.stop()
+
+
+def test_scheduler_requeues_crashed_job(client, tmp_path):
+    with app.app_context():
+        job = add_job(tmp_path)
+        scheduler = JobScheduler(app, max_attempts=2, worker_target=crashing_worker)
+        scheduler.workers = [scheduler.spawn_worker()]
+        try:
+            run_until(scheduler, job, (FAILED,))
+            assert job.attempts == 2
+            assert "inesperadamente" in job.error
+        finally:
+            scheduler.stop()
+
+
+def test_scheduler_cancels_running_job(client, tmp_path):
+    with app.app_context():
+        job = add_job(tmp_path)
+        scheduler = JobScheduler(app, worker_target=sleeping_worker)
+        scheduler.workers = [scheduler.spawn_worker()]
+        try:
+            run_until(scheduler, job, ("running",))
+            cancel_job(job)
+            run_until(scheduler, job, (CANCELLED,))
+            assert all(worker.process.is_alive() for worker in scheduler.workers)
+        finally:
+            scheduler.stop()
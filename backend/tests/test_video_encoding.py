@@ -0,0 +1,21 @@
+import os
+import sys
+import numpy as np
+from jobs import video_analysis_dir
+
+if video_analysis_dir not in sys.path:
+    sys.path.append(video_analysis_dir)
+
+from utils.video_utils import save_video, get_metadata
+
+
+def test_save_video_pads_odd_sized_frames(tmp_path):
+    # yuv420p necesita dimensiones pares: 201x101 se rellena hasta 202x102
+    output_path = str(tmp_path / "odd.mp4")
+    frames = [np.full((101, 201, 3), i * 20, dtype=np.uint8) for i in range(5)]
+
+    save_video(frames, output_path, fps=10)
+
+    metadata = get_metadata(output_path)
+    assert (metadata.width, metadata.height) == (202, 102)
+    assert metadata.num_frames == 5
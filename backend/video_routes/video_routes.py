@@ -1,27 +1,16 @@
 import os
 import re
-import importlib.util
-import sys
-from flask import Blueprint, request, jsonify, send_file, Response
+from flask import Blueprint, request, jsonify, send_file, Response, current_app
 from werkzeug.utils import secure_filename
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 import uuid
 import json
-from threading import Thread
+from jobs import enqueue_job, get_job, get_job_info, cancel_job, estimate_job_memory, video_analysis_dir
 
 
 video_bp = Blueprint('video', __name__)
 
-# Ajustar el directorio raíz y cargar `main.py` desde `video_analysis`
-root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
-video_analysis_dir = os.path.join(root_dir, 'video_analysis')
-sys.path.append(video_analysis_dir)
-
-main_file_path = os.path.join(video_analysis_dir, 'main.py')
-spec = importlib.util.spec_from_file_location("main", main_file_path)
-main = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(main)
-process_video = main.process_video
+# Los videos los procesan los workers del JobScheduler (ver `jobs`), no la API
 
 UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../uploads'))
 PROCESSED_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../processed'))
@@ -59,24 +48,48 @@ def upload_file():
 
     file.save(input_path)
 
-    # Crear el archivo de estado inicial
-    with open(status_path, "w") as f:
-        json.dump({"step": "Procesando...", "progress": 0}, f)
-
-    # Ejecutar en segundo plano
-    def background_task():
-        try:
-            process_video(input_path, output_video_path, court_image_path, shot_court_image_path, status_path, events_path)
-        except Exception as e:
-            with open(status_path, "w") as f:
-                json.dump({"step": f"❌ Error: {str(e)}"}, f)
-
-    Thread(target=background_task).start()
+    # Encolar el análisis (crea el archivo de estado inicial). La prioridad la decide el
+    # servidor: no se acepta la que envía el cliente
+    job = enqueue_job(video_id, get_jwt_identity(), {
+        "input_video": input_path,
+        "output_video": output_video_path,
+        "court_image_path": court_image_path,
+        "shot_court_image_path": shot_court_image_path,
+        "status_path": status_path,
+        "events_path": events_path,
+    }, memory_bytes=estimate_job_memory(input_path))
 
     return jsonify({
         'video_id': video_id,
-        'processed_file': f"/video/download/{video_id}/{os.path.basename(output_video_path)}"
+        'processed_file': f"/video/download/{video_id}/{os.path.basename(output_video_path)}",
+        'job': get_job_info(job)
     })
+
+# =======================
+# CANCELAR UN PROCESAMIENTO
+# =======================
+@video_bp.route('/cancel/<video_id>', methods=['POST'])
+@jwt_required()
+def cancel_processing(video_id):
+    job = get_job(video_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    if job.username != get_jwt_identity():
+        return jsonify({'error': 'No autorizado'}), 403
+    if not cancel_job(job):
+        return jsonify({'error': 'El procesamiento ya ha terminado', 'job': get_job_info(job)}), 409
+
+    return jsonify({'video_id': video_id, 'job': get_job_info(job)})
+
+# =======================
+# ESTADO DE LOS WORKERS
+# =======================
+@video_bp.route('/workers', methods=['GET'])
+@jwt_required()
+def get_workers():
+    scheduler = current_app.extensions.get('job_scheduler')
+    return jsonify({'workers': scheduler.get_stats() if scheduler is not None else []})
+
 @video_bp.route('/download/<video_id>/<filename>', methods=['GET'])
 @jwt_required()
 def download_file(video_id, filename):
@@ -136,6 +149,9 @@ def get_status(video_id):
     try:
         with open(status_path) as f:
             data = json.load(f)
+        job = get_job(video_id)
+        if job is not None:
+            data["job"] = get_job_info(job)
         return jsonify(data)
     except Exception as e:
         return jsonify({"step": "❌ Error al leer estado"}), 500
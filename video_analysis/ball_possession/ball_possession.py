@@ -1,6 +1,6 @@
 import sys
 sys.path.append('../')
-from utils import measure_distance, get_center_of_bbox, get_key_points
+from utils import measure_distance, get_center_of_bbox, get_key_points, TrackFrames, get_ball_boxes
 import cv2 
 import numpy as np
 import supervision as sv
@@ -11,6 +11,8 @@ class BallPossession:
         self.min_frames = 4
         self.containment_threshold = 0.8
         self.possession_retention = 3
+        self.layout_cache = {}
+        self.reset()
 
     def get_ball_containment_ratio(self, player_bbox, ball_bbox):
         px1, py1, px2, py2 = player_bbox
@@ -53,44 +55,170 @@ class BallPossession:
 
         return -1, float('inf')
 
-    def detect_ball_possession(self, player_tracks, ball_tracks):
-        total_frames = len(ball_tracks)
-        possession_list = [-1] * total_frames
-        consecutive_possession_count = {}
-        last_possessor = -1
-        retention_counter = 0
-
-        for frame_num in range(total_frames):
-            ball_info = ball_tracks[frame_num].get(1, {})
-            if not ball_info:
-                continue
-            ball_bbox = ball_info.get('bbox', [])
-            if not ball_bbox:
-                continue
-            ball_center = get_center_of_bbox(ball_bbox)
+    def get_possession_arrays(self, player_tracks, ball_tracks):
+        """
+        Pasa las pistas de varios frames a un formato denso y rellenado:
+        ids (F, P), cajas de jugadores (F, P, 4), máscara de jugadores válidos (F, P),
+        caja del balón (F, 4) y máscara de frames con balón (F,).
+        Los jugadores conservan el orden del diccionario de cada frame.
+        Con las vistas de un TrackStore los arrays se obtienen directamente de la tabla.
+        """
+        if (isinstance(player_tracks, TrackFrames) and isinstance(ball_tracks, TrackFrames)
+                and player_tracks.store is ball_tracks.store):
+            store = player_tracks.store
+            player_ids, player_boxes, player_valid = store.dense_boxes(player_tracks.class_name)
+            ball_boxes, has_ball = store.track_boxes(ball_tracks.class_name, 1)
+            return player_ids, player_boxes, player_valid, ball_boxes, has_ball
 
-            best_player_id, min_distance = self.find_best_candidate(
-                ball_center,
-                player_tracks[frame_num],
-                ball_bbox
-            )
+        num_frames = len(ball_tracks)
+        max_players = max((len(player_tracks[f]) for f in range(num_frames)), default=0)
+
+        player_ids = np.full((num_frames, max_players), -1, dtype=np.int64)
+        player_boxes = np.zeros((num_frames, max_players, 4), dtype=np.float64)
+        player_valid = np.zeros((num_frames, max_players), dtype=bool)
+        ball_boxes, has_ball = get_ball_boxes(ball_tracks)
+
+        for frame_num in range(num_frames):
+            for slot, (player_id, player_info) in enumerate(player_tracks[frame_num].items()):
+                player_bbox = player_info.get('bbox', [])
+                if not player_bbox:
+                    continue
+                player_ids[frame_num, slot] = player_id
+                player_boxes[frame_num, slot] = player_bbox
+                player_valid[frame_num, slot] = True
+
+        return player_ids, player_boxes, player_valid, ball_boxes, has_ball
+
+    def find_best_candidates(self, player_ids, player_boxes, player_valid, ball_boxes):
+        """
+        Versión vectorizada de find_best_candidate para todos los frames a la vez.
+        Devuelve (ids (F,), distancias (F,)), con (-1, inf) cuando no hay candidato.
+        """
+        num_frames = len(ball_boxes)
+        if player_boxes.shape[1] == 0:
+            return np.full(num_frames, -1, dtype=np.int64), np.full(num_frames, np.inf)
+
+        px1, py1, px2, py2 = np.moveaxis(player_boxes, -1, 0)
+        bx1, by1, bx2, by2 = (ball_boxes[:, i, None] for i in range(4))
+
+        # Ratio de la caja del balón contenida en la de cada jugador
+        ix1 = np.maximum(px1, bx1)
+        iy1 = np.maximum(py1, by1)
+        ix2 = np.minimum(px2, bx2)
+        iy2 = np.minimum(py2, by2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            containment = np.where((ix2 < ix1) | (iy2 < iy1), 0.0,
+                                   (ix2 - ix1) * (iy2 - iy1) / ((bx2 - bx1) * (by2 - by1)))
+
+        # Los mismos 10 puntos que get_key_points, para todos los jugadores: (F, P, 10)
+        width = px2 - px1
+        height = py2 - py1
+        center_x = px1 + width // 2
+        center_y = py1 + height // 2
+        key_x = np.stack([center_x, px2, px1, px2, px1, center_x, px2, px1, center_x, center_x], axis=-1)
+        key_y = np.stack([py1, py1, py1, center_y, center_y, center_y, py2, py2, py2, py1 + height // 3], axis=-1)
+
+        ball_x = np.trunc((ball_boxes[:, 0] + ball_boxes[:, 2]) / 2)[:, None, None]
+        ball_y = np.trunc((ball_boxes[:, 1] + ball_boxes[:, 3]) / 2)[:, None, None]
+        distance = np.sqrt((ball_x - key_x) ** 2 + (ball_y - key_y) ** 2).min(axis=-1)
+
+        high = player_valid & (containment > self.containment_threshold)
+        has_high = high.any(axis=1)
+        candidates = np.where(has_high[:, None], high, player_valid)
+
+        # argmin devuelve el primero en caso de empate, igual que min() sobre el diccionario
+        masked_distance = np.where(candidates, distance, np.inf)
+        best_slot = masked_distance.argmin(axis=1)
+        frames = np.arange(num_frames)
+        best_ids = player_ids[frames, best_slot]
+        best_distance = masked_distance[frames, best_slot]
+
+        accepted = has_high | (best_distance < self.possession_threshold)
+        accepted &= candidates.any(axis=1)
+        best_ids = np.where(accepted, best_ids, -1)
+        best_distance = np.where(accepted, best_distance, np.inf)
+        return best_ids, best_distance
 
-            if best_player_id != -1 and min_distance < self.possession_threshold:
-                count = consecutive_possession_count.get(best_player_id, 0) + 1
-                consecutive_possession_count = {best_player_id: count}
-                if count >= self.min_frames:
-                    possession_list[frame_num] = best_player_id
+    def apply_hysteresis(self, best_ids, best_distances, has_ball=None):
+        """
+        Aplica min_frames y possession_retention a los candidatos (listas) de frames consecutivos.
+        Los frames sin balón devuelven -1 y no modifican el estado.
+        """
+        threshold = self.possession_threshold
+        min_frames = self.min_frames
+        retention = self.possession_retention
+        candidate, count = next(iter(self.consecutive_possession_count.items()), (-1, 0))
+        last_possessor = self.last_possessor
+        retention_counter = self.retention_counter
+
+        if has_ball is None:
+            has_ball = [True] * len(best_ids)
+
+        possession = []
+        for best_player_id, min_distance, ball_present in zip(best_ids, best_distances, has_ball):
+            possessor = -1
+            if not ball_present:
+                pass
+            elif best_player_id != -1 and min_distance < threshold:
+                count = count + 1 if candidate == best_player_id else 1
+                candidate = best_player_id
+                if count >= min_frames:
+                    possessor = best_player_id
                     last_possessor = best_player_id
-                    retention_counter = self.possession_retention
+                    retention_counter = retention
+            elif retention_counter > 0:
+                possessor = last_possessor
+                retention_counter -= 1
             else:
-                if retention_counter > 0:
-                    possession_list[frame_num] = last_possessor
-                    retention_counter -= 1
-                else:
-                    last_possessor = -1
-                    consecutive_possession_count.clear()
+                last_possessor = -1
+                candidate, count = -1, 0
+            possession.append(possessor)
+
+        self.consecutive_possession_count = {candidate: count} if candidate != -1 else {}
+        self.last_possessor = last_possessor
+        self.retention_counter = retention_counter
+        return possession
+
+    def reset(self):
+        """
+        Reinicia el estado de la histéresis de posesión.
+        """
+        self.consecutive_possession_count = {}
+        self.last_possessor = -1
+        self.retention_counter = 0
+
+    def update(self, player_tracks_frame, ball_track_frame):
+        """
+        Procesa un único frame y devuelve el id del jugador con el balón (-1 si nadie).
+        Mantiene el estado entre llamadas, por lo que los frames deben llegar en orden.
+        """
+        ball_info = ball_track_frame.get(1, {})
+        if not ball_info:
+            return -1
+        ball_bbox = ball_info.get('bbox', [])
+        if not ball_bbox:
+            return -1
+        ball_center = get_center_of_bbox(ball_bbox)
+
+        best_player_id, min_distance = self.find_best_candidate(
+            ball_center,
+            player_tracks_frame,
+            ball_bbox
+        )
+        return self.apply_hysteresis([best_player_id], [min_distance])[0]
+
+    def update_frames(self, player_tracks, ball_tracks):
+        """
+        Como `update` pero para un bloque de frames consecutivos: los candidatos se calculan
+        con operaciones de NumPy sobre todos los frames y solo la histéresis recorre el bloque.
+        """
+        player_ids, player_boxes, player_valid, ball_boxes, has_ball = self.get_possession_arrays(player_tracks, ball_tracks)
+        best_ids, best_distances = self.find_best_candidates(player_ids, player_boxes, player_valid, ball_boxes)
+        return self.apply_hysteresis(best_ids.tolist(), best_distances.tolist(), has_ball.tolist())
 
-        return possession_list
+    def detect_ball_possession(self, player_tracks, ball_tracks):
+        self.reset()
+        return self.update_frames(player_tracks, ball_tracks)
 
     def get_team_ball_control(self, player_assignment, ball_possession):
         team_control = []
@@ -102,31 +230,63 @@ class BallPossession:
                 team_control.append(team if team in (1, 2) else -1)
         return np.array(team_control)
 
+    def get_possession_counts(self, team_ball_control, initial_counts=(0, 0)):
+        """
+        Frames acumulados con posesión de cada equipo hasta cada frame inclusive: array (F, 2).
+        `initial_counts` permite continuar la cuenta de un bloque anterior.
+        """
+        team_ball_control = np.asarray(team_ball_control)
+        counts = np.stack([np.cumsum(team_ball_control == 1), np.cumsum(team_ball_control == 2)], axis=-1)
+        return counts + np.asarray(initial_counts, dtype=counts.dtype)
+
+    def get_possession_percentages(self, possession_counts):
+        """
+        Porcentaje de posesión de cada equipo (0-1) a partir de los acumulados de get_possession_counts.
+        """
+        possession_counts = np.asarray(possession_counts)
+        total_controlled = possession_counts.sum(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total_controlled > 0, possession_counts / total_controlled, 0)
+
+    def get_layout(self, frame_width, frame_height):
+        """
+        Tamaño de texto, grosor y alto de cada línea del marcador. Solo dependen de la
+        resolución, así que se calculan una vez por tamaño de frame.
+        """
+        key = (frame_width, frame_height)
+        if key not in self.layout_cache:
+            font_scale = sv.calculate_optimal_text_scale((frame_width, frame_height))
+            thickness = sv.calculate_optimal_line_thickness((frame_width, frame_height))
+            font = cv2.FONT_HERSHEY_SIMPLEX
+            # El alto de getTextSize no depende del texto, así que vale cualquier porcentaje
+            lines = ["Ball Possession", "Team 1: 100.00%", "Team 2: 100.00%"]
+            line_heights = [cv2.getTextSize(line, font, font_scale, thickness)[0][1] + 12 for line in lines]
+            self.layout_cache[key] = (font_scale, thickness, line_heights)
+        return self.layout_cache[key]
+
     def draw_possession(self, video_frames, player_assignment, ball_possession, player_tracks):
         team_ball_control = self.get_team_ball_control(player_assignment, ball_possession)
+        team_percentages = self.get_possession_percentages(self.get_possession_counts(team_ball_control))
         output_video_frames = []
         for frame_num, frame in enumerate(video_frames):
             if frame_num == 0:
                 continue
             frame_drawn = self.draw_frame(
                 frame, 
-                frame_num, 
-                team_ball_control, 
+                team_percentages[frame_num], 
                 player_assignment[frame_num], 
                 player_tracks[frame_num]
             )
             output_video_frames.append(frame_drawn)
         return output_video_frames
 
-    def draw_frame(self, frame, frame_num, team_ball_control, player_assignment_frame, player_tracks_frame):
+    def draw_frame(self, frame, team_percentages, player_assignment_frame, player_tracks_frame):
+        """
+        Dibuja el marcador de posesión de un frame. `team_percentages` es la fila de ese
+        frame de get_possession_percentages, por lo que el coste no depende de la duración.
+        """
         frame_height, frame_width = frame.shape[:2]
-
-        team_control_till_frame = team_ball_control[:frame_num + 1]
-        controlled = team_control_till_frame[team_control_till_frame > 0]
-        total_controlled = len(controlled)
-
-        team1_percent = (controlled == 1).sum() / total_controlled if total_controlled > 0 else 0
-        team2_percent = (controlled == 2).sum() / total_controlled if total_controlled > 0 else 0
+        team1_percent, team2_percent = team_percentages
 
         # Obtener colores correctos desde player_tracks_frame
         team_colors = {1: (0, 0, 0), 2: (0, 0, 0)}  # Default negro si no se encuentra
@@ -135,9 +295,7 @@ class BallPossession:
                 color = player_tracks_frame.get(player_id, {}).get("team_color", [0, 0, 0])
                 team_colors[team] = tuple(map(int, color))
 
-        font_scale = sv.calculate_optimal_text_scale((frame_width, frame_height))
-        thickness = sv.calculate_optimal_line_thickness((frame_width, frame_height))
-        font = cv2.FONT_HERSHEY_SIMPLEX
+        font_scale, thickness, line_heights = self.get_layout(frame_width, frame_height)
 
         lines = [
             "Ball Possession",
@@ -145,8 +303,6 @@ class BallPossession:
             f"Team 2: {team2_percent * 100:.2f}%"
         ]
 
-        line_heights = [cv2.getTextSize(line, font, font_scale, thickness)[0][1] + 12 for line in lines]
-
         base_x = int(frame_width * 0.90)
         base_y = int(frame_height * 0.05)
         current_y = base_y
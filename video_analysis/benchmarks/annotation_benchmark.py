@@ -0,0 +1,79 @@
+import argparse
+import time
+import numpy as np
+import supervision as sv
+from common import make_tracks
+from trackers import Tracker
+
+
+def draw_frame_per_object(tracker, frame, frame_idx, tracks, player_with_ball_id):
+    """
+    Implementación de referencia: dos anotadores nuevos y una Detections de una fila por jugador,
+    y una llamada por objeto para árbitros y red.
+    """
+    for track_id, player in tracks["players"][frame_idx].items():
+        player_color = player.get("team_color", (0, 0, 255))
+        color = sv.Color(r=player_color[2], g=player_color[1], b=player_color[0])
+        ellipse_annotator = sv.EllipseAnnotator(color=color, thickness=3)
+        label_annotator = sv.LabelAnnotator(text_position=sv.Position.BOTTOM_CENTER, color=color)
+        det = sv.Detections(xyxy=np.array([player["bbox"]]), class_id=np.array([0]), tracker_id=np.array([int(track_id)]))
+        frame = ellipse_annotator.annotate(scene=frame, detections=det)
+        frame = label_annotator.annotate(scene=frame, detections=det, labels=[f"Player #{track_id}"])
+        if track_id == player_with_ball_id:
+            frame = tracker.player_triangle_annotator.annotate(scene=frame, detections=det)
+
+    for rid, rdata in tracks["referees"][frame_idx].items():
+        det = sv.Detections(xyxy=np.array([rdata["bbox"]]), class_id=np.array([1]), tracker_id=np.array([int(rid)]))
+        frame = tracker.ellipse_annotator.annotate(scene=frame, detections=det)
+        frame = tracker.label_annotator.annotate(scene=frame, detections=det, labels=["Referee"])
+
+    ball_data = tracks["ball"][frame_idx].get(1)
+    if ball_data and "bbox" in ball_data:
+        det = sv.Detections(xyxy=np.array([ball_data["bbox"]]), class_id=np.array([2]), tracker_id=np.array([1]))
+        frame = tracker.circle_annotator.annotate(scene=frame, detections=det)
+        frame = tracker.triangle_annotator.annotate(scene=frame, detections=det)
+
+    for nid, net_data in tracks["net"][frame_idx].items():
+        det = sv.Detections(xyxy=np.array([net_data["bbox"]]), class_id=np.array([3]), tracker_id=np.array([int(nid)]))
+        frame = tracker.bbox_annotator.annotate(scene=frame, detections=det)
+        frame = tracker.label_annotator.annotate(scene=frame, detections=det, labels=["Net"])
+
+    return frame
+
+
+def time_per_frame(draw, frames, num_frames):
+    elapsed = 0.0
+    for frame_idx in range(num_frames):
+        frame = frames[frame_idx % len(frames)].copy()
+        start = time.perf_counter()
+        draw(frame, frame_idx)
+        elapsed += time.perf_counter() - start
+    return elapsed / num_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por frame de Tracker.draw_frame frente a la versión por objeto.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    tracks = make_tracks(args.frames, args.players, args.width, args.height)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    ball_possession = [int(rng.integers(1, args.players + 1)) for _ in range(args.frames)]
+
+    tracker = Tracker(model_path=None)
+    reference_time = time_per_frame(
+        lambda frame, idx: draw_frame_per_object(tracker, frame, idx, tracks, ball_possession[idx]), frames, args.frames)
+    batched_time = time_per_frame(
+        lambda frame, idx: tracker.draw_frame(frame, idx, tracks, ball_possession[idx]), frames, args.frames)
+
+    print(f"Frames: {args.frames} de {args.width}x{args.height}, jugadores: {args.players}")
+    print(f"Por objeto:  {reference_time * 1000:.3f} ms/frame")
+    print(f"Agrupado:    {batched_time * 1000:.3f} ms/frame ({reference_time / batched_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import os
+import common
+from utils import VideoDecoder
+from inference import INFERENCE_BACKENDS, check_backend_parity
+
+MODELS_DIR = os.path.join(common.folder_path, "../models")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad y velocidad de un backend exportado frente a PyTorch en CPU.")
+    parser.add_argument("video", help="Clip de muestra")
+    parser.add_argument("--backend", choices=[b for b in INFERENCE_BACKENDS if b != "torch"], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Cuantización dinámica INT8 (solo onnx)")
+    parser.add_argument("--threads", type=int, default=None, help="Hilos intra-op del backend")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--detection-model", default=os.path.join(MODELS_DIR, "aisportsv2.pt"))
+    parser.add_argument("--keypoint-model", default=os.path.join(MODELS_DIR, "keypoint.pt"))
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    frames = list(VideoDecoder(args.video, end=args.frames))
+    report = check_backend_parity(frames, args.detection_model, args.keypoint_model, args.backend,
+                                  int8=args.int8, num_threads=args.threads)
+
+    name = f"{args.backend}-int8" if args.int8 else args.backend
+    print(f"Frames: {len(frames)} de {args.video}")
+    print(f"PyTorch:  {report['torch_ms_per_frame']:.2f} ms/frame")
+    print(f"{name}: {report['backend_ms_per_frame']:.2f} ms/frame ({report['speedup']:.1f}x)")
+    for model in ("detection", "keypoints"):
+        print(f"Paridad {model}: {report[model]}")
+
+    if min(report["detection"]["recall"], report["keypoints"]["recall"]) < args.min_recall:
+        raise AssertionError(f"Paridad insuficiente: recall por debajo de {args.min_recall}.")
+
+
+if __name__ == "__main__":
+    main()
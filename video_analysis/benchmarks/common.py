@@ -0,0 +1,108 @@
+import os
+import sys
+import pathlib
+import time
+import numpy as np
+
+folder_path = pathlib.Path(__file__).parent.resolve()
+sys.path.append(os.path.join(folder_path, "../"))
+
+from utils import get_center_of_bbox
+
+
+def best_time(func, repeat=3):
+    """
+    Ejecuta `func` `repeat` veces y devuelve (mejor tiempo en segundos, último resultado).
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def make_tracks(num_frames=3000, num_players=10, width=1920, height=1080, seed=0, num_referees=2):
+    """
+    Genera pistas sintéticas con la misma estructura que Tracker.get_object_tracks:
+    jugadores que se mueven con un paseo aleatorio y un balón que pasa de un jugador a otro,
+    con algunos frames sin balón y jugadores que entran y salen de escena, además de
+    árbitros y una red fija.
+    """
+    rng = np.random.default_rng(seed)
+    referee_rng = np.random.default_rng(seed + 1)
+    referee_positions = referee_rng.uniform((100, 300), (width - 100, height - 50), size=(num_referees, 2))
+    net_bbox = [width * 0.85, height * 0.25, width * 0.85 + 60, height * 0.25 + 45]
+    positions = rng.uniform((100, 200), (width - 100, height - 50), size=(num_players, 2))
+    sizes = rng.uniform((50, 150), (90, 260), size=(num_players, 2))
+
+    tracks = {"players": [], "referees": [], "ball": [], "net": []}
+    holder = 0
+    for frame_idx in range(num_frames):
+        positions = np.clip(positions + rng.normal(0, 6, positions.shape), (60, 150), (width - 60, height - 10))
+        if rng.random() < 0.02:
+            holder = int(rng.integers(num_players))
+
+        players = {}
+        for player_id in range(num_players):
+            if rng.random() < 0.03:
+                continue
+            x, y = positions[player_id]
+            w, h = sizes[player_id]
+            players[player_id + 1] = {"bbox": [float(x - w / 2), float(y - h), float(x + w / 2), float(y)],
+                                      "team": player_id % 2 + 1,
+                                      "team_color": [255 * (player_id % 2), 0, 255 * (1 - player_id % 2)]}
+        tracks["players"].append(players)
+
+        referee_positions = np.clip(referee_positions + referee_rng.normal(0, 4, referee_positions.shape),
+                                    (60, 250), (width - 60, height - 10))
+        tracks["referees"].append({num_players + 1 + i: {"bbox": [float(x - 35), float(y - 200), float(x + 35), float(y)]}
+                                   for i, (x, y) in enumerate(referee_positions)})
+
+        ball = {}
+        if rng.random() > 0.1:
+            x, y = positions[holder] + rng.normal(0, 25, 2) - (0, sizes[holder][1] / 2)
+            ball[1] = {"bbox": [float(x - 10), float(y - 10), float(x + 10), float(y + 10)]}
+        tracks["ball"].append(ball)
+        tracks["net"].append({num_players + num_referees + 1: {"bbox": [float(v) for v in net_bbox]}})
+
+    return tracks
+
+
+def detect_ball_possession_baseline(detector, player_tracks, ball_tracks):
+    """
+    Copia de la implementación original de BallPossession.detect_ball_possession: un
+    find_best_candidate por frame y la histéresis con su propio estado, sin pasar por
+    apply_hysteresis, para comprobar que la versión vectorizada no cambia el resultado.
+    """
+    consecutive_possession_count = {}
+    last_possessor = -1
+    retention_counter = 0
+
+    possession = []
+    for frame_num in range(len(ball_tracks)):
+        ball_bbox = ball_tracks[frame_num].get(1, {}).get('bbox', [])
+        if not ball_bbox:
+            possession.append(-1)
+            continue
+
+        best_player_id, min_distance = detector.find_best_candidate(
+            get_center_of_bbox(ball_bbox), player_tracks[frame_num], ball_bbox)
+
+        possessor = -1
+        if best_player_id != -1 and min_distance < detector.possession_threshold:
+            count = consecutive_possession_count.get(best_player_id, 0) + 1
+            consecutive_possession_count = {best_player_id: count}
+            if count >= detector.min_frames:
+                possessor = best_player_id
+                last_possessor = best_player_id
+                retention_counter = detector.possession_retention
+        elif retention_counter > 0:
+            possessor = last_possessor
+            retention_counter -= 1
+        else:
+            last_possessor = -1
+            consecutive_possession_count.clear()
+        possession.append(possessor)
+
+    return possession
@@ -0,0 +1,30 @@
+import argparse
+from common import best_time, make_tracks, detect_ball_possession_baseline
+from ball_possession import BallPossession
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la posesión por frame con la versión vectorizada.")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tracks = make_tracks(args.frames, args.players)
+    detector = BallPossession()
+
+    per_frame_time, expected = best_time(
+        lambda: detect_ball_possession_baseline(detector, tracks["players"], tracks["ball"]), args.repeat)
+    batched_time, result = best_time(
+        lambda: detector.detect_ball_possession(tracks["players"], tracks["ball"]), args.repeat)
+
+    if result != expected:
+        raise AssertionError("La versión vectorizada no coincide con la de referencia.")
+
+    print(f"Frames: {args.frames}, jugadores: {args.players}")
+    print(f"Por frame:    {per_frame_time * 1000:.1f} ms")
+    print(f"Vectorizada:  {batched_time * 1000:.1f} ms ({per_frame_time / batched_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
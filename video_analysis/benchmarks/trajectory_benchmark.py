@@ -0,0 +1,77 @@
+import argparse
+import time
+import cv2
+import numpy as np
+import common  # noqa: F401 (añade video_analysis al path)
+from events.shots import ShotDetector
+
+
+def draw_ball_trajectory_per_segment(frame, trajectory_points):
+    """
+    Implementación de referencia: un cv2.line por segmento en cada frame.
+    """
+    for i in range(1, len(trajectory_points)):
+        cv2.line(frame, tuple(map(int, trajectory_points[i - 1])), tuple(map(int, trajectory_points[i])), (0, 255, 255), 2)
+    return frame
+
+
+def make_trajectory(length, width, height, seed=0):
+    """
+    Trayectoria parabólica con ruido, como la de un tiro.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, length)
+    x = width * 0.2 + width * 0.6 * t + rng.normal(0, 2, length)
+    y = height * 0.8 - height * 2.4 * t * (1 - t) + rng.normal(0, 2, length)
+    return [(int(px), int(py)) for px, py in zip(x, y)]
+
+
+def time_per_frame(draw, frame, trajectory, frames_to_time):
+    """
+    Tiempo medio por frame dibujando los últimos `frames_to_time` frames de la trayectoria,
+    con un punto nuevo por frame como en el pipeline real.
+    """
+    elapsed = 0.0
+    for end in range(len(trajectory) - frames_to_time + 1, len(trajectory) + 1):
+        canvas = frame.copy()
+        start = time.perf_counter()
+        draw(canvas, trajectory[:end])
+        elapsed += time.perf_counter() - start
+    return elapsed / frames_to_time, canvas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por frame del dibujo de la trayectoria según su longitud.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 200, 1000, 5000])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+
+    print(f"{'puntos':>8} {'por segmento (ms)':>18} {'capa (ms)':>10}")
+    for length in args.lengths:
+        trajectory = make_trajectory(length, args.width, args.height)
+        frames_to_time = min(args.frames, length - 2)
+
+        detector = ShotDetector(court_pic_path="", fps=30)
+        def draw_layer(canvas, points):
+            # Simula el pipeline: los puntos previos ya están en la capa
+            detector.trajectory_points = points
+            return detector.draw_ball_trajectory(canvas)
+
+        detector.trajectory_points = trajectory[:length - frames_to_time]
+        detector.draw_ball_trajectory(frame.copy())
+
+        reference_time, expected = time_per_frame(draw_ball_trajectory_per_segment, frame, trajectory, frames_to_time)
+        layer_time, result = time_per_frame(draw_layer, frame, trajectory, frames_to_time)
+
+        if not np.array_equal(result, expected):
+            raise AssertionError("La capa de trayectoria no coincide con la referencia.")
+
+        print(f"{length:>8} {reference_time * 1000:>18.3f} {layer_time * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,26 +7,40 @@ import cv2
 import numpy as np
 import torch
 sys.path.append('../')
+from utils import keypoints_to_array, iter_frame_batches
 
 
 class CourtKeypointDetector:
-    def __init__(self, model_path):
+    def __init__(self, model_path, model=None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = YOLO(model_path).to(self.device)
+        # Sin modelo (model_path=None) solo se pueden dibujar keypoints ya calculados.
+        # `model` permite pasar un modelo ya cargado (p. ej. con inference.load_model)
+        if model is None and model_path is not None:
+            model = YOLO(model_path).to(self.device)
+        self.model = model
+        self.vertex_annotator = sv.VertexAnnotator(
+            color=sv.Color.from_hex('#d313a2'),
+            radius=5
+        )
     
-    def get_court_keypoints(self, frames,read_from_stub=False, stub_path=None):
-
+    def get_court_keypoints(self, frames,read_from_stub=False, stub_path=None, detections=None):
+        """
+        Devuelve los keypoints de la cancha de cada frame.
+        Si se pasan `detections` (p. ej. de JointInference) no se vuelve a ejecutar el modelo.
+        `frames` puede ser una lista de frames o un VideoDecoder.
+        """
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path,'rb') as f:
                 court_keypoints = pickle.load(f)
             return court_keypoints
         
-        batch_size=20
-        court_keypoints = []
-        for i in range(0,len(frames),batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size], conf=0.5, device=self.device)
-            for detection in detections_batch:
-                court_keypoints.append(detection.keypoints)
+        if detections is None:
+            detections = []
+            batch_size=20
+            for batch in iter_frame_batches(frames, batch_size):
+                detections += self.model.predict(batch, conf=0.5, device=self.device)
+
+        court_keypoints = [detection.keypoints for detection in detections]
  
         if stub_path is not None:
             with open(stub_path,'wb') as f:
@@ -38,42 +52,45 @@ class CourtKeypointDetector:
         """
         Dibuja los keypoints en los frames y anota su class_id encima de cada punto.
         """
-        vertex_annotator = sv.VertexAnnotator(
-            color=sv.Color.from_hex('#d313a2'),
-            radius=5
-        )
-
         output_frames = []
         for index, frame in enumerate(frames):
-            annotated_frame = frame
+            annotated_frame = self.draw_frame(frame, court_keypoints[index])
+            output_frames.append(annotated_frame)
 
-            keypoints = court_keypoints[index]
+        return output_frames
 
-            if keypoints is not None and keypoints.xy is not None:
-                keypoints_array = keypoints.xy[0].cpu().numpy()  # Extraer coordenadas
-                class_ids = np.arange(len(keypoints_array))  # Asignar class_id (0, 1, 2, ...)
+    def draw_frame(self, frame, keypoints):
+        """
+        Dibuja los keypoints de un único frame. `keypoints` es el array (K, 2) de
+        Transformer.validate_kp (o los Keypoints de ultralytics sin validar).
+        """
+        annotated_frame = frame
 
-                # Dibujar puntos
-                annotated_frame = vertex_annotator.annotate(
-                    scene=annotated_frame,
-                    key_points=keypoints
-                )
+        if keypoints is not None and not isinstance(keypoints, np.ndarray):
+            keypoints = keypoints_to_array([keypoints])[0] if keypoints.xy is not None else None
 
-                # Dibujar class_id sobre cada keypoint
-                for i, (x, y) in enumerate(keypoints_array):
-                    if x > 0 and y > 0:  # Filtrar keypoints no detectados
-                        cv2.putText(
-                            annotated_frame, 
-                            str(class_ids[i]),  # Texto con el class_id
-                            (int(x), int(y) - 10),  # Posición encima del punto
-                            cv2.FONT_HERSHEY_SIMPLEX, 
-                            0.5,  # Tamaño del texto
-                            (255, 255, 255),  # Color (blanco)
-                            2, 
-                            cv2.LINE_AA
-                        )
+        if keypoints is not None:
+            keypoints_array = keypoints
+            class_ids = np.arange(len(keypoints_array))  # Asignar class_id (0, 1, 2, ...)
 
-            output_frames.append(annotated_frame)
+            # Dibujar puntos
+            annotated_frame = self.vertex_annotator.annotate(
+                scene=annotated_frame,
+                key_points=sv.KeyPoints(xy=keypoints_array[np.newaxis].astype(np.float32))
+            )
 
-        return output_frames
- 
\ No newline at end of file
+            # Dibujar class_id sobre cada keypoint
+            for i, (x, y) in enumerate(keypoints_array):
+                if x > 0 and y > 0:  # Filtrar keypoints no detectados
+                    cv2.putText(
+                        annotated_frame, 
+                        str(class_ids[i]),  # Texto con el class_id
+                        (int(x), int(y) - 10),  # Posición encima del punto
+                        cv2.FONT_HERSHEY_SIMPLEX, 
+                        0.5,  # Tamaño del texto
+                        (255, 255, 255),  # Color (blanco)
+                        2, 
+                        cv2.LINE_AA
+                    )
+
+        return annotated_frame
@@ -1,7 +1,7 @@
 import numpy as np
 import cv2
 from collections import deque
-from utils import get_center_of_bbox, frame_to_time
+from utils import get_center_of_bbox, frame_to_time, get_ball_boxes
 import supervision as sv
 
 
@@ -9,6 +9,34 @@ class ShotDetector:
     def __init__(self, court_pic_path, fps):
         self.fps = fps
 
+        self.court_pic_path = court_pic_path
+        self.width = 300
+        self.height = 161
+        self.court_image = None
+
+        # Capas del minimapa con las marcas de tiro ya dibujadas (ver update_marker_layers)
+        self.marker_layers = {}
+        self.marker_layer_padding = 16
+
+        self.min_descending_frames = 3
+        self.max_outside_net_frames = 5
+        self.cooldown_frames = 15  # frames de espera tras un intento
+
+        # Capa con la trayectoria ya dibujada (ver update_trajectory_layer)
+        self.trajectory_mask = None
+        self.trajectory_pixels = np.empty(0, dtype=np.int64)
+        self.trajectory_num_pixels = 0
+        self.trajectory_drawn = 0
+        self.trajectory_layer_min_points = 128
+        self.trajectory_color = np.array([0, 255, 255], dtype=np.uint8)
+        self.timeline_trajectory_start = -1
+
+        self.reset()
+
+    def reset(self):
+        """
+        Reinicia la máquina de estados de tiros, las estadísticas y los eventos.
+        """
         self.make_count = 0
         self.attempt_count = 0
         self.make_positions = []
@@ -16,28 +44,21 @@ class ShotDetector:
 
         self.team_stats = {1: {"makes": 0, "attempts": 0}, 2: {"makes": 0, "attempts": 0}}
 
-        self.court_pic_path = court_pic_path
-        self.width = 300
-        self.height = 161
-
         self.last_possessor_id = -1
         self.ball_path = deque(maxlen=50)
         self.in_net_history = []
         self.shot_in_progress = False
-        self.min_descending_frames = 3
 
         self.make_flags = []
         self.events = []
 
         self.frames_outside_net = 0
-        self.max_outside_net_frames = 5
         self.last_in_net = False
         self.just_scored = False
         self.has_registered_attempt = False
         self.trajectory_points = []
-        
+
         self.shot_cooldown = 0  # cooldown para evitar dobles registros
-        self.cooldown_frames = 15  # frames de espera tras un intento
 
     def get_accuracy(self):
         return (self.make_count / self.attempt_count) * 100 if self.attempt_count else 0.0
@@ -65,6 +86,7 @@ class ShotDetector:
         self.just_scored = False
         self.has_registered_attempt = False
         self.trajectory_points.clear()
+        self.clear_trajectory_layer()
 
     def register_attempt(self, player_positions, frame_idx, make=False):
         self.attempt_count += 1
@@ -160,13 +182,78 @@ class ShotDetector:
                 self.shot_cooldown = self.cooldown_frames
             self.reset_shot_tracking()
 
+    def update_trajectory_layer(self, frame_shape):
+        """
+        Dibuja en la máscara de la trayectoria solo los segmentos nuevos desde la última
+        llamada y añade al buffer `trajectory_pixels` el índice plano (y * ancho + x) de
+        los píxeles que se han encendido. La capa se vacía en reset_shot_tracking.
+        """
+        frame_height, frame_width = frame_shape[:2]
+        if self.trajectory_mask is None or self.trajectory_mask.shape != (frame_height, frame_width):
+            self.trajectory_mask = np.zeros((frame_height, frame_width), dtype=np.uint8)
+            self.trajectory_num_pixels = 0
+            self.trajectory_drawn = 0
+
+        first = max(self.trajectory_drawn - 1, 0)
+        if len(self.trajectory_points) - first > 1:
+            segment = np.array(self.trajectory_points[first:], dtype=np.int32)
+
+            # Región que puede cambiar: los puntos nuevos más el grosor de la línea
+            margin = 2
+            x1, y1 = np.maximum(segment.min(axis=0) - margin, 0)
+            x2, y2 = np.minimum(segment.max(axis=0) + margin + 1, (frame_width, frame_height))
+            before = self.trajectory_mask[y1:y2, x1:x2].copy() if x2 > x1 and y2 > y1 else None
+
+            cv2.polylines(self.trajectory_mask, [segment.reshape(-1, 1, 2)], False, 255, 2)
+
+            if before is not None:
+                ys, xs = np.nonzero(self.trajectory_mask[y1:y2, x1:x2] != before)
+                self.append_trajectory_pixels((ys + y1) * frame_width + xs + x1)
+
+        self.trajectory_drawn = len(self.trajectory_points)
+
+    def append_trajectory_pixels(self, indices):
+        """
+        Añade índices al buffer de píxeles, que dobla su capacidad al llenarse: el coste de
+        cada punto nuevo solo depende de los píxeles de su segmento.
+        """
+        end = self.trajectory_num_pixels + len(indices)
+        if end > len(self.trajectory_pixels):
+            grown = np.empty(max(end, 2 * len(self.trajectory_pixels), 1024), dtype=np.int64)
+            grown[:self.trajectory_num_pixels] = self.trajectory_pixels[:self.trajectory_num_pixels]
+            self.trajectory_pixels = grown
+        self.trajectory_pixels[self.trajectory_num_pixels:end] = indices
+        self.trajectory_num_pixels = end
+
+    def clear_trajectory_layer(self):
+        if self.trajectory_mask is not None:
+            self.trajectory_mask.reshape(-1)[self.trajectory_pixels[:self.trajectory_num_pixels]] = 0
+        self.trajectory_num_pixels = 0
+        self.trajectory_drawn = 0
+
     def draw_ball_trajectory(self, frame):
-        if len(self.trajectory_points) > 1:
-            for i in range(1, len(self.trajectory_points)):
-                pt1 = self.trajectory_points[i - 1]
-                pt2 = self.trajectory_points[i]
-                if pt1 and pt2:
-                    cv2.line(frame, tuple(map(int, pt1)), tuple(map(int, pt2)), (0, 255, 255), 2)
+        """
+        Dibuja la trayectoria. Las cortas (hasta `trajectory_layer_min_points` puntos) se
+        dibujan directamente con una sola llamada a cv2.polylines; a partir de ahí cada
+        segmento se rasteriza una sola vez en la capa y en cada frame solo se pintan sus
+        píxeles, así que el coste ya no crece con el número de segmentos.
+        """
+        if len(self.trajectory_points) < self.trajectory_drawn:
+            self.clear_trajectory_layer()
+        if len(self.trajectory_points) < 2:
+            return frame
+
+        if self.trajectory_drawn == 0 and len(self.trajectory_points) <= self.trajectory_layer_min_points:
+            points = np.array(self.trajectory_points, dtype=np.int32).reshape(-1, 1, 2)
+            cv2.polylines(frame, [points], False, self.trajectory_color.tolist(), 2)
+            return frame
+
+        self.update_trajectory_layer(frame.shape)
+        pixels = self.trajectory_pixels[:self.trajectory_num_pixels]
+        if frame.flags.c_contiguous:
+            frame.reshape(-1, 3)[pixels] = self.trajectory_color
+        else:
+            frame[np.unravel_index(pixels, frame.shape[:2])] = self.trajectory_color
         return frame
 
     def draw_overlay(self, frame):
@@ -196,70 +283,220 @@ class ShotDetector:
 
         return frame
 
+    def get_court_image(self):
+        """
+        Boceto de la cancha redimensionado al minimapa; se lee del disco una sola vez.
+        """
+        if self.court_image is None:
+            court_image = cv2.imread(self.court_pic_path)
+            if court_image is not None:
+                self.court_image = cv2.resize(court_image, (self.width, self.height))
+        return self.court_image
+
+    @staticmethod
+    def draw_marker(image, x, y, make, color=None):
+        """
+        Dibuja la marca de un tiro: círculo verde si entra, aspa roja si se falla.
+        Con `color` se dibuja la misma forma en ese color (para las máscaras).
+        """
+        if make:
+            cv2.circle(image, (x, y), 6, color if color is not None else (0, 255, 0), -1)
+            return image
+
+        offset = 6
+        line_color = color if color is not None else sv.Color.RED.as_bgr()
+        cv2.line(image, (x - offset, y - offset), (x + offset, y + offset), line_color, thickness=2)
+        cv2.line(image, (x - offset, y + offset), (x + offset, y - offset), line_color, thickness=2)
+        return image
+
+    def update_marker_layers(self):
+        """
+        Dibuja en las capas del minimapa solo los tiros registrados desde la última llamada.
+        Cada capa (aciertos y fallos) es una imagen con su máscara, con un margen de
+        `marker_layer_padding` píxeles alrededor del minimapa para las marcas del borde.
+        Las marcas que no caben en la capa se dibujan aparte en cada frame.
+        """
+        pad = self.marker_layer_padding
+        size = (self.height + 2 * pad, self.width + 2 * pad)
+
+        for make, positions in ((True, self.make_positions), (False, self.fail_positions)):
+            if make not in self.marker_layers:
+                self.marker_layers[make] = {"image": np.zeros(size + (3,), dtype=np.uint8),
+                                            "mask": np.zeros(size, dtype=np.uint8),
+                                            "drawn": 0,
+                                            "outside": []}
+            layer = self.marker_layers[make]
+            if len(positions) < layer["drawn"]:
+                # Estado anterior de la línea temporal (render en paralelo): se redibuja la capa
+                layer["image"][:] = 0
+                layer["mask"][:] = 0
+                layer["drawn"] = 0
+                layer["outside"] = []
+
+            for pos in positions[layer["drawn"]:]:
+                x, y = int(round(pos[0])), int(round(pos[1]))
+                if -pad + 8 <= x < self.width + pad - 8 and -pad + 8 <= y < self.height + pad - 8:
+                    self.draw_marker(layer["image"], x + pad, y + pad, make)
+                    self.draw_marker(layer["mask"], x + pad, y + pad, make, color=255)
+                else:
+                    layer["outside"].append((x, y))
+            layer["drawn"] = len(positions)
+
     def draw_on_minimap(self, frame, x1, y1):
-        court_image = cv2.imread(self.court_pic_path)
-        court_image = cv2.resize(court_image, (self.width, self.height))
+        court_image = self.get_court_image()
 
         if court_image is not None:
-            overlay = frame[y1:y1 + self.height, x1:x1 + self.width].copy()
-            blended = cv2.addWeighted(court_image, 0.8, overlay, 0.2, 0)
-            frame[y1:y1 + self.height, x1:x1 + self.width] = blended
-
-        for pos in self.make_positions:
-            x, y = int(round(pos[0])), int(round(pos[1]))
-            cv2.circle(frame, (x + x1, y + y1), 6, (0, 255, 0), -1)
+            overlay = frame[y1:y1 + self.height, x1:x1 + self.width]
+            cv2.addWeighted(court_image, 0.8, overlay, 0.2, 0, dst=overlay)
+
+        # Aciertos y después fallos, cada capa pegada de una vez sobre su región del frame
+        self.update_marker_layers()
+        pad = self.marker_layer_padding
+        frame_height, frame_width = frame.shape[:2]
+        top, left = max(y1 - pad, 0), max(x1 - pad, 0)
+        bottom = min(y1 + self.height + pad, frame_height)
+        right = min(x1 + self.width + pad, frame_width)
+
+        for make in (True, False):
+            layer = self.marker_layers[make]
+            if bottom > top and right > left:
+                roi = frame[top:bottom, left:right]
+                layer_rows = slice(top - (y1 - pad), bottom - (y1 - pad))
+                layer_cols = slice(left - (x1 - pad), right - (x1 - pad))
+                np.copyto(roi, layer["image"][layer_rows, layer_cols],
+                          where=layer["mask"][layer_rows, layer_cols, None] > 0)
+            for x, y in layer["outside"]:
+                self.draw_marker(frame, x + x1, y + y1, make)
 
-        for pos in self.fail_positions:
-            x, y = int(round(pos[0])), int(round(pos[1]))
-            offset = 6
-            p1 = sv.Point(x=x + x1 - offset, y=y + y1 - offset)
-            p2 = sv.Point(x=x + x1 + offset, y=y + y1 + offset)
-            p3 = sv.Point(x=x + x1 - offset, y=y + y1 + offset)
-            p4 = sv.Point(x=x + x1 + offset, y=y + y1 - offset)
+        return frame
 
-            frame = sv.draw_line(frame, p1, p2, color=sv.Color.RED, thickness=2)
-            frame = sv.draw_line(frame, p3, p4, color=sv.Color.RED, thickness=2)
+    def draw_minimap_overlay(self, video_frames, shot_timeline, width, height):
+        """
+        Dibuja estadísticas, trayectoria y minimapa en una lista de frames a partir de la
+        línea temporal de detect_shots (el frame `i` usa la fila `i`).
+        """
+        return [self.draw_timeline_frame(frame, shot_timeline, frame_idx, width, height)
+                for frame_idx, frame in enumerate(video_frames)]
+
+    def process_frame(self, frame, frame_idx, ball_info, net_info, player_pos, possessor_id, width, height):
+        """
+        Actualiza la detección de tiros con un frame y dibuja estadísticas, trayectoria y minimapa.
+        """
+        self.update_frame(frame_idx, ball_info, net_info, player_pos, possessor_id)
+        return self.draw_frame(frame, width, height)
+
+    def draw_frame(self, frame, width, height):
+        """
+        Dibuja estadísticas, trayectoria y minimapa con el estado actual del detector.
+        """
+        frame = self.draw_overlay(frame)
+        frame = self.draw_ball_trajectory(frame)
+
+        gap = 20
+        frame_height, frame_width = frame.shape[:2]
+        total_width = width * 2 + gap
+        start_x = (frame_width - total_width) // 2
+
+        minimap_x = start_x + width + gap
+        minimap_y = frame_height - 40 - height
+        frame = self.draw_on_minimap(frame, minimap_x, minimap_y)
 
         return frame
 
-    def draw_minimap_overlay(self, video_frames, court_player_positions, tracks, ball_possession, width, height):
-        output_video_frames = []
+    def update_frame(self, frame_idx, ball_info, net_info, player_pos, possessor_id):
+        """
+        Avanza la máquina de estados de tiros un frame sin dibujar nada.
+        """
         field_goal_display_frames = 30
 
-        for frame_idx, frame in enumerate(video_frames):
-            ball_info = tracks["ball"][frame_idx].get(1, {})
-            net_info = tracks["net"][frame_idx]
-            player_pos = court_player_positions[frame_idx]
-            possessor_id = ball_possession[frame_idx] if frame_idx < len(ball_possession) else -1
-
-            if possessor_id != -1:
-                self.last_possessor_id = possessor_id
-
-            prev_makes = self.make_count
-            self.update(ball_info, net_info, player_pos, frame_idx)
-            new_makes = self.make_count > prev_makes
-
-            if new_makes:
-                self.make_flags.extend([1] * field_goal_display_frames)
-            else:
-                self.make_flags.append(0)
-
-            frame = self.draw_overlay(frame)
-            frame = self.draw_ball_trajectory(frame)
-
-            gap = 20
-            frame_height, frame_width = frame.shape[:2]
-            total_width = width * 2 + gap
-            start_x = (frame_width - total_width) // 2
-
-            minimap_x = start_x + width + gap
-            minimap_y = frame_height - 40 - height
-            frame = self.draw_on_minimap(frame, minimap_x, minimap_y)
-
-            output_video_frames.append(frame)
-
-        self.make_flags = self.make_flags[:len(output_video_frames)]
-        return output_video_frames
+        if possessor_id != -1:
+            self.last_possessor_id = possessor_id
+
+        prev_makes = self.make_count
+        self.update(ball_info, net_info, player_pos, frame_idx)
+        new_makes = self.make_count > prev_makes
+
+        if new_makes:
+            self.make_flags.extend([1] * field_goal_display_frames)
+        else:
+            self.make_flags.append(0)
+
+    def detect_shots(self, tracks, court_player_positions, ball_possession, num_frames=None):
+        """
+        Detecta los tiros de los frames [0, num_frames) (por defecto todos) sin dibujar nada.
+        Devuelve (eventos, línea temporal), donde la línea temporal guarda en arrays de NumPy
+        lo que se muestra en pantalla tras cada frame:
+
+        - "team_stats" (F, 4): aciertos e intentos de los equipos 1 y 2.
+        - "marker_counts" (F, 2): aciertos y fallos ya marcados en el minimapa.
+        - "trajectory_range" (F, 2): intervalo [inicio, fin) de la trayectoria en "trajectory".
+        - "make_flags" (F,): 1 si se muestra el aviso de canasta.
+        - "trajectory" (T, 2), "make_positions" (M, 2) y "fail_positions" (K, 2).
+
+        Con ella cualquier frame se puede dibujar por separado (ver set_timeline_state).
+        Las cajas del balón se leen como un array denso (ver get_ball_boxes).
+        """
+        self.reset()
+        if num_frames is None:
+            num_frames = len(tracks["ball"])
+        ball_boxes, has_ball = get_ball_boxes(tracks["ball"], num_frames)
+
+        team_stats = np.zeros((num_frames, 4), dtype=np.int32)
+        marker_counts = np.zeros((num_frames, 2), dtype=np.int32)
+        trajectory_range = np.zeros((num_frames, 2), dtype=np.int64)
+        trajectory = []
+
+        for frame_idx in range(num_frames):
+            trajectory_length = len(self.trajectory_points)
+            self.update_frame(frame_idx,
+                              {"bbox": ball_boxes[frame_idx].tolist()} if has_ball[frame_idx] else {},
+                              tracks["net"][frame_idx],
+                              court_player_positions[frame_idx],
+                              ball_possession[frame_idx])
+
+            # La trayectoria solo crece de uno en uno o se vacía, así que basta con un registro global
+            if len(self.trajectory_points) > trajectory_length:
+                trajectory.append(self.trajectory_points[-1])
+            team_stats[frame_idx] = (self.team_stats[1]["makes"], self.team_stats[1]["attempts"],
+                                     self.team_stats[2]["makes"], self.team_stats[2]["attempts"])
+            marker_counts[frame_idx] = (len(self.make_positions), len(self.fail_positions))
+            trajectory_range[frame_idx] = (len(trajectory) - len(self.trajectory_points), len(trajectory))
+
+        timeline = {
+            "team_stats": team_stats,
+            "marker_counts": marker_counts,
+            "trajectory_range": trajectory_range,
+            "make_flags": np.array(self.make_flags[:num_frames], dtype=np.uint8),
+            "trajectory": np.array(trajectory, dtype=np.int32).reshape(-1, 2),
+            "make_positions": np.array(self.make_positions, dtype=np.float64).reshape(-1, 2),
+            "fail_positions": np.array(self.fail_positions, dtype=np.float64).reshape(-1, 2),
+        }
+        return self.events, timeline
+
+    def set_timeline_state(self, timeline, frame_idx):
+        """
+        Carga el estado de dibujo del frame `frame_idx` de la línea temporal de detect_shots.
+        Las capas de trayectoria y minimapa se reconstruyen si el frame no es el siguiente al anterior.
+        """
+        makes1, attempts1, makes2, attempts2 = timeline["team_stats"][frame_idx].tolist()
+        num_makes, num_fails = timeline["marker_counts"][frame_idx].tolist()
+        start, end = timeline["trajectory_range"][frame_idx].tolist()
+
+        self.team_stats = {1: {"makes": makes1, "attempts": attempts1}, 2: {"makes": makes2, "attempts": attempts2}}
+        self.make_positions = timeline["make_positions"][:num_makes].tolist()
+        self.fail_positions = timeline["fail_positions"][:num_fails].tolist()
+
+        if start != self.timeline_trajectory_start:
+            self.clear_trajectory_layer()
+            self.timeline_trajectory_start = start
+        self.trajectory_points = [tuple(point) for point in timeline["trajectory"][start:end].tolist()]
+
+    def draw_timeline_frame(self, frame, timeline, frame_idx, width, height):
+        """
+        Dibuja estadísticas, trayectoria y minimapa del frame `frame_idx` a partir de la línea temporal.
+        """
+        self.set_timeline_state(timeline, frame_idx)
+        return self.draw_frame(frame, width, height)
 
     def get_make_flags(self):
         return self.make_flags
@@ -267,23 +504,30 @@ class ShotDetector:
     def draw_scores_on_frames(self, video_frames, make_flags):
         output_frames = []
         for frame_idx, frame in enumerate(video_frames):
-            if make_flags[frame_idx] == 1:
-                text = "FIELD GOAL MADE"
-                frame_height, frame_width = frame.shape[:2]
-                font_scale = sv.calculate_optimal_text_scale((frame_width, frame_height))
-                thickness = sv.calculate_optimal_line_thickness((frame_width, frame_height))
-
-                anchor = sv.Point(x=int(frame_width * 0.1), y=int(frame_height * 0.05))
-
-                frame = sv.draw_text(
-                    scene=frame,
-                    text=text,
-                    text_anchor=anchor,
-                    text_color=sv.Color.from_hex("#00B000"),
-                    background_color=sv.Color.WHITE,
-                    text_scale=font_scale,
-                    text_thickness=thickness
-                )
-
+            frame = self.draw_score(frame, make_flags[frame_idx])
             output_frames.append(frame)
-        return output_frames 
\ No newline at end of file
+        return output_frames
+
+    def draw_score(self, frame, make_flag):
+        """
+        Muestra el aviso de canasta en un único frame si make_flag está activo.
+        """
+        if make_flag == 1:
+            text = "FIELD GOAL MADE"
+            frame_height, frame_width = frame.shape[:2]
+            font_scale = sv.calculate_optimal_text_scale((frame_width, frame_height))
+            thickness = sv.calculate_optimal_line_thickness((frame_width, frame_height))
+
+            anchor = sv.Point(x=int(frame_width * 0.1), y=int(frame_height * 0.05))
+
+            frame = sv.draw_text(
+                scene=frame,
+                text=text,
+                text_anchor=anchor,
+                text_color=sv.Color.from_hex("#00B000"),
+                background_color=sv.Color.WHITE,
+                text_scale=font_scale,
+                text_thickness=thickness
+            )
+
+        return frame
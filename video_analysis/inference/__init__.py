@@ -0,0 +1,6 @@
+from .joint_inference import JointInference
+from .keyframes import KeyframeSampler
+from .cache import InferenceCache, CachedInference
+from .backends import INFERENCE_BACKENDS, ExportedModel, load_model, export_model, check_backend_parity
+from .roi import RoiDetector
+from .registry import ModelRegistry, get_model_registry
\ No newline at end of file
@@ -0,0 +1,250 @@
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from ultralytics.utils.metrics import box_iou
+try:
+    from ultralytics.utils.nms import non_max_suppression
+except ImportError:  # versiones de ultralytics con el NMS en ops
+    from ultralytics.utils.ops import non_max_suppression
+from .joint_inference import JointInference
+
+INFERENCE_BACKENDS = ("torch", "onnx", "openvino")
+
+
+def check_backend(backend, int8=False):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {backend}")
+    if int8 and backend != "onnx":
+        raise ValueError("La cuantización INT8 dinámica solo está disponible con el backend 'onnx'.")
+
+
+def get_export_path(model_path, backend, int8=False):
+    """
+    Ruta del modelo exportado junto a los pesos, la misma que usa ultralytics al exportar.
+    """
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return f"{stem}.int8.onnx" if int8 else f"{stem}.onnx"
+    return os.path.join(f"{stem}_openvino_model", f"{os.path.basename(stem)}.xml")
+
+
+def is_up_to_date(path, model_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def export_model(model, model_path, backend, int8=False):
+    """
+    Exporta el modelo YOLO `model` (cargado de `model_path`) a ONNX u OpenVINO, con ejes
+    dinámicos para admitir cualquier tamaño de lote y de letterbox. Con `int8` el ONNX se
+    cuantiza además con la cuantización dinámica de ONNX Runtime (pesos en 8 bits, sin
+    datos de calibración). Las exportaciones se reutilizan mientras los pesos no cambien.
+    Devuelve la ruta del modelo exportado.
+    """
+    path = get_export_path(model_path, backend, int8)
+    if is_up_to_date(path, model_path):
+        return path
+
+    if backend == "openvino":
+        model.export(format="openvino", dynamic=True)
+        return path
+
+    onnx_path = get_export_path(model_path, "onnx")
+    if not is_up_to_date(onnx_path, model_path):
+        model.export(format="onnx", dynamic=True)
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        # QUInt8: el kernel ConvInteger de la CPU no admite pesos con signo
+        quantize_dynamic(onnx_path, path, weight_type=QuantType.QUInt8)
+    return path
+
+
+class OnnxRuntimeRunner:
+    """
+    Ejecuta un modelo ONNX en la CPU con ONNX Runtime y `num_threads` hilos intra-op.
+    """
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, im):
+        return self.session.run(None, {self.input_name: im})[0]
+
+
+class OpenVINORunner:
+    """
+    Ejecuta un modelo OpenVINO (.xml) en la CPU con `num_threads` hilos de inferencia.
+    """
+    def __init__(self, path, num_threads=None):
+        import openvino
+
+        config = {"INFERENCE_NUM_THREADS": num_threads} if num_threads else {}
+        core = openvino.Core()
+        self.model = core.compile_model(core.read_model(path), "CPU", config)
+
+    def __call__(self, im):
+        return self.model(im)[0]
+
+
+class ExportedModel:
+    """
+    Modelo YOLO exportado con la interfaz que usan Tracker, CourtKeypointDetector y
+    JointInference (`predict`, `names`, `model.stride` y `overrides`). La salida del modelo
+    pasa por el mismo NMS que aplica ultralytics, así que devuelve Results equivalentes:
+    en coordenadas del tensor si recibe un tensor ya preprocesado o en las del frame
+    original si recibe una lista de frames.
+    """
+    def __init__(self, runner, torch_model, backend, iou=0.7, max_det=300):
+        self.runner = runner
+        self.backend = backend
+        self.names = torch_model.names
+        self.task = torch_model.task
+        self.kpt_shape = torch_model.model.yaml.get("kpt_shape") if self.task == "pose" else None
+        self.end2end = getattr(torch_model.model, "end2end", False)
+        self.model = SimpleNamespace(stride=torch_model.model.stride)
+        self.overrides = {"imgsz": torch_model.overrides.get("imgsz", 640)}
+        self.iou = iou
+        self.max_det = max_det
+        self.letterbox = None
+
+    def to(self, device):
+        return self  # siempre en la CPU
+
+    def preprocess(self, frames):
+        if self.letterbox is None:
+            imgsz, stride = JointInference.get_input_spec(self)
+            self.letterbox = LetterBox(list(imgsz), auto=True, stride=stride)
+        im = np.stack([self.letterbox(image=frame) for frame in frames])
+        im = np.ascontiguousarray(im[..., ::-1].transpose((0, 3, 1, 2)))  # BGR a RGB, BHWC a BCHW
+        return torch.from_numpy(im).float().div_(255)
+
+    def predict(self, source, conf=0.25, device=None, **kwargs):
+        frames = None
+        im = source
+        if not isinstance(source, torch.Tensor):
+            frames = list(source)
+            im = self.preprocess(frames)
+
+        preds = torch.from_numpy(np.asarray(self.runner(im.cpu().numpy())))
+        nms_options = {"end2end": True} if self.end2end else {}
+        detections = non_max_suppression(preds, conf, self.iou, max_det=self.max_det,
+                                         nc=0 if self.task == "detect" else len(self.names), **nms_options)
+
+        input_image = np.broadcast_to(np.zeros((), dtype=np.uint8), tuple(im.shape[2:]) + (3,))
+        results = []
+        for i, pred in enumerate(detections):
+            keypoints = pred[:, 6:].view(pred.shape[0], *self.kpt_shape) if self.kpt_shape else None
+            result = Results(input_image, path="", names=self.names, boxes=pred[:, :6], keypoints=keypoints)
+            if frames is not None:
+                result = JointInference.to_frame_coordinates(result, im.shape[2:], frames[i])
+            results.append(result)
+        return results
+
+
+def load_model(model_path, backend="torch", device=None, int8=False, num_threads=None):
+    """
+    Carga un modelo YOLO con el backend indicado: "torch" (ultralytics, en `device`), "onnx"
+    (ONNX Runtime, opcionalmente cuantizado a INT8) u "openvino". Los dos últimos se ejecutan
+    en la CPU con `num_threads` hilos y necesitan instalar onnx/onnxruntime u openvino.
+    """
+    check_backend(backend, int8)
+    model = YOLO(model_path)
+    if backend == "torch":
+        return model.to(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+
+    path = export_model(model, model_path, backend, int8)
+    runner = OnnxRuntimeRunner(path, num_threads) if backend == "onnx" else OpenVINORunner(path, num_threads)
+    return ExportedModel(runner, model, f"{backend}-int8" if int8 else backend)
+
+
+# =======================
+# COMPROBACIÓN DE PARIDAD
+# =======================
+def match_results(reference, candidate, iou_threshold=0.5):
+    """
+    Empareja las cajas de dos Results del mismo frame (misma clase, mayor IoU primero).
+    Devuelve (pares (i_referencia, i_candidato, iou), cajas de referencia, cajas candidatas).
+    """
+    ref_boxes = reference.boxes.data if reference.boxes is not None else torch.zeros((0, 6))
+    cand_boxes = candidate.boxes.data if candidate.boxes is not None else torch.zeros((0, 6))
+    if not len(ref_boxes) or not len(cand_boxes):
+        return [], len(ref_boxes), len(cand_boxes)
+
+    iou = box_iou(ref_boxes[:, :4].float(), cand_boxes[:, :4].float()).numpy()
+    iou[ref_boxes[:, 5].numpy()[:, None] != cand_boxes[:, 5].numpy()[None, :]] = 0
+
+    pairs = []
+    for flat_idx in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat_idx, iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        if all(i != p[0] and j != p[1] for p in pairs):
+            pairs.append((int(i), int(j), float(iou[i, j])))
+    return pairs, len(ref_boxes), len(cand_boxes)
+
+
+def compare_results(reference_results, candidate_results, iou_threshold=0.5):
+    """
+    Métricas de paridad entre dos listas de Results (una por frame): recall y precisión de
+    las cajas candidatas respecto a las de referencia, IoU medio de las parejas y error medio
+    (en píxeles) de sus keypoints.
+    """
+    matched, num_reference, num_candidate = 0, 0, 0
+    ious, keypoint_errors = [], []
+    for reference, candidate in zip(reference_results, candidate_results):
+        pairs, ref_count, cand_count = match_results(reference, candidate, iou_threshold)
+        matched += len(pairs)
+        num_reference += ref_count
+        num_candidate += cand_count
+        ious += [iou for _, _, iou in pairs]
+
+        if pairs and reference.keypoints is not None and candidate.keypoints is not None:
+            ref_idx = [i for i, _, _ in pairs]
+            cand_idx = [j for _, j, _ in pairs]
+            ref_xy = reference.keypoints.data[ref_idx, :, :2]
+            cand_xy = candidate.keypoints.data[cand_idx, :, :2]
+            keypoint_errors.append(float((ref_xy - cand_xy).norm(dim=-1).mean()))
+
+    return {
+        "recall": round(matched / num_reference, 4) if num_reference else 1.0,
+        "precision": round(matched / num_candidate, 4) if num_candidate else 1.0,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "keypoint_error_px": round(float(np.mean(keypoint_errors)), 3) if keypoint_errors else None,
+    }
+
+
+def check_backend_parity(frames, tracker_model_path, keypoint_model_path, backend, int8=False, num_threads=None,
+                         batch_size=20):
+    """
+    Ejecuta la inferencia conjunta de los dos modelos sobre `frames` con PyTorch y con el
+    backend indicado, y devuelve las métricas de paridad de cada modelo y los tiempos de ambos.
+    """
+    timings = {}
+    outputs = {}
+    for name, options in (("torch", {"backend": "torch", "device": "cpu"}),
+                          (backend, {"backend": backend, "int8": int8, "num_threads": num_threads})):
+        inference = JointInference(load_model(tracker_model_path, **options),
+                                   load_model(keypoint_model_path, **options),
+                                   batch_size=batch_size)
+        inference.predict(frames[:1])  # calentamiento
+        start = time.perf_counter()
+        outputs[name] = inference.predict(frames)
+        timings[name] = time.perf_counter() - start
+
+    return {
+        "detection": compare_results(outputs["torch"][0], outputs[backend][0]),
+        "keypoints": compare_results(outputs["torch"][1], outputs[backend][1]),
+        "torch_ms_per_frame": round(timings["torch"] * 1000 / len(frames), 2),
+        "backend_ms_per_frame": round(timings[backend] * 1000 / len(frames), 2),
+        "speedup": round(timings["torch"] / timings[backend], 2),
+    }
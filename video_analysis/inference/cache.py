@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+# Hash de cada fichero ya leído en este proceso, por (ruta, tamaño, fecha de modificación)
+_file_hashes = {}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    SHA-256 del contenido de un fichero. Si no existe (p. ej. un modelo de ultralytics
+    referenciado solo por su nombre) se usa la propia ruta.
+    """
+    if not os.path.exists(path):
+        return hashlib.sha256(path.encode()).hexdigest()
+
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def result_to_arrays(result):
+    """
+    Cajas y keypoints de un Results de ultralytics como arrays de NumPy (None si no hay).
+    """
+    boxes = result.boxes.data.cpu().numpy().astype(np.float32) if result.boxes is not None else None
+    keypoints = result.keypoints.data.cpu().numpy().astype(np.float32) if result.keypoints is not None else None
+    return boxes, keypoints
+
+
+def pack_arrays(frames, names, prefix):
+    """
+    Convierte los arrays de result_to_arrays de todos los frames en arrays compactos: cajas y
+    keypoints de todos los frames concatenados más el número de filas de cada frame.
+    """
+    boxes = [b for b, _ in frames if b is not None and len(b)]
+    keypoints = [k for _, k in frames if k is not None and len(k)]
+    box_width = boxes[0].shape[1] if boxes else 6
+    keypoint_shape = keypoints[0].shape[1:] if keypoints else (0, 3)
+    return {
+        f"{prefix}_names": np.array(json.dumps({str(k): v for k, v in names.items()})),
+        f"{prefix}_has_boxes": np.array([b is not None for b, _ in frames], dtype=bool),
+        f"{prefix}_has_keypoints": np.array([k is not None for _, k in frames], dtype=bool),
+        f"{prefix}_box_counts": np.array([len(b) if b is not None else 0 for b, _ in frames], dtype=np.int32),
+        f"{prefix}_keypoint_counts": np.array([len(k) if k is not None else 0 for _, k in frames], dtype=np.int32),
+        f"{prefix}_boxes": np.concatenate(boxes) if boxes else np.zeros((0, box_width), np.float32),
+        f"{prefix}_keypoints": np.concatenate(keypoints) if keypoints else np.zeros((0,) + tuple(keypoint_shape), np.float32),
+    }
+
+
+class CachedResults:
+    """
+    Reconstruye los Results de ultralytics de cualquier frame a partir de los arrays de pack_arrays.
+    """
+    def __init__(self, arrays, prefix):
+        self.names = {int(k): v for k, v in json.loads(arrays[f"{prefix}_names"].item()).items()}
+        self.has_boxes = arrays[f"{prefix}_has_boxes"]
+        self.has_keypoints = arrays[f"{prefix}_has_keypoints"]
+        self.boxes = arrays[f"{prefix}_boxes"]
+        self.keypoints = arrays[f"{prefix}_keypoints"]
+        self.box_offsets = np.concatenate([[0], np.cumsum(arrays[f"{prefix}_box_counts"])])
+        self.keypoint_offsets = np.concatenate([[0], np.cumsum(arrays[f"{prefix}_keypoint_counts"])])
+
+    def __len__(self):
+        return len(self.has_boxes)
+
+    def get(self, frame_idx, frame):
+        boxes = None
+        if self.has_boxes[frame_idx]:
+            boxes = torch.from_numpy(self.boxes[self.box_offsets[frame_idx]:self.box_offsets[frame_idx + 1]])
+        keypoints = None
+        if self.has_keypoints[frame_idx]:
+            keypoints = torch.from_numpy(
+                self.keypoints[self.keypoint_offsets[frame_idx]:self.keypoint_offsets[frame_idx + 1]])
+        return Results(frame, path="", names=self.names, boxes=boxes, keypoints=keypoints)
+
+
+class InferenceCache:
+    """
+    Caché en disco de los resultados de inferencia, direccionada por contenido: la clave
+    combina el hash del video, el de los pesos de los modelos y los parámetros de la
+    inferencia. Cada entrada es un .npz con arrays compactos y, al superar `max_bytes`,
+    se eliminan las entradas usadas hace más tiempo (LRU por fecha de modificación).
+    """
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, video_path, model_paths, params):
+        description = {
+            "video": file_hash(video_path),
+            "models": [file_hash(path) for path in model_paths],
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key):
+        """
+        Devuelve el diccionario de arrays guardado con `key`, o None si no está en caché.
+        """
+        path = self.get_path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            # No está en caché, o la ha eliminado otro proceso que comparte la carpeta
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Entrada corrupta (p. ej. un disco lleno): se descarta y se vuelve a calcular
+            self.remove(path)
+            return None
+
+        try:
+            os.utime(path)  # marcar como usada recientemente
+        except FileNotFoundError:
+            pass
+        return arrays
+
+    def save(self, key, arrays):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)  # escritura atómica: nunca se lee una entrada a medias
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Elimina las entradas menos usadas hasta que la caché ocupe como mucho `max_bytes`.
+        Otros procesos pueden estar usando la misma carpeta: las entradas que desaparecen
+        mientras tanto simplemente se ignoran.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".npz") and path != keep:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(keep)
+            except FileNotFoundError:
+                pass
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class CachedInference:
+    """
+    Envuelve una JointInference con una InferenceCache. Si el video ya está en caché, los
+    resultados se reconstruyen sin ejecutar YOLO; si no, se infiere normalmente y `save()`
+    guarda lo inferido. Solo se cachean las salidas de los modelos, así que el tracking y
+    las etapas posteriores se recalculan siempre (p. ej. con otros umbrales de eventos).
+    """
+    def __init__(self, inference, cache, key):
+        self.inference = inference
+        self.cache = cache
+        self.key = key
+        self.num_frames = 0
+        # Salidas inferidas, ya como arrays (sin guardar los frames que referencian los Results)
+        self.recorded = {"detection": [], "keypoints": []}
+        self.names = {"detection": {}, "keypoints": {}}
+
+        arrays = cache.load(key)
+        self.cached = None
+        if arrays is not None:
+            self.cached = {name: CachedResults(arrays, name) for name in ("detection", "keypoints")}
+
+    @property
+    def hit(self):
+        return self.cached is not None
+
+    def predict(self, frames):
+        """
+        Igual que JointInference.predict; los frames deben llegar en orden desde el primero.
+        """
+        start = self.num_frames
+        self.num_frames += len(frames)
+
+        if self.cached is not None and self.num_frames <= len(self.cached["detection"]):
+            return tuple([self.cached[name].get(start + offset, frame) for offset, frame in enumerate(frames)]
+                         for name in ("detection", "keypoints"))
+
+        detections, keypoint_detections = self.inference.predict(frames)
+        for name, results in (("detection", detections), ("keypoints", keypoint_detections)):
+            for result in results:
+                self.names[name] = result.names or self.names[name]
+                self.recorded[name].append(result_to_arrays(result))
+        return detections, keypoint_detections
+
+    def save(self):
+        """
+        Guarda en caché los resultados inferidos (si se ha inferido el video completo).
+        """
+        if self.cached is None and self.recorded["detection"]:
+            arrays = {}
+            for name, frames in self.recorded.items():
+                arrays.update(pack_arrays(frames, self.names[name], name))
+            self.cache.save(self.key, arrays)
+        self.recorded = {"detection": [], "keypoints": []}
@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from ultralytics.utils import ops
+from ultralytics.utils.checks import check_imgsz
+
+
+class JointInference:
+    """
+    Ejecuta el modelo de detección y el de keypoints sobre los mismos lotes de frames,
+    recorriendo el video una sola vez. Cada lote se preprocesa (letterbox, BGR->RGB,
+    normalización y conversión a tensor) una única vez por tamaño de entrada y el tensor
+    se comparte entre los dos modelos; las predicciones se reescalan a las coordenadas
+    del frame original, igual que hace ultralytics internamente.
+
+    Con `prefetch=True` el preprocesado del siguiente lote se hace en un pool de hilos
+    mientras los modelos procesan el actual. Con un KeyframeSampler el modelo de keypoints
+    solo se ejecuta en los keyframes y el resto de frames se interpolan.
+
+    `imgsz` fija el tamaño de entrada de ambos modelos (por defecto, el de cada modelo).
+    Con un RoiDetector (`roi`) las detecciones de balón y red se completan con una segunda
+    pasada a resolución completa alrededor de sus últimas posiciones, de modo que la
+    pasada principal se puede hacer con un `imgsz` menor.
+
+    `chunk_size` es el número de frames de cada llamada a `predict` (None si no se conoce).
+    Con keyframes o ROI forma parte de los parámetros de `get_params`, porque ambos
+    dependen de dónde empieza y termina cada lote.
+    """
+    def __init__(self, detection_model, keypoint_model, device="cpu", batch_size=20, conf=0.5,
+                 prefetch=False, num_workers=2, keyframes=None, imgsz=None, roi=None, chunk_size=None):
+        if batch_size < 1:
+            raise ValueError("El tamaño de lote debe ser al menos 1.")
+
+        self.models = {"detection": detection_model, "keypoints": keypoint_model}
+        self.device = device
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.conf = conf
+        self.prefetch = prefetch
+        self.num_workers = num_workers
+        self.keyframes = keyframes
+        self.roi = roi
+
+        # Un letterbox por tamaño de entrada distinto; normalmente ambos modelos comparten uno
+        self.input_specs = {name: self.get_input_spec(model, imgsz) for name, model in self.models.items()}
+        self.letterboxes = {spec: LetterBox(list(spec[0]), auto=True, stride=spec[1])
+                            for spec in set(self.input_specs.values())}
+
+    def get_params(self):
+        """
+        Parámetros que afectan a las predicciones (p. ej. para la clave de InferenceCache).
+        El tamaño de lote y el de las llamadas a `predict` solo importan con keyframes (se
+        elige uno al final de cada lote) y con ROI (las ventanas salen del lote anterior).
+        """
+        params = {"conf": self.conf, "imgsz": {name: list(spec[0]) for name, spec in self.input_specs.items()}}
+        # Los backends exportados (ver ExportedModel) pueden dar predicciones algo distintas
+        backends = {name: getattr(model, "backend", "torch") for name, model in self.models.items()}
+        if any(backend != "torch" for backend in backends.values()):
+            params["backends"] = backends
+        if self.roi is not None:
+            params["roi"] = self.roi.get_params()
+        if self.keyframes is not None:
+            params["keyframes"] = {"stride": self.keyframes.stride,
+                                   "motion_threshold": self.keyframes.motion_threshold,
+                                   "interpolate": self.keyframes.interpolate}
+        if self.keyframes is not None or self.roi is not None:
+            params["batching"] = {"batch_size": self.batch_size, "chunk_size": self.chunk_size}
+        return params
+
+    @staticmethod
+    def get_input_spec(model, imgsz=None):
+        """
+        Devuelve (imgsz, stride) con los que el modelo haría el letterbox por defecto, o con
+        el tamaño `imgsz` si se indica.
+        """
+        stride = int(max(model.model.stride)) if hasattr(model.model, "stride") else 32
+        imgsz = check_imgsz(imgsz or model.overrides.get("imgsz", 640), stride=stride, min_dim=2)
+        return tuple(imgsz), stride
+
+    def preprocess(self, frames):
+        """
+        Convierte un lote de frames BGR en un tensor por cada tamaño de entrada.
+        """
+        tensors = {}
+        for spec, letterbox in self.letterboxes.items():
+            im = np.stack([letterbox(image=frame) for frame in frames])
+            im = np.ascontiguousarray(im[..., ::-1].transpose((0, 3, 1, 2)))  # BGR a RGB, BHWC a BCHW
+            tensors[spec] = torch.from_numpy(im).to(self.device).float().div_(255)
+        return tensors
+
+    def iter_batches(self, frames):
+        """
+        Genera (frames_del_lote, tensores_preprocesados) para cada lote.
+        """
+        batches = [frames[i:i + self.batch_size] for i in range(0, len(frames), self.batch_size)]
+
+        if not self.prefetch:
+            for batch in batches:
+                yield batch, self.preprocess(batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            futures = [pool.submit(self.preprocess, batch) for batch in batches[:self.num_workers]]
+            for i, batch in enumerate(batches):
+                tensors = futures[i].result()
+                futures[i] = None
+                if i + self.num_workers < len(batches):
+                    futures.append(pool.submit(self.preprocess, batches[i + self.num_workers]))
+                yield batch, tensors
+
+    def predict(self, frames):
+        """
+        Devuelve (detecciones, detecciones_keypoints): dos listas de Results de ultralytics
+        en coordenadas del frame original, una por frame.
+        """
+        outputs = {name: [] for name in self.models}
+
+        for batch, tensors in self.iter_batches(frames):
+            for name in self.models:
+                im = tensors[self.input_specs[name]]
+                if name == "keypoints" and self.keyframes is not None:
+                    outputs[name] += self.keyframes.predict(
+                        lambda indices: self.predict_tensor(name, im[indices], [batch[i] for i in indices]), batch)
+                else:
+                    results = self.predict_tensor(name, im, batch)
+                    if name == "detection" and self.roi is not None:
+                        results = self.roi.refine(batch, results)
+                    outputs[name] += results
+
+        return outputs["detection"], outputs["keypoints"]
+
+    def predict_tensor(self, name, im, frames):
+        results = self.models[name].predict(im, conf=self.conf, device=self.device)
+        return [self.to_frame_coordinates(result, im.shape[2:], frame)
+                for result, frame in zip(results, frames)]
+
+    @staticmethod
+    def to_frame_coordinates(result, input_shape, frame):
+        """
+        Reescala cajas y keypoints desde el tensor con letterbox al frame original.
+        """
+        boxes = None
+        if result.boxes is not None:
+            boxes = result.boxes.data.clone()
+            boxes[:, :4] = ops.scale_boxes(input_shape, boxes[:, :4], frame.shape)
+
+        keypoints = None
+        if result.keypoints is not None:
+            keypoints = ops.scale_coords(input_shape, result.keypoints.data.clone(), frame.shape)
+
+        return Results(frame, path=result.path, names=result.names, boxes=boxes, keypoints=keypoints)
@@ -0,0 +1,145 @@
+import cv2
+from ultralytics.engine.results import Results
+
+
+class KeyframeSampler:
+    """
+    Decide en qué frames se ejecuta el modelo de keypoints de la cancha y rellena el resto.
+
+    Un frame es keyframe si han pasado `stride` frames desde el anterior o si el movimiento
+    de la escena (diferencia media absoluta entre miniaturas en gris) respecto al último
+    keyframe supera `motion_threshold`. Los frames intermedios se interpolan linealmente
+    entre keyframes o, con `interpolate=False`, reutilizan el último keyframe (y por tanto
+    la misma homografía).
+
+    Para interpolar sin mirar más allá del lote actual, el último frame de cada lote es
+    siempre keyframe.
+    """
+    def __init__(self, stride=5, motion_threshold=None, interpolate=True, thumbnail_size=(64, 36)):
+        if stride < 1:
+            raise ValueError("El paso entre keyframes debe ser al menos 1.")
+
+        self.stride = stride
+        self.motion_threshold = motion_threshold
+        self.interpolate = interpolate
+        self.thumbnail_size = thumbnail_size
+        self.reset()
+
+    def reset(self):
+        self.last_thumbnail = None
+        self.last_result = None
+        self.frames_since_keyframe = 0
+        self.num_keyframes = 0
+        self.num_frames = 0
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+
+    def motion(self, thumbnail):
+        """
+        Medida barata de movimiento de cámara respecto al último keyframe (0-255).
+        """
+        return float(cv2.absdiff(thumbnail, self.last_thumbnail).mean())
+
+    def select(self, frames):
+        """
+        Devuelve los índices (dentro del lote) de los frames en los que hay que ejecutar el modelo.
+        """
+        keyframes = []
+        for i, frame in enumerate(frames):
+            self.frames_since_keyframe += 1
+            thumbnail = None
+
+            is_keyframe = self.last_thumbnail is None or self.frames_since_keyframe >= self.stride
+            if not is_keyframe and self.motion_threshold is not None:
+                thumbnail = self.thumbnail(frame)
+                is_keyframe = self.motion(thumbnail) > self.motion_threshold
+            if not is_keyframe and self.interpolate and i == len(frames) - 1:
+                is_keyframe = True
+
+            if is_keyframe:
+                self.last_thumbnail = thumbnail if thumbnail is not None else self.thumbnail(frame)
+                self.frames_since_keyframe = 0
+                keyframes.append(i)
+
+        self.num_keyframes += len(keyframes)
+        self.num_frames += len(frames)
+        return keyframes
+
+    def fill(self, frames, keyframe_results, frames_since_keyframe):
+        """
+        Completa un resultado por frame a partir de {índice_en_lote: Results} de los keyframes.
+        `frames_since_keyframe` es la distancia al último keyframe antes del lote.
+        """
+        indices = sorted(keyframe_results)
+        outputs = []
+
+        # Keyframe previo: el último del lote anterior, en un índice negativo
+        prev_idx, prev_result = -(frames_since_keyframe + 1), self.last_result
+        next_pos = 0
+
+        for i, frame in enumerate(frames):
+            if i in keyframe_results:
+                prev_idx, prev_result = i, keyframe_results[i]
+                next_pos += 1
+                outputs.append(prev_result)
+                continue
+
+            if not self.interpolate or next_pos >= len(indices) or prev_result is None:
+                outputs.append(self.copy_result(prev_result, frame))
+                continue
+
+            next_idx = indices[next_pos]
+            t = (i - prev_idx) / (next_idx - prev_idx)
+            outputs.append(self.interpolate_results(prev_result, keyframe_results[next_idx], t, frame))
+
+        self.last_result = prev_result
+        return outputs
+
+    def predict(self, model_predict, frames):
+        """
+        Ejecuta `model_predict(índices)` solo sobre los keyframes del lote y rellena el resto.
+        `model_predict` debe devolver un Results por índice, en coordenadas del frame.
+        """
+        frames_since_keyframe = self.frames_since_keyframe
+        indices = self.select(frames)
+        results = model_predict(indices) if indices else []
+        return self.fill(frames, dict(zip(indices, results)), frames_since_keyframe)
+
+    @staticmethod
+    def copy_result(result, frame):
+        if result is None:
+            return Results(frame, path="", names={}, keypoints=None)
+        return Results(frame, path=result.path, names=result.names,
+                       boxes=result.boxes.data if result.boxes is not None else None,
+                       keypoints=result.keypoints.data if result.keypoints is not None else None)
+
+    @staticmethod
+    def interpolate_results(prev_result, next_result, t, frame):
+        """
+        Interpola linealmente los keypoints de la primera detección. Los puntos que no
+        están detectados en ambos extremos se toman del keyframe más cercano.
+        """
+        nearest = prev_result if t < 0.5 else next_result
+        if (prev_result.keypoints is None or next_result.keypoints is None
+                or len(prev_result.keypoints.data) == 0 or len(next_result.keypoints.data) == 0):
+            return KeyframeSampler.copy_result(nearest, frame)
+
+        prev_kp = prev_result.keypoints.data[:1]
+        next_kp = next_result.keypoints.data[:1]
+        keypoints = nearest.keypoints.data[:1].clone()
+
+        both_detected = (prev_kp[..., :2] > 0).all(-1) & (next_kp[..., :2] > 0).all(-1)
+        blended = prev_kp * (1 - t) + next_kp * t
+        keypoints[both_detected] = blended[both_detected]
+
+        boxes = nearest.boxes.data[:1] if nearest.boxes is not None else None
+        return Results(frame, path=nearest.path, names=nearest.names, boxes=boxes, keypoints=keypoints)
+
+    def get_stats(self):
+        """
+        Fracción de frames en los que se ha ejecutado el modelo de keypoints.
+        """
+        ratio = self.num_keyframes / self.num_frames if self.num_frames else 0.0
+        return {"frames": self.num_frames, "keyframes": self.num_keyframes, "keyframe_ratio": ratio}
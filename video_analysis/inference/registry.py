@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from trackers import Tracker
+from court_keypoint_detector import CourtKeypointDetector
+from .joint_inference import JointInference
+from .backends import load_model, check_backend
+
+# Registro de cada proceso, por (modelo de detección, modelo de keypoints, backend)
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(tracker_model_path, keypoint_model_path, backend="torch", int8=False, num_threads=None):
+    """
+    Devuelve el ModelRegistry del proceso para esos pesos y backend (lo crea la primera vez).
+    """
+    key = (tracker_model_path, keypoint_model_path, backend, int8, num_threads)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ModelRegistry(tracker_model_path, keypoint_model_path,
+                                             backend=backend, int8=int8, num_threads=num_threads)
+        return _registries[key]
+
+
+class ModelRegistry:
+    """
+    Carga el Tracker y el CourtKeypointDetector una sola vez por proceso y los reutiliza
+    entre videos. Al cargarlos ejecuta `warmup_frames` frames negros de `warmup_shape`
+    por la inferencia conjunta, para que la preparación de ultralytics (backend, fusión de
+    capas) no se pague en el primer video.
+
+    `acquire()` entrega los modelos a un único trabajo a la vez y reinicia antes el estado
+    de tracking (ByteTrack y suavizado), de modo que cada video empieza igual que con un
+    Tracker recién creado. `get_stats()` da los tiempos de carga, calentamiento y trabajos.
+
+    `backend`, `int8` y `num_threads` eligen cómo se ejecutan los modelos (ver load_model);
+    con "onnx" u "openvino" la primera carga exporta los pesos si aún no se había hecho.
+    """
+    def __init__(self, tracker_model_path, keypoint_model_path, warmup_frames=1, warmup_shape=(720, 1280),
+                 backend="torch", int8=False, num_threads=None):
+        check_backend(backend, int8)
+        self.tracker_model_path = tracker_model_path
+        self.keypoint_model_path = keypoint_model_path
+        self.backend = backend
+        self.int8 = int8
+        self.num_threads = num_threads
+        self.warmup_frames = warmup_frames
+        self.warmup_shape = warmup_shape
+
+        self.tracker = None
+        self.court_keypoint_detector = None
+        self.lock = threading.Lock()
+        self.stats = {"backend": f"{backend}-int8" if int8 else backend, "load_ms": None, "warmup_ms": None,
+                      "jobs": 0, "total_job_ms": 0.0, "last_job": None}
+
+    @property
+    def model_paths(self):
+        return [self.tracker_model_path, self.keypoint_model_path]
+
+    @property
+    def loaded(self):
+        return self.tracker is not None
+
+    def load(self):
+        """
+        Carga y calienta los modelos si aún no lo están. Devuelve get_stats().
+        """
+        with self.lock:
+            self.load_models()
+        return self.get_stats()
+
+    def load_models(self):
+        if self.loaded:
+            return
+
+        start = time.perf_counter()
+        options = dict(backend=self.backend, int8=self.int8, num_threads=self.num_threads)
+        court_keypoint_detector = CourtKeypointDetector(self.keypoint_model_path,
+                                                        model=load_model(self.keypoint_model_path, **options))
+        tracker = Tracker(self.tracker_model_path, model=load_model(self.tracker_model_path, **options))
+        self.stats["load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        start = time.perf_counter()
+        if self.warmup_frames > 0:
+            frames = [np.zeros(self.warmup_shape + (3,), dtype=np.uint8)] * self.warmup_frames
+            JointInference(tracker.model, court_keypoint_detector.model, device=tracker.device,
+                           batch_size=self.warmup_frames).predict(frames)
+        self.stats["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        self.tracker = tracker
+        self.court_keypoint_detector = court_keypoint_detector
+
+    @contextmanager
+    def acquire(self):
+        """
+        Context manager que espera a que los modelos estén libres, los carga si hace falta y
+        devuelve el propio registro (con `tracker`, `court_keypoint_detector` y `model_paths`).
+        """
+        requested = time.perf_counter()
+        with self.lock:
+            acquired = time.perf_counter()
+            cold_start = not self.loaded
+            self.load_models()
+            self.tracker.reset()
+
+            start = time.perf_counter()
+            try:
+                yield self
+            finally:
+                job_ms = (time.perf_counter() - start) * 1000
+                self.stats["jobs"] += 1
+                self.stats["total_job_ms"] += job_ms
+                self.stats["last_job"] = {
+                    "wait_ms": round((acquired - requested) * 1000, 1),
+                    "setup_ms": round((start - acquired) * 1000, 1),
+                    "job_ms": round(job_ms, 1),
+                    "cold_start": cold_start,
+                }
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["total_job_ms"] = round(stats["total_job_ms"], 1)
+        stats["mean_job_ms"] = round(stats["total_job_ms"] / stats["jobs"], 1) if stats["jobs"] else None
+        return stats
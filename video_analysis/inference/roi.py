@@ -0,0 +1,219 @@
+import numpy as np
+import torch
+from torchvision.ops import batched_nms
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from .joint_inference import JointInference
+
+
+class RoiDetector:
+    """
+    Segunda pasada del modelo de detección, a resolución completa, solo en regiones de
+    interés (ROI) alrededor de las posiciones previstas del balón y de la red.
+    Así la pasada principal puede hacerse a baja resolución (jugadores, árbitros y
+    keypoints son grandes) y el coste de buscar el balón, que es muy pequeño, depende del
+    tamaño de la ROI y no del frame.
+
+    Cada ROI es una ventana de `roi_size` x `roi_size` píxeles del frame original que se
+    infiere sin reescalar. Las ventanas de un lote salen de lo visto hasta el lote anterior,
+    así que cada posición se extrapola con la velocidad de las dos últimas detecciones
+    (si solo había una caja de esa clase) y se sigue usando durante `max_age` frames. En
+    los frames en los que no se conoce el balón, si se pasa `search_spec` (imgsz, stride),
+    se vuelve a buscar en el frame completo a esa resolución.
+
+    Las detecciones de balón y red de las ROI se fusionan con las de la pasada principal
+    (NMS por clase); las del resto de clases no se tocan.
+    """
+    def __init__(self, model, roi_size=640, classes=("basketball", "net"), max_age=15, conf=0.5, iou=0.5,
+                 device="cpu", search_spec=None):
+        if roi_size < 32:
+            raise ValueError("La ROI debe medir al menos 32 píxeles.")
+
+        self.model = model
+        self.roi_size = roi_size
+        self.classes = classes
+        self.class_ids = [class_id for class_id, name in model.names.items() if name in classes]
+        self.ball_id = next((class_id for class_id, name in model.names.items() if name == classes[0]), None)
+        self.max_age = max_age
+        self.conf = conf
+        self.iou = iou
+        self.device = device
+        self.search_spec = search_spec
+
+        stride = int(max(model.model.stride)) if hasattr(model.model, "stride") else 32
+        self.letterbox = LetterBox((roi_size, roi_size), auto=True, stride=stride)
+        self.search_letterbox = None
+        if search_spec is not None:
+            self.search_letterbox = LetterBox(list(search_spec[0]), auto=True, stride=search_spec[1])
+        self.reset()
+
+    def reset(self):
+        self.frame_num = 0
+        self.last_seen = {}  # class_id: (cajas (k, 4), frame en que se vieron, velocidad (2,) en píxeles/frame)
+        self.stats = {"frames": 0, "rois": 0, "search_frames": 0, "roi_pixels": 0, "frame_pixels": 0}
+
+    def get_params(self):
+        return {"roi_size": self.roi_size, "classes": list(self.classes), "max_age": self.max_age, "iou": self.iou,
+                "search_imgsz": list(self.search_spec[0]) if self.search_spec is not None else None}
+
+    def get_stats(self):
+        """
+        Número de ROI y de búsquedas en frame completo, y fracción de píxeles inferidos en
+        las ROI respecto a los frames completos.
+        """
+        stats = dict(self.stats)
+        stats["roi_pixel_ratio"] = round(stats["roi_pixels"] / stats["frame_pixels"], 3) if stats["frame_pixels"] else 0.0
+        return stats
+
+    # =======================
+    # VENTANAS
+    # =======================
+    def get_window(self, box, frame_shape, shift=(0.0, 0.0)):
+        """
+        Ventana de `roi_size` centrada en la caja desplazada `shift` y ajustada para quedar
+        dentro del frame.
+        """
+        height, width = frame_shape[:2]
+        size_w, size_h = min(self.roi_size, width), min(self.roi_size, height)
+        cx, cy = (box[0] + box[2]) / 2 + shift[0], (box[1] + box[3]) / 2 + shift[1]
+        x0 = int(np.clip(round(cx - size_w / 2), 0, width - size_w))
+        y0 = int(np.clip(round(cy - size_h / 2), 0, height - size_h))
+        return x0, y0, x0 + size_w, y0 + size_h
+
+    def get_windows(self, frame_shape):
+        """
+        Ventanas del frame actual a partir de las últimas posiciones conocidas. Una caja que
+        ya cabe en otra ventana no genera una nueva. Devuelve (ventanas, si cubren el balón).
+        """
+        windows = []
+        ball_known = False
+        for class_id, (boxes, seen_at, velocity) in self.last_seen.items():
+            age = self.frame_num - seen_at
+            if age > self.max_age:
+                continue
+            ball_known |= class_id == self.ball_id
+            shift = velocity * age
+            for box in boxes + np.tile(shift, 2):
+                if not any(w[0] <= box[0] and w[1] <= box[1] and box[2] <= w[2] and box[3] <= w[3] for w in windows):
+                    windows.append(self.get_window(box, frame_shape))
+        return windows, ball_known
+
+    def update_last_seen(self, boxes):
+        """
+        Guarda las cajas de balón y red de un frame (tensor (n, 6) en coordenadas del frame).
+        """
+        if boxes is None or not len(boxes):
+            return
+        data = boxes.cpu().numpy()
+        for class_id in self.class_ids:
+            class_boxes = data[data[:, 5] == class_id, :4]
+            if not len(class_boxes):
+                continue
+            velocity = np.zeros(2)
+            previous = self.last_seen.get(class_id)
+            if previous is not None and len(previous[0]) == 1 and len(class_boxes) == 1 and previous[1] < self.frame_num:
+                centers = [(b[0, :2] + b[0, 2:]) / 2 for b in (previous[0], class_boxes)]
+                velocity = (centers[1] - centers[0]) / (self.frame_num - previous[1])
+            self.last_seen[class_id] = (class_boxes, self.frame_num, velocity)
+
+    # =======================
+    # INFERENCIA
+    # =======================
+    def predict_crops(self, crops, letterbox):
+        """
+        Infiere una lista de recortes del mismo tamaño y devuelve las cajas (n, 6) de balón
+        y red de cada uno, en coordenadas del recorte.
+        """
+        if not crops:
+            return []
+        im = np.stack([letterbox(image=crop) for crop in crops])
+        im = np.ascontiguousarray(im[..., ::-1].transpose((0, 3, 1, 2)))  # BGR a RGB, BHWC a BCHW
+        im = torch.from_numpy(im).to(self.device).float().div_(255)
+        outputs = []
+        for result, crop in zip(self.model.predict(im, conf=self.conf, device=self.device), crops):
+            result = JointInference.to_frame_coordinates(result, im.shape[2:], crop)
+            boxes = result.boxes.data if result.boxes is not None else torch.zeros((0, 6))
+            mask = torch.isin(boxes[:, 5].long(), torch.tensor(self.class_ids, device=boxes.device))
+            outputs.append(boxes[mask])
+        return outputs
+
+    def refine(self, frames, detections):
+        """
+        Mejora las detecciones de balón y red de un lote de frames consecutivos (en orden
+        desde el primer frame del video). `detections` son los Results de la pasada
+        principal, en coordenadas del frame. Devuelve los Results fusionados.
+        """
+        start = self.frame_num
+        windows_per_frame = []
+        search_frames = []  # frames sin posición reciente del balón
+        for offset, (frame, detection) in enumerate(zip(frames, detections)):
+            # Las ventanas de cada frame usan lo visto hasta el frame anterior
+            self.frame_num = start + offset
+            windows, ball_known = self.get_windows(frame.shape)
+            windows_per_frame.append(windows)
+            if not ball_known and self.search_letterbox is not None:
+                search_frames.append(offset)
+            self.update_last_seen(detection.boxes.data if detection.boxes is not None else None)
+
+        crops, owners = [], []
+        for offset, windows in enumerate(windows_per_frame):
+            for x0, y0, x1, y1 in windows:
+                crops.append(frames[offset][y0:y1, x0:x1])
+                owners.append((offset, x0, y0))
+
+        extra = [[] for _ in frames]
+        # Todas las ventanas miden lo mismo salvo en frames más pequeños que la ROI
+        for shape in {crop.shape for crop in crops}:
+            indices = [i for i, crop in enumerate(crops) if crop.shape == shape]
+            for i, boxes in zip(indices, self.predict_crops([crops[i] for i in indices], self.letterbox)):
+                offset, x0, y0 = owners[i]
+                boxes = boxes.clone()
+                boxes[:, [0, 2]] += x0
+                boxes[:, [1, 3]] += y0
+                extra[offset].append(boxes)
+
+        refined = [self.merge(detection, extra[offset], frame)
+                   for offset, (frame, detection) in enumerate(zip(frames, detections))]
+
+        # Si las ROI no encuentran el balón (p. ej. tras un pase largo) también se busca en el frame completo
+        if self.search_letterbox is not None:
+            search_frames += [offset for offset, result in enumerate(refined)
+                              if offset not in search_frames and not self.has_ball(result)]
+            for offset, boxes in zip(search_frames, self.predict_crops([frames[i] for i in search_frames],
+                                                                       self.search_letterbox)):
+                refined[offset] = self.merge(refined[offset], [boxes], frames[offset])
+
+        # Las posiciones para el siguiente lote salen de las detecciones ya fusionadas
+        for offset, result in enumerate(refined):
+            self.frame_num = start + offset
+            self.update_last_seen(result.boxes.data if result.boxes is not None else None)
+        self.frame_num = start + len(frames)
+
+        frame_pixels = sum(frame.shape[0] * frame.shape[1] for frame in frames)
+        self.stats["frames"] += len(frames)
+        self.stats["rois"] += len(crops)
+        self.stats["search_frames"] += len(search_frames)
+        self.stats["roi_pixels"] += sum(crop.shape[0] * crop.shape[1] for crop in crops)
+        self.stats["frame_pixels"] += frame_pixels
+        return refined
+
+    def has_ball(self, result):
+        return result.boxes is not None and bool((result.boxes.data[:, 5] == self.ball_id).any())
+
+    def merge(self, detection, extra_boxes, frame):
+        """
+        Añade las cajas de las ROI a las de la pasada principal y aplica NMS por clase solo
+        entre las de balón y red. Las cajas quedan ordenadas por confianza, como en ultralytics.
+        """
+        if not extra_boxes:
+            return detection
+
+        boxes = detection.boxes.data if detection.boxes is not None else torch.zeros((0, 6))
+        extra = torch.cat([b.to(boxes.device) for b in extra_boxes])
+        roi_mask = torch.isin(boxes[:, 5].long(), torch.tensor(self.class_ids, device=boxes.device))
+
+        candidates = torch.cat([boxes[roi_mask], extra])
+        keep = batched_nms(candidates[:, :4].float(), candidates[:, 4].float(), candidates[:, 5].long(), self.iou)
+        merged = torch.cat([boxes[~roi_mask], candidates[keep]])
+        merged = merged[torch.argsort(merged[:, 4], descending=True, stable=True)]
+        return Results(frame, path=detection.path, names=detection.names, boxes=merged)
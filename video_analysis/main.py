@@ -1,32 +1,163 @@
-from utils import read_video, save_video, get_metadata, assign_teams, save_events, save_video2
-from trackers import Tracker
+from utils import VideoDecoder, TrackStore, save_video, save_video_stream, get_metadata, assign_teams, save_events, save_video2
+from team_assigner import TeamAssigner
 import os
-from court_keypoint_detector import CourtKeypointDetector
 from ball_possession import BallPossession
 from view_transformer import Transformer
 import json
 from events import ShotDetector, PassDetector
+from pipeline import StreamingPipeline, Compositor, build_overlay_layers, ParallelRenderer, build_render_context
+from inference import JointInference, KeyframeSampler, InferenceCache, CachedInference, RoiDetector, get_model_registry
 import time
 import gc
 
-def process_video(input_video, output_video, court_image_path, shot_court_image_path, status_path, events_path):
+# Caché de resultados de inferencia (ver InferenceCache)
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Pesos de los modelos (se cargan una vez por proceso, ver ModelRegistry)
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+TRACKER_MODEL_PATH = os.path.join(MODELS_DIR, 'aisportsv2.pt')
+KEYPOINT_MODEL_PATH = os.path.join(MODELS_DIR, 'keypoint.pt')
+
+def write_status(status_path, msg, progress=None):
+    status = {"step": msg}
+    if progress is not None:
+        status["progress"] = progress
+    with open(status_path, "w") as f:
+        json.dump(status, f)
+
+def build_joint_inference(tracker, court_keypoint_detector, input_video, model_paths, batch_size=20, prefetch=False,
+                          keypoint_stride=1, motion_threshold=None, cache_dir=DEFAULT_CACHE_DIR,
+                          cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, imgsz=None, roi_size=None, chunk_size=None):
+    """
+    Crea la inferencia conjunta de los dos modelos. Si `keypoint_stride` > 1 o hay
+    `motion_threshold`, los keypoints de la cancha solo se infieren en keyframes.
+    `imgsz` fija la resolución de entrada de los modelos y `roi_size` activa la búsqueda
+    del balón y la red en ROI a resolución completa (ver RoiDetector); si `imgsz` es menor
+    que la resolución del modelo, cuando no se sabe dónde está el balón se busca en el
+    frame completo a la resolución del modelo.
+    `chunk_size` es el número de frames de cada llamada a predict (el tamaño de lote en el
+    modo por lotes y el de ventana en los demás); con keyframes o ROI forma parte de la
+    clave de la caché.
+    Con `cache_dir` los resultados se guardan en (o se recuperan de) una InferenceCache;
+    hay que llamar a save_inference_cache al terminar el análisis.
+    """
+    keyframes = None
+    if keypoint_stride > 1 or motion_threshold is not None:
+        keyframes = KeyframeSampler(stride=keypoint_stride, motion_threshold=motion_threshold)
+
+    roi = None
+    if roi_size is not None:
+        model_spec = JointInference.get_input_spec(tracker.model)
+        input_spec = JointInference.get_input_spec(tracker.model, imgsz)
+        roi = RoiDetector(tracker.model, roi_size=roi_size, device=tracker.device,
+                          search_spec=model_spec if max(input_spec[0]) < max(model_spec[0]) else None)
+
+    joint_inference = JointInference(tracker.model, court_keypoint_detector.model, device=tracker.device,
+                                     batch_size=batch_size, prefetch=prefetch, keyframes=keyframes,
+                                     imgsz=imgsz, roi=roi, chunk_size=chunk_size)
+    if cache_dir is None:
+        return joint_inference
+
+    cache = InferenceCache(cache_dir, max_bytes=cache_max_bytes)
+    cached_inference = CachedInference(joint_inference, cache,
+                                       cache.make_key(input_video, model_paths, joint_inference.get_params()))
+    if cached_inference.hit:
+        print("♻️ Resultados de inferencia recuperados de la caché")
+    return cached_inference
+
+def print_team_confidence(team_assigner):
+    confidences = list(team_assigner.player_team_confidence.values())
+    if confidences:
+        low = sum(confidence < 0.7 for confidence in confidences)
+        print(f"⛹️ Equipos por votación: {len(confidences)} pistas, confianza media "
+              f"{sum(confidences) / len(confidences):.2f}, {low} con menos del 70%")
+
+def save_inference_cache(joint_inference):
+    if isinstance(joint_inference, CachedInference):
+        joint_inference.save()
+
+def print_roi_stats(joint_inference):
+    inference = joint_inference.inference if isinstance(joint_inference, CachedInference) else joint_inference
+    if inference.roi is not None:
+        print(f"🔍 ROI de balón y red: {inference.roi.get_stats()}")
+
+def process_video(input_video, output_video, court_image_path, shot_court_image_path, status_path, events_path,
+                  streaming=False, window_size=64, two_pass=False, render_video=True,
+                  batch_size=20, prefetch=False, keypoint_stride=1, motion_threshold=None,
+                  homography_tolerance=0.0, render_workers=0, render_backend="process",
+                  cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, team_mode="first_sighting",
+                  model_registry=None, inference_backend="torch", int8=False, inference_threads=None,
+                  imgsz=None, roi_size=None):
     """
     Procesar un video de un partido de baloncesto para realizar la lógica de detecciones,
     análisis y mapeo de posiciones.
+
+    Con `streaming=True` los frames se procesan por bloques de `window_size` desde la
+    lectura hasta la codificación, sin cargar el video entero en memoria.
+    Con `two_pass=True` se analiza el video sin conservar frames y después se vuelve a
+    decodificar para dibujarlo; `render_video=False` omite esa segunda pasada y solo
+    genera el JSON de eventos.
+    `batch_size` y `prefetch` configuran la inferencia conjunta de los dos modelos YOLO;
+    `keypoint_stride` y `motion_threshold` activan la inferencia de keypoints por keyframes.
+    `homography_tolerance` (píxeles) permite reutilizar la homografía entre frames.
+    Con `render_workers` > 1 el video final se dibuja en paralelo con un pool de procesos
+    (o hilos, según `render_backend`); solo en el modo por lotes y en el de dos pasadas.
+    Las salidas de YOLO se guardan en una caché en `cache_dir` (None la desactiva) indexada
+    por el contenido del video, los pesos y los parámetros de inferencia: al reprocesar el
+    mismo video solo se recalculan el tracking y las etapas posteriores.
+    Con `team_mode="vote"` el equipo de cada pista se decide por votación con frames de
+    todo el video en lugar de con su primera aparición (no disponible en streaming).
+    Los modelos se toman de `model_registry` o, si no se pasa, del ModelRegistry del proceso,
+    que los carga en la primera llamada y los reutiliza en las siguientes. En ese caso
+    `inference_backend` ("torch", "onnx" u "openvino"), `int8` e `inference_threads` eligen
+    cómo se ejecutan (ver inference.load_model).
+    `imgsz` cambia la resolución de entrada de los modelos y `roi_size` activa la detección
+    del balón y la red en ROI a resolución completa, de modo que el resto de la inferencia
+    se puede hacer a menor resolución sin perder el balón (ver build_joint_inference).
+    """
+    if streaming and not (two_pass or not render_video) and team_mode != "first_sighting":
+        raise ValueError("El modo en streaming solo admite team_mode='first_sighting'.")
+
+    inference_options = dict(batch_size=batch_size, prefetch=prefetch,
+                             keypoint_stride=keypoint_stride, motion_threshold=motion_threshold,
+                             cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, imgsz=imgsz, roi_size=roi_size)
+    registry = model_registry or get_model_registry(TRACKER_MODEL_PATH, KEYPOINT_MODEL_PATH,
+                                                    backend=inference_backend, int8=int8,
+                                                    num_threads=inference_threads)
+    with registry.acquire() as models:
+        if two_pass or not render_video:
+            process_video_two_pass(input_video, output_video, court_image_path, shot_court_image_path,
+                                   status_path, events_path, models, window_size=window_size,
+                                   render_video=render_video, homography_tolerance=homography_tolerance,
+                                   render_workers=render_workers, render_backend=render_backend,
+                                   team_mode=team_mode, **inference_options)
+        elif streaming:
+            process_video_streaming(input_video, output_video, court_image_path, shot_court_image_path,
+                                    status_path, events_path, models, window_size=window_size,
+                                    homography_tolerance=homography_tolerance, **inference_options)
+        else:
+            process_video_batch(input_video, output_video, court_image_path, shot_court_image_path,
+                                status_path, events_path, models, homography_tolerance=homography_tolerance,
+                                render_workers=render_workers, render_backend=render_backend,
+                                team_mode=team_mode, **inference_options)
+        print(f"🏀 Seguimiento del balón: {models.tracker.ball_tracker.get_stats()}")
+    print(f"🔥 Modelos: {registry.get_stats()}")
+
+def process_video_batch(input_video, output_video, court_image_path, shot_court_image_path, status_path, events_path,
+                        models, batch_size=20, homography_tolerance=0.0, render_workers=0, render_backend="process",
+                        team_mode="first_sighting", **inference_options):
+    """
+    Modo por lotes de process_video: se decodifica el video entero y cada etapa lo recorre completo.
+    `models` es un ModelRegistry ya adquirido.
     """
     start_time = time.time()
     def set_status(msg, progress=None):
-        status = {"step": msg}
-        if progress is not None:
-            status["progress"] = progress
-        with open(status_path, "w") as f:
-            json.dump(status, f)
+        write_status(status_path, msg, progress)
 
     # =======================
     # 1️⃣ CONFIGURACIÓN INICIAL
     # =======================
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-
     if not os.path.exists(input_video) or not os.path.exists(court_image_path):
         raise FileNotFoundError("❌ Archivo de entrada o imagen de cancha no encontrado.")
 
@@ -34,55 +165,68 @@ def process_video(input_video, output_video, court_image_path, shot_court_image_
     print(f"📹 Procesando video: {input_video} - {video_metadata.num_frames} frames")
     set_status(f"📹 Procesando video: {input_video} - {video_metadata.num_frames} frames", 5)
     # =======================
-    # 2️⃣ LECTURA DE VIDEO
+    # 2️⃣ LECTURA DE VIDEO E INFERENCIA CONJUNTA (OBJETOS + PUNTOS CLAVE)
     # =======================
-    video_frames = read_video(input_video)
+    # El video se decodifica en segundo plano mientras los modelos procesan cada lote
+    print("🏀 Detectando objetos y puntos clave de la cancha...")
+    set_status("🏀 Detectando objetos y puntos clave de la cancha...", 10)
+    court_keypoint_detector = models.court_keypoint_detector
+    tracker = models.tracker
+    joint_inference = build_joint_inference(tracker, court_keypoint_detector, input_video, models.model_paths,
+                                            batch_size=batch_size, chunk_size=batch_size, **inference_options)
+    decoder = VideoDecoder(input_video, queue_size=batch_size)
+    video_frames, detections, keypoint_detections = [], [], []
+    for batch in decoder.batches(batch_size):
+        video_frames += batch
+        batch_detections, batch_keypoint_detections = joint_inference.predict(batch)
+        detections += batch_detections
+        keypoint_detections += batch_keypoint_detections
+    print(f"📼 Decodificación: {decoder.get_stats()}")
+    save_inference_cache(joint_inference)
+    print_roi_stats(joint_inference)
 
     if len(video_frames) != video_metadata.num_frames:
         print(f"⚠️ Advertencia: {len(video_frames)} frames obtenidos, se esperaban {video_metadata.num_frames}.")
 
-    # =======================
-    # 3️⃣ DETECCIÓN DE PUNTOS CLAVE DE LA CANCHA
-    # =======================
-    print("🏀 Detectando puntos clave de la cancha...")
-    set_status("🏀 Detectando puntos clave de la cancha...", 10)
-    keypoint_model_path = os.path.join(base_dir, 'models', 'keypoint.pt')
-    stub_path_kp = os.path.join(base_dir, 'stubs', 'kpunicaja.pkl')
-
-    court_keypoint_detector = CourtKeypointDetector(keypoint_model_path)
     court_keypoint_detector_perframe = court_keypoint_detector.get_court_keypoints(video_frames, 
-                                                                                   read_from_stub=False,
-                                                                                   stub_path=stub_path_kp)
-   
+                                                                                   detections=keypoint_detections)
     
     # =======================
-    # 4️⃣ DETECCIÓN Y SEGUIMIENTO DE OBJETOS
+    # 4️⃣ SEGUIMIENTO DE OBJETOS
     # =======================    
-    tracker_model_path = os.path.join(base_dir, 'models', 'aisportsv2.pt')
-    stub_path = os.path.join(base_dir, 'stubs', 'unicaja.pkl')
-    print("🏃‍♂️ Detectando y trackeando objetos...")
-    set_status("🏃‍♂️ Detectando y trackeando objetos...", 20)
-    tracker = Tracker(tracker_model_path)
+    print("🏃‍♂️ Trackeando objetos...")
+    set_status("🏃‍♂️ Trackeando objetos...", 20)
     tracks = tracker.get_object_tracks(video_frames, 
-                                       read_from_stub=False, 
-                                       stub_path=stub_path)
+                                       detections=detections)
+    del detections, keypoint_detections
 
     # =======================
     # 6️⃣ ASIGNACIÓN DE EQUIPOS
     # =======================
     print("⛹️ Asignando equipos...")
     set_status("⛹️ Asignando equipos...", 30)
+    team_assigner = TeamAssigner()
     tracks = assign_teams(video_frames, 
-                          tracks)
+                          tracks,
+                          team_mode=team_mode,
+                          team_assigner=team_assigner)
+    print_team_confidence(team_assigner)
 
     # =======================
     # 7️⃣ MAPEO DE POSICIONES
     # =======================
     print("📍 Realizando calculos para homografia...")
     set_status("📍 Realizando cálculos para homografia...", 50)
-    transformer = Transformer(court_image_path)
+    transformer = Transformer(court_image_path, homography_tolerance=homography_tolerance)
     court_keypoint_detector_perframe = transformer.validate_kp(court_keypoint_detector_perframe)
     court_player_positions = transformer.transform_players(court_keypoint_detector_perframe, tracks["players"])
+    print(f"📐 Homografía: {transformer.get_homography_stats()}")
+
+    # A partir de aquí las pistas se guardan en una tabla compacta y se leen con su vista de diccionarios
+    track_store = TrackStore.from_tracks(tracks, court_player_positions)
+    tracks = track_store.view()
+    court_player_positions = track_store.court_view()
+    print(f"🗃️ Pistas: {len(track_store.rows)} filas, {track_store.nbytes / 1e6:.1f} MB")
     
     # =======================
     # 8️⃣ CALCULAR POSESIÓN
@@ -109,6 +253,9 @@ def process_video(input_video, output_video, court_image_path, shot_court_image_
     set_status("🏀 Detectando tiros y pases...", 65)
    
     shot_detector = ShotDetector(shot_court_image_path, fps=video_metadata.fps)
+    # Igual que el minimapa, que usa los datos del frame anterior, se recorren todos los frames menos el último
+    shot_events, shot_timeline = shot_detector.detect_shots(tracks, court_player_positions, ball_possession,
+                                                            max(len(video_frames) - 1, 0))
     pass_detector = PassDetector(video_metadata.fps)
     pass_detector.detect_passes(ball_possession, player_assignment)
 
@@ -118,34 +265,29 @@ def process_video(input_video, output_video, court_image_path, shot_court_image_
     print("🎨 Dibujando anotaciones...")
     set_status("🎨 Dibujando anotaciones...", 70)
 
-    output_video_frames = tracker.draw_annotations(video_frames, tracks, ball_possession)
-    del video_frames 
-    gc.collect()
-    set_status("🎨 Dibujando anotaciones...", 75)
-    output_video_frames = court_keypoint_detector.draw_court_keypoints(output_video_frames, court_keypoint_detector_perframe)
-    set_status("🎨 Dibujando anotaciones...", 80)
-    output_video_frames = transformer.draw_court_overlay(output_video_frames, 
-                                          transformer.court_pic_path, 
-                                          transformer.width, 
-                                          transformer.height, 
-                                          transformer.key_points,
-                                          court_player_positions,
-                                          player_assignment,
-                                          ball_possession)      
-    
-    output_video_frames = ball_possession_detector.draw_possession(output_video_frames,
-                                                                   player_assignment,
-                                                                   ball_possession,
-                                                                   tracks["players"])
-
-    output_video_frames = shot_detector.draw_minimap_overlay(output_video_frames,
-                                                            court_player_positions,
-                                                            tracks,
-                                                            ball_possession,
-                                                            transformer.width,
-                                                            transformer.height)
-    make_flags = shot_detector.get_make_flags()
-    output_video_frames = shot_detector.draw_scores_on_frames(output_video_frames, make_flags)
+    team_ball_control = ball_possession_detector.get_team_ball_control(player_assignment, ball_possession)
+    possession_percentages = ball_possession_detector.get_possession_percentages(
+        ball_possession_detector.get_possession_counts(team_ball_control))
+    if render_workers > 1:
+        renderer = ParallelRenderer(build_render_context(tracks, court_keypoint_detector_perframe,
+                                                         court_player_positions, ball_possession,
+                                                         player_assignment, possession_percentages, shot_timeline,
+                                                         court_image_path, shot_court_image_path,
+                                                         video_metadata.fps),
+                                    num_workers=render_workers, backend=render_backend)
+        output_video_frames = None
+    else:
+        court_image = transformer.load_court_image(transformer.court_pic_path, transformer.width, transformer.height)
+        compositor = Compositor(build_overlay_layers(tracker, court_keypoint_detector, transformer,
+                                                     ball_possession_detector, shot_detector, court_image,
+                                                     tracks, court_keypoint_detector_perframe, court_player_positions,
+                                                     ball_possession, player_assignment, team_ball_control,
+                                                     possession_percentages=possession_percentages,
+                                                     shot_timeline=shot_timeline))
+        output_video_frames = compositor.compose_frames(video_frames)
+        del video_frames 
+        gc.collect()
+        print(f"⏱️ Tiempo de dibujo por capa: {compositor.get_timings()}")
 
 
 
@@ -156,12 +298,153 @@ def process_video(input_video, output_video, court_image_path, shot_court_image_
     set_status("💾 Guardando video...", 85)
     
     # 💾 Guardar los eventos detectados
-    events = shot_detector.get_events() + pass_detector.get_events()
+    events = shot_events + pass_detector.get_events()
     save_events(events, events_path)
 
     # Guardar el video 
-    save_video(output_video_frames, output_video, fps=video_metadata.fps)
+    if output_video_frames is None:
+        save_video_stream(renderer.render(video_frames), output_video, fps=video_metadata.fps)
+    else:
+        save_video(output_video_frames, output_video, fps=video_metadata.fps)
 
     end_time = time.time()
     elapsed_time = end_time - start_time
     set_status(f"✅ Video procesado. Tiempo total: {int(elapsed_time // 60)} minutos, {int(elapsed_time % 60)} segundos", 100)
+
+
+def process_video_streaming(input_video, output_video, court_image_path, shot_court_image_path, status_path, events_path,
+                            models, window_size=64, homography_tolerance=0.0, **inference_options):
+    """
+    Variante en streaming de process_video: mismos eventos y mismo video de salida,
+    con un consumo de memoria proporcional a `window_size` y no a la duración del video.
+    """
+    start_time = time.time()
+    def set_status(msg, progress=None):
+        write_status(status_path, msg, progress)
+
+    if not os.path.exists(input_video) or not os.path.exists(court_image_path):
+        raise FileNotFoundError("❌ Archivo de entrada o imagen de cancha no encontrado.")
+
+    video_metadata = get_metadata(input_video)
+    print(f"📹 Procesando video en streaming: {input_video} - {video_metadata.num_frames} frames (ventana {window_size})")
+    set_status(f"📹 Procesando video: {input_video} - {video_metadata.num_frames} frames", 5)
+
+    court_keypoint_detector = models.court_keypoint_detector
+    tracker = models.tracker
+    transformer = Transformer(court_image_path, homography_tolerance=homography_tolerance)
+    ball_possession_detector = BallPossession()
+    shot_detector = ShotDetector(shot_court_image_path, fps=video_metadata.fps)
+    pass_detector = PassDetector(video_metadata.fps)
+
+    joint_inference = build_joint_inference(tracker, court_keypoint_detector, input_video, models.model_paths,
+                                            chunk_size=window_size, **inference_options)
+
+    pipeline = StreamingPipeline(tracker,
+                                 court_keypoint_detector,
+                                 transformer,
+                                 ball_possession_detector,
+                                 shot_detector,
+                                 court_image_path,
+                                 window_size=window_size,
+                                 inference=joint_inference)
+
+    # Las etapas de análisis y dibujo avanzan a la vez: el progreso va del 10% al 85%
+    total_frames = max(video_metadata.num_frames, 1)
+    def on_progress(frames_done):
+        progress = 10 + int(75 * min(frames_done, total_frames) / total_frames)
+        set_status(f"🎨 Analizando y dibujando: {frames_done}/{video_metadata.num_frames} frames", progress)
+
+    print("🏀 Analizando y guardando video por bloques...")
+    set_status("🏀 Analizando y guardando video por bloques...", 10)
+    pipeline.run(input_video, output_video, video_metadata.fps, progress_callback=on_progress)
+    save_inference_cache(joint_inference)
+    print_roi_stats(joint_inference)
+    print(f"📐 Homografía: {transformer.get_homography_stats()}")
+    print(f"⏱️ Tiempo de dibujo por capa: {pipeline.compositor.get_timings()}")
+
+    print("🏀 Detectando pases...")
+    set_status("💾 Guardando eventos...", 90)
+    pass_detector.detect_passes(pipeline.ball_possession, pipeline.player_assignment)
+    events = shot_detector.get_events() + pass_detector.get_events()
+    save_events(events, events_path)
+
+    elapsed_time = time.time() - start_time
+    set_status(f"✅ Video procesado. Tiempo total: {int(elapsed_time // 60)} minutos, {int(elapsed_time % 60)} segundos", 100)
+
+def process_video_two_pass(input_video, output_video, court_image_path, shot_court_image_path, status_path, events_path,
+                           models, window_size=64, render_video=True, homography_tolerance=0.0, render_workers=0,
+                           render_backend="process", team_mode="first_sighting", **inference_options):
+    """
+    Variante en dos pasadas de process_video. La primera pasada ejecuta toda la analítica
+    guardando solo metadatos por frame; la segunda vuelve a leer el video y dibuja frame a
+    frame directamente en el codificador. Si `render_video` es False no se genera video.
+    """
+    start_time = time.time()
+    def set_status(msg, progress=None):
+        write_status(status_path, msg, progress)
+
+    if not os.path.exists(input_video) or not os.path.exists(court_image_path):
+        raise FileNotFoundError("❌ Archivo de entrada o imagen de cancha no encontrado.")
+
+    video_metadata = get_metadata(input_video)
+    print(f"📹 Procesando video en dos pasadas: {input_video} - {video_metadata.num_frames} frames")
+    set_status(f"📹 Procesando video: {input_video} - {video_metadata.num_frames} frames", 5)
+
+    court_keypoint_detector = models.court_keypoint_detector
+    tracker = models.tracker
+    transformer = Transformer(court_image_path, homography_tolerance=homography_tolerance)
+    ball_possession_detector = BallPossession()
+    shot_detector = ShotDetector(shot_court_image_path, fps=video_metadata.fps)
+    pass_detector = PassDetector(video_metadata.fps)
+
+    joint_inference = build_joint_inference(tracker, court_keypoint_detector, input_video, models.model_paths,
+                                            chunk_size=window_size, **inference_options)
+
+    pipeline = StreamingPipeline(tracker,
+                                 court_keypoint_detector,
+                                 transformer,
+                                 ball_possession_detector,
+                                 shot_detector,
+                                 court_image_path,
+                                 window_size=window_size,
+                                 inference=joint_inference,
+                                 team_mode=team_mode)
+
+    # =======================
+    # 1️⃣ PASADA DE ANÁLISIS
+    # =======================
+    total_frames = max(video_metadata.num_frames, 1)
+    def on_progress(frames_done):
+        progress = 10 + int(50 * min(frames_done, total_frames) / total_frames)
+        set_status(f"🏃‍♂️ Analizando: {frames_done}/{video_metadata.num_frames} frames", progress)
+
+    print("🏃‍♂️ Analizando video (sin conservar frames)...")
+    set_status("🏃‍♂️ Analizando video...", 10)
+    pipeline.analyze(input_video, progress_callback=on_progress)
+    save_inference_cache(joint_inference)
+    print_roi_stats(joint_inference)
+    print_team_confidence(pipeline.team_assigner)
+    print(f"📐 Homografía: {transformer.get_homography_stats()}")
+
+    print("🏀 Detectando tiros y pases...")
+    set_status("🏀 Detectando tiros y pases...", 65)
+    pass_detector.detect_passes(pipeline.ball_possession, pipeline.player_assignment)
+    shot_events = pipeline.detect_shots()
+
+    # =======================
+    # 2️⃣ PASADA DE DIBUJO
+    # =======================
+    if render_video:
+        print("🎨 Dibujando y guardando video...")
+        set_status("🎨 Dibujando y guardando video...", 70)
+        pipeline.render(input_video, output_video, video_metadata.fps,
+                        render_workers=render_workers, render_backend=render_backend)
+        if render_workers <= 1:
+            print(f"⏱️ Tiempo de dibujo por capa: {pipeline.compositor.get_timings()}")
+
+    set_status("💾 Guardando eventos...", 95)
+    events = shot_events + pass_detector.get_events()
+    save_events(events, events_path)
+
+    elapsed_time = time.time() - start_time
+    set_status(f"✅ Video procesado. Tiempo total: {int(elapsed_time // 60)} minutos, {int(elapsed_time % 60)} segundos", 100)
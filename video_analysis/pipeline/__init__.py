@@ -0,0 +1,3 @@
+from .streaming import StreamingPipeline
+from .compositor import Compositor, build_overlay_layers
+from .parallel import ParallelRenderer, build_render_context
\ No newline at end of file
@@ -0,0 +1,146 @@
+import time
+import numpy as np
+
+
+class Compositor:
+    """
+    Aplica una lista de capas de dibujo a cada frame en un único recorrido, mientras el
+    frame sigue en caché, en lugar de recorrer el video una vez por etapa.
+
+    Cada capa es una tupla (nombre, draw) con `draw(frame, frame_num)` que devuelve el
+    frame dibujado, o None para descartarlo (y no aplicar el resto de capas). El tiempo
+    de cada capa se acumula en `timings` y, si se pasa `timing_hook`, se notifica con
+    `timing_hook(nombre, frame_num, segundos)`.
+    """
+    def __init__(self, layers=None, timing_hook=None):
+        self.layers = []
+        self.timing_hook = timing_hook
+        self.timings = {}
+        self.num_frames = 0
+        for name, draw in layers or []:
+            self.add_layer(name, draw)
+
+    def add_layer(self, name, draw):
+        self.layers.append((name, draw))
+        self.timings.setdefault(name, 0.0)
+
+    def compose(self, frame, frame_num):
+        """
+        Dibuja todas las capas sobre un frame. Devuelve None si alguna capa lo descarta.
+        """
+        self.num_frames += 1
+        for name, draw in self.layers:
+            start = time.perf_counter()
+            frame = draw(frame, frame_num)
+            elapsed = time.perf_counter() - start
+
+            self.timings[name] += elapsed
+            if self.timing_hook is not None:
+                self.timing_hook(name, frame_num, elapsed)
+            if frame is None:
+                return None
+        return frame
+
+    def compose_frames(self, frames, start=0):
+        """
+        Compone una lista de frames consecutivos que empieza en el frame `start`.
+        """
+        output_frames = []
+        for offset, frame in enumerate(frames):
+            frame = self.compose(frame, start + offset)
+            if frame is not None:
+                output_frames.append(frame)
+        return output_frames
+
+    def compose_chunks(self, chunks):
+        """
+        Etapa para el pipeline en streaming: recibe y devuelve tuplas (primer_frame, frames).
+        """
+        for start, frames in chunks:
+            yield start, self.compose_frames(frames, start)
+
+    def get_timings(self):
+        """
+        Tiempo total y medio por frame (en ms) de cada capa.
+        """
+        return {name: {"total_ms": round(total * 1000, 1),
+                       "per_frame_ms": round(total * 1000 / self.num_frames, 3) if self.num_frames else 0.0}
+                for name, total in self.timings.items()}
+
+
+def build_overlay_layers(tracker, court_keypoint_detector, transformer, ball_possession_detector, shot_detector,
+                         court_image, tracks, court_keypoints, court_player_positions, ball_possession,
+                         player_assignment, team_ball_control, possession_percentages=None, shot_timeline=None):
+    """
+    Capas del video final, en el mismo orden que las antiguas etapas de dibujo.
+    Las listas de metadatos se leen en cada frame, así que pueden seguir creciendo
+    mientras se dibuja (modo en streaming). Los frames deben llegar en orden desde el 0.
+
+    Con `possession_percentages` (de BallPossession.get_possession_percentages) y
+    `shot_timeline` (de ShotDetector.detect_shots) ninguna capa depende del frame
+    anterior, así que los frames se pueden dibujar en cualquier orden (render en paralelo).
+
+    Igual que BallPossession.draw_possession, la capa de posesión descarta el primer frame
+    y el minimapa de tiros y el marcador usan los datos del frame anterior.
+    """
+    possession_counts = np.zeros(2, dtype=np.int64)
+
+    def draw_annotations(frame, frame_num):
+        return tracker.draw_frame(frame, frame_num, tracks, ball_possession[frame_num])
+
+    def draw_court_keypoints(frame, frame_num):
+        return court_keypoint_detector.draw_frame(frame, court_keypoints[frame_num])
+
+    def draw_court_overlay(frame, frame_num):
+        return transformer.draw_court_overlay_frame(frame, court_image, transformer.width, transformer.height,
+                                                    court_player_positions[frame_num],
+                                                    player_assignment[frame_num],
+                                                    ball_possession[frame_num])
+
+    def draw_possession(frame, frame_num):
+        if possession_percentages is not None:
+            if frame_num == 0:
+                return None
+            return ball_possession_detector.draw_frame(frame,
+                                                       possession_percentages[frame_num],
+                                                       player_assignment[frame_num],
+                                                       tracks["players"][frame_num])
+
+        if frame_num == 0:
+            possession_counts[:] = 0
+        possession_counts[0] += team_ball_control[frame_num] == 1
+        possession_counts[1] += team_ball_control[frame_num] == 2
+        if frame_num == 0:
+            return None
+        return ball_possession_detector.draw_frame(frame,
+                                                   ball_possession_detector.get_possession_percentages(possession_counts),
+                                                   player_assignment[frame_num],
+                                                   tracks["players"][frame_num])
+
+    def draw_shots(frame, frame_num):
+        data_idx = frame_num - 1
+        if shot_timeline is not None:
+            return shot_detector.draw_timeline_frame(frame, shot_timeline, data_idx,
+                                                     transformer.width, transformer.height)
+
+        return shot_detector.process_frame(frame,
+                                           data_idx,
+                                           tracks["ball"][data_idx].get(1, {}),
+                                           tracks["net"][data_idx],
+                                           court_player_positions[data_idx],
+                                           ball_possession[data_idx],
+                                           transformer.width,
+                                           transformer.height)
+
+    def draw_score(frame, frame_num):
+        make_flags = shot_timeline["make_flags"] if shot_timeline is not None else shot_detector.get_make_flags()
+        return shot_detector.draw_score(frame, make_flags[frame_num - 1])
+
+    return [
+        ("annotations", draw_annotations),
+        ("court_keypoints", draw_court_keypoints),
+        ("court_overlay", draw_court_overlay),
+        ("possession", draw_possession),
+        ("shots", draw_shots),
+        ("score", draw_score),
+    ]
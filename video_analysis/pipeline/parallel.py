@@ -0,0 +1,196 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .compositor import Compositor, build_overlay_layers
+from trackers import Tracker
+from court_keypoint_detector import CourtKeypointDetector
+from view_transformer import Transformer
+from ball_possession import BallPossession
+from events import ShotDetector
+
+# Compositor de cada worker (hilo o proceso), creado por init_worker
+worker_state = threading.local()
+
+
+def build_render_context(tracks, court_keypoints, court_player_positions, ball_possession, player_assignment,
+                         possession_percentages, shot_timeline, court_image_path, shot_court_image_path, fps):
+    """
+    Todo lo que necesita un worker para dibujar cualquier frame sin depender de los demás:
+    los metadatos del análisis, los porcentajes de posesión acumulados y la línea temporal
+    de tiros. Solo contiene datos, así que se puede enviar a otros procesos.
+    """
+    return {
+        "tracks": tracks,
+        "court_keypoints": court_keypoints,
+        "court_player_positions": court_player_positions,
+        "ball_possession": ball_possession,
+        "player_assignment": player_assignment,
+        "possession_percentages": possession_percentages,
+        "shot_timeline": shot_timeline,
+        "court_image_path": court_image_path,
+        "shot_court_image_path": shot_court_image_path,
+        "fps": fps,
+    }
+
+
+def create_render_compositor(context):
+    """
+    Crea objetos de dibujo propios (sin modelos) y un Compositor con las capas del video final.
+    """
+    transformer = Transformer(context["court_image_path"])
+    court_image = transformer.load_court_image(context["court_image_path"], transformer.width, transformer.height)
+    layers = build_overlay_layers(Tracker(model_path=None),
+                                  CourtKeypointDetector(model_path=None),
+                                  transformer,
+                                  BallPossession(),
+                                  ShotDetector(context["shot_court_image_path"], context["fps"]),
+                                  court_image,
+                                  context["tracks"],
+                                  context["court_keypoints"],
+                                  context["court_player_positions"],
+                                  context["ball_possession"],
+                                  context["player_assignment"],
+                                  team_ball_control=None,
+                                  possession_percentages=context["possession_percentages"],
+                                  shot_timeline=context["shot_timeline"])
+    return Compositor(layers)
+
+
+def init_worker(context):
+    # El paralelismo lo dan los workers; evitamos que cada uno abra además su pool de OpenCV
+    cv2.setNumThreads(1)
+    worker_state.compositor = create_render_compositor(context)
+
+
+def render_task(buffer, slot, frame_num, count):
+    """
+    Dibuja en su sitio los frames [slot, slot + count) del buffer, que corresponden a los
+    frames de video [frame_num, frame_num + count). `buffer` es un array (hilos) o el
+    par (nombre, forma) de un bloque de memoria compartida (procesos).
+    Devuelve, para cada frame, si se conserva en el video final.
+    """
+    if not isinstance(buffer, tuple):
+        return render_frames(buffer, slot, frame_num, count)
+
+    name, shape = buffer
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return render_frames(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf), slot, frame_num, count)
+    finally:
+        shm.close()
+
+
+def render_frames(frames, slot, frame_num, count):
+    kept = []
+    for offset in range(count):
+        frame = frames[slot + offset]
+        output = worker_state.compositor.compose(frame, frame_num + offset)
+        if output is not None and output is not frame:
+            frame[...] = output
+        kept.append(output is not None)
+    return kept
+
+
+class ParallelRenderer:
+    """
+    Dibuja el video final repartiendo bloques de frames entre un pool de procesos (o hilos).
+
+    Los frames se copian por ventanas en un buffer de memoria compartida y cada worker los
+    dibuja en su sitio, así que no se serializa ningún frame. Mientras los workers dibujan
+    una ventana se entrega la anterior, en orden, con dos buffers que se alternan.
+    Requiere un contexto de build_render_context: ninguna capa depende del frame anterior.
+    """
+    def __init__(self, context, num_workers=None, backend="process", frames_per_task=4):
+        if backend not in ("process", "thread"):
+            raise ValueError(f"Backend de render desconocido: {backend}")
+        if frames_per_task < 1:
+            raise ValueError("Cada tarea debe dibujar al menos un frame.")
+
+        self.context = context
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.backend = backend
+        self.frames_per_task = frames_per_task
+
+    def create_pool(self):
+        if self.backend == "process":
+            return ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_worker, initargs=(self.context,))
+        return ThreadPoolExecutor(max_workers=self.num_workers, initializer=init_worker, initargs=(self.context,))
+
+    def create_buffer(self, shape):
+        """
+        Devuelve (array, referencia para los workers, bloque de memoria compartida o None).
+        """
+        if self.backend == "thread":
+            frames = np.empty(shape, dtype=np.uint8)
+            return frames, frames, None
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf), (shm.name, shape), shm
+
+    def render(self, frames):
+        """
+        Recibe los frames del video en orden (lista o generador, empezando por el frame 0) y
+        genera listas de frames dibujados, en orden. Los frames entregados son vistas del
+        buffer y se sobrescriben después: hay que consumirlos (p. ej. con save_video_stream)
+        antes de pedir la siguiente lista.
+        """
+        frames = iter(frames)
+        first_frame = next(frames, None)
+        if first_frame is None:
+            return
+
+        window_size = self.num_workers * self.frames_per_task
+        shape = (window_size,) + first_frame.shape
+        buffers = [self.create_buffer(shape) for _ in range(2)]
+        pending_frame = first_frame
+
+        try:
+            with self.create_pool() as pool:
+                previous = None
+                start = 0
+                current = 0
+                while True:
+                    array, reference, _ = buffers[current]
+
+                    # Copiar la siguiente ventana en el buffer libre
+                    count = 0
+                    while count < window_size:
+                        frame = pending_frame if pending_frame is not None else next(frames, None)
+                        pending_frame = None
+                        if frame is None:
+                            break
+                        array[count] = frame
+                        count += 1
+                    if count == 0:
+                        break
+
+                    futures = [(slot, pool.submit(render_task, reference, slot, start + slot,
+                                                  min(self.frames_per_task, count - slot)))
+                               for slot in range(0, count, self.frames_per_task)]
+
+                    if previous is not None:
+                        yield from self.collect(*previous)
+
+                    previous = (array, futures)
+                    start += count
+                    current = 1 - current
+
+                if previous is not None:
+                    yield from self.collect(*previous)
+        finally:
+            blocks = [shm for _, _, shm in buffers if shm is not None]
+            buffers = previous = array = None
+            for shm in blocks:
+                shm.unlink()
+                try:
+                    shm.close()
+                except BufferError:
+                    pass  # Aún hay frames entregados en uso; la memoria se libera con ellos
+
+    @staticmethod
+    def collect(array, futures):
+        for slot, future in futures:
+            kept = future.result()
+            yield [array[slot + offset] for offset, keep in enumerate(kept) if keep]
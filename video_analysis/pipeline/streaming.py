@@ -0,0 +1,291 @@
+from team_assigner import TeamAssigner
+from .compositor import Compositor, build_overlay_layers
+from .parallel import ParallelRenderer, build_render_context
+from utils import (read_video_chunks, save_video_stream, assign_teams_frame, collect_team_colors,
+                   assign_teams_deferred, is_team_sample_frame, get_team_vote_stride, check_team_mode,
+                   get_metadata, TEAM_WARMUP_FRAMES, TrackStore)
+
+
+class StreamingPipeline:
+    """
+    Procesa un video por bloques de `window_size` frames encadenando generadores,
+    desde la decodificación hasta la codificación. Cada etapa recibe y devuelve
+    tuplas (primer_frame, frames) y solo se guardan en memoria los metadatos por frame.
+
+    La única dependencia global es el ajuste de colores de los equipos, que necesita
+    los primeros TEAM_WARMUP_FRAMES frames: esos bloques se retienen hasta completar
+    el ajuste. A partir de ahí la memoria es O(window_size), independiente de la
+    duración del video.
+
+    También admite un modo en dos pasadas: `analyze` recorre el video una vez sin
+    conservar ningún frame y `render` lo vuelve a decodificar para dibujar cada frame
+    directamente en el codificador (u omitir el video y quedarse con los eventos).
+
+    El dibujo lo hace un Compositor con todas las capas del video final; su
+    `get_timings()` da el coste de cada capa.
+
+    El BallTracker del Tracker rellena los huecos cortos del balón. Para que los que cruzan
+    el límite entre dos bloques también se rellenen en una sola pasada, la detección retiene
+    los últimos `max_gap` frames de cada bloque hasta analizar el siguiente, así que el
+    balón queda igual que en el modo por lotes.
+
+    Con `team_mode="vote"` (solo en dos pasadas) los equipos se deciden por votación con
+    frames de todo el video (ver TeamAssigner.vote_teams).
+    """
+    def __init__(self, tracker, court_keypoint_detector, transformer, ball_possession_detector,
+                 shot_detector, court_image_path, window_size=64, inference=None, timing_hook=None,
+                 team_mode="first_sighting"):
+        if window_size < 1:
+            raise ValueError("El tamaño de ventana debe ser al menos 1.")
+        check_team_mode(team_mode)
+
+        self.tracker = tracker
+        self.court_keypoint_detector = court_keypoint_detector
+        self.transformer = transformer
+        self.ball_possession_detector = ball_possession_detector
+        self.shot_detector = shot_detector
+        self.window_size = window_size
+        self.inference = inference
+        self.team_mode = team_mode
+
+        self.team_assigner = TeamAssigner()
+        self.court_image = transformer.load_court_image(court_image_path, transformer.width, transformer.height)
+
+        # Metadatos por frame acumulados durante el análisis
+        self.tracks = {"players": [], "referees": [], "ball": [], "net": []}
+        self.court_keypoints = []
+        self.court_player_positions = []
+        self.ball_possession = []
+        self.player_assignment = []
+        self.team_ball_control = []
+        self.shot_timeline = None
+        self.track_store = None
+        self.timing_hook = timing_hook
+
+        # Todas las capas de dibujo se aplican en un único recorrido por frame
+        self.compositor = Compositor(build_overlay_layers(tracker, court_keypoint_detector, transformer,
+                                                          ball_possession_detector, shot_detector, self.court_image,
+                                                          self.tracks, self.court_keypoints, self.court_player_positions,
+                                                          self.ball_possession, self.player_assignment,
+                                                          self.team_ball_control),
+                                     timing_hook=timing_hook)
+
+    def run(self, input_video, output_video, fps, progress_callback=None):
+        """
+        Ejecuta el pipeline completo y devuelve el número de frames escritos.
+        `progress_callback(frames_procesados)` se llama tras analizar cada bloque.
+        """
+        if self.team_mode != "first_sighting":
+            raise ValueError("En una sola pasada los equipos solo se pueden asignar con el primer color.")
+        self.ball_possession_detector.reset()
+        self.tracker.ball_tracker.reset()
+
+        chunks = self.decode_stage(input_video)
+        chunks = self.detection_stage(chunks)
+        chunks = self.team_stage(chunks)
+        chunks = self.mapping_stage(chunks, progress_callback)
+        chunks = self.compositor.compose_chunks(chunks)
+
+        return save_video_stream((frames for _, frames in chunks), output_video, fps=fps)
+
+    def analyze(self, input_video, progress_callback=None):
+        """
+        Primera pasada del modo en dos pasadas: detección, equipos, homografía y posesión.
+        De cada frame solo se guardan metadatos; los píxeles se descartan al terminar el bloque.
+        Al terminar, pistas y posiciones en la pista pasan a un TrackStore (ver `track_store`).
+        Devuelve el número de frames analizados.
+        """
+        self.ball_possession_detector.reset()
+        self.tracker.ball_tracker.reset()
+        vote_stride = get_team_vote_stride(get_metadata(input_video).num_frames) if self.team_mode == "vote" else None
+
+        for start, frames in self.detection_stage(self.decode_stage(input_video)):
+            for offset, frame in enumerate(frames):
+                frame_idx = start + offset
+                collect_team_colors(self.team_assigner, frame, frame_idx, self.tracks["players"][frame_idx],
+                                    vote_stride=vote_stride)
+
+            if progress_callback is not None:
+                progress_callback(start + len(frames))
+
+        # Con todo el video detectado también se rellenan los huecos del balón entre bloques
+        self.tracks["ball"] = self.tracker.get_ball_tracks(self.tracker.get_ball_trajectory()["boxes"])
+        assign_teams_deferred(self.team_assigner, self.tracks)
+
+        num_frames = len(self.tracks["players"])
+        self.map_frames(0, num_frames)
+
+        self.track_store = TrackStore.from_tracks(self.tracks, self.court_player_positions,
+                                                  self.team_assigner.team_colors)
+        self.tracks = self.track_store.view()
+        self.court_player_positions = self.track_store.court_view()
+        return num_frames
+
+    def render(self, input_video, output_video, fps, chunk_size=1, render_workers=0, render_backend="process"):
+        """
+        Segunda pasada: vuelve a decodificar el video y dibuja cada frame con los metadatos
+        de `analyze`, enviándolo directamente al codificador. Devuelve el número de frames escritos.
+        Con `render_workers` > 1 los frames se dibujan en paralelo (ver ParallelRenderer).
+        """
+        if render_workers > 1:
+            renderer = ParallelRenderer(self.build_render_context(), num_workers=render_workers, backend=render_backend)
+            frames = (frame for _, frames in self.decode_stage(input_video) for frame in frames)
+            return save_video_stream(renderer.render(frames), output_video, fps=fps)
+
+        # Con la línea temporal de tiros ya calculada el dibujo no guarda estado entre frames
+        self.compositor = Compositor(self.build_overlay_layers(), timing_hook=self.timing_hook)
+        chunks = self.decode_stage(input_video, chunk_size)
+        chunks = self.compositor.compose_chunks(chunks)
+
+        return save_video_stream((frames for _, frames in chunks), output_video, fps=fps)
+
+    def get_possession_percentages(self):
+        detector = self.ball_possession_detector
+        return detector.get_possession_percentages(detector.get_possession_counts(self.team_ball_control))
+
+    def build_overlay_layers(self):
+        """
+        Capas sin estado entre frames para la segunda pasada (requiere detect_shots).
+        """
+        return build_overlay_layers(self.tracker, self.court_keypoint_detector, self.transformer,
+                                    self.ball_possession_detector, self.shot_detector, self.court_image,
+                                    self.tracks, self.court_keypoints, self.court_player_positions,
+                                    self.ball_possession, self.player_assignment, self.team_ball_control,
+                                    possession_percentages=self.get_possession_percentages(),
+                                    shot_timeline=self.get_shot_timeline())
+
+    def build_render_context(self):
+        """
+        Prepara el contexto para dibujar los frames en paralelo, sin dependencias entre ellos.
+        """
+        return build_render_context(self.tracks, self.court_keypoints, self.court_player_positions, self.ball_possession,
+                                    self.player_assignment, self.get_possession_percentages(), self.get_shot_timeline(),
+                                    self.transformer.court_pic_path, self.shot_detector.court_pic_path,
+                                    self.shot_detector.fps)
+
+    def detect_shots(self):
+        """
+        Detecta los tiros sin dibujar, con los mismos frames que usa el minimapa (todos menos
+        el último, ver build_overlay_layers). Guarda la línea temporal para `render` y
+        devuelve los eventos.
+        """
+        events, self.shot_timeline = self.shot_detector.detect_shots(self.tracks, self.court_player_positions,
+                                                                     self.ball_possession,
+                                                                     max(len(self.tracks["ball"]) - 1, 0))
+        return events
+
+    def get_shot_timeline(self):
+        if self.shot_timeline is None:
+            self.detect_shots()
+        return self.shot_timeline
+
+    # =======================
+    # ETAPAS DE ANÁLISIS
+    # =======================
+    def decode_stage(self, input_video, chunk_size=None):
+        start = 0
+        for frames in read_video_chunks(input_video, chunk_size or self.window_size):
+            yield start, frames
+            start += len(frames)
+
+    def detection_stage(self, chunks):
+        """
+        Keypoints de la cancha y tracking de objetos. ByteTrack y el suavizado conservan
+        su estado en el Tracker, así que los bloques deben llegar en orden. Con una
+        JointInference ambos modelos comparten el preprocesado de cada lote.
+
+        Los últimos `max_gap` frames se devuelven con el bloque siguiente, cuando el
+        BallTracker ya ha rellenado los huecos del balón que terminan en él.
+        """
+        ball_tracker = self.tracker.ball_tracker
+        pending_start, pending = 0, []
+
+        for start, frames in chunks:
+            detections, keypoint_detections = None, None
+            if self.inference is not None:
+                detections, keypoint_detections = self.inference.predict(frames)
+
+            self.court_keypoints += self.court_keypoint_detector.get_court_keypoints(frames, detections=keypoint_detections)
+
+            chunk_tracks = self.tracker.get_object_tracks(frames, detections=detections)
+            for key in self.tracks:
+                self.tracks[key] += chunk_tracks[key]
+
+            frame_indices, boxes, _ = ball_tracker.get_revisions()
+            for frame_idx, ball_track in zip(frame_indices.tolist(), self.tracker.get_ball_tracks(boxes)):
+                self.tracks["ball"][frame_idx] = ball_track
+
+            pending += frames
+            ready = max(len(pending) - ball_tracker.max_gap, 0)
+            if ready:
+                yield pending_start, pending[:ready]
+                pending_start, pending = pending_start + ready, pending[ready:]
+
+        if pending:
+            yield pending_start, pending
+
+    def team_stage(self, chunks):
+        """
+        Ajusta los colores de los equipos con los primeros frames y asigna equipo a los
+        jugadores de cada bloque. Los bloques del calentamiento se retienen hasta que
+        el ajuste es definitivo.
+        """
+        pending = []
+        warmed_up = False
+
+        for start, frames in chunks:
+            for offset, frame in enumerate(frames):
+                frame_idx = start + offset
+                if is_team_sample_frame(frame_idx):
+                    self.team_assigner.assign_team_color(frame, self.tracks["players"][frame_idx])
+
+            if warmed_up:
+                yield self.assign_chunk_teams(start, frames)
+                continue
+
+            pending.append((start, frames))
+            if start + len(frames) >= TEAM_WARMUP_FRAMES:
+                warmed_up = True
+                for pending_start, pending_frames in pending:
+                    yield self.assign_chunk_teams(pending_start, pending_frames)
+                pending = []
+
+        # Videos más cortos que el calentamiento
+        for pending_start, pending_frames in pending:
+            yield self.assign_chunk_teams(pending_start, pending_frames)
+
+    def assign_chunk_teams(self, start, frames):
+        for offset, frame in enumerate(frames):
+            assign_teams_frame(self.team_assigner, frame, self.tracks["players"][start + offset])
+        return start, frames
+
+    def mapping_stage(self, chunks, progress_callback=None):
+        """
+        Homografía, posiciones en la pista táctica y posesión del balón.
+        """
+        for start, frames in chunks:
+            end = start + len(frames)
+            self.map_frames(start, end)
+
+            if progress_callback is not None:
+                progress_callback(end)
+
+            yield start, frames
+
+    def map_frames(self, start, end):
+        """
+        Valida keypoints, proyecta jugadores y calcula la posesión de los frames [start, end).
+        Solo usa metadatos, por lo que sirve igual para el modo en streaming y el de dos pasadas.
+        """
+        chunk_kp = self.transformer.validate_kp(self.court_keypoints[start:end])
+        self.court_keypoints[start:end] = chunk_kp
+        self.court_player_positions += self.transformer.transform_players(chunk_kp, self.tracks["players"][start:end])
+
+        chunk_possession = self.ball_possession_detector.update_frames(self.tracks["players"][start:end],
+                                                                       self.tracks["ball"][start:end])
+        chunk_assignment = [{player_id: info.get('team', -1) for player_id, info in frame_players.items()}
+                            for frame_players in self.tracks["players"][start:end]]
+
+        self.ball_possession += chunk_possession
+        self.player_assignment += chunk_assignment
+        self.team_ball_control += self.ball_possession_detector.get_team_ball_control(chunk_assignment, chunk_possession).tolist()
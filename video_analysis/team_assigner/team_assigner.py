@@ -1,69 +1,189 @@
-from sklearn.cluster import KMeans
+import cv2
+from sklearn.cluster import MiniBatchKMeans
 import numpy as np
-import supervision as sv
 
 class TeamAssigner:
-    def __init__(self):
+    """
+    Asigna equipo a los jugadores según el color de la camiseta.
+
+    Los colores de todos los jugadores de un frame se extraen a la vez: la parte
+    superior-central de cada caja se reduce a una miniatura y se toma la mediana de sus
+    píxeles en espacio Lab. Las muestras de los frames de calentamiento se acumulan y el
+    modelo de dos equipos (MiniBatchKMeans) se ajusta una sola vez, al pedir el primer equipo.
+    `team_colors` guarda el color BGR de cada equipo para dibujarlo.
+
+    Por defecto cada jugador se clasifica con su primer color válido. Con collect_track_colors
+    y vote_teams se muestrean frames de todo el video y el equipo de cada pista se decide por
+    mayoría entre sus muestras, con la fracción de votos como confianza.
+    """
+    def __init__(self, thumbnail_size=8, random_state=42):
         self.team_colors = {}      # team_id : color
         self.player_team_dict = {} # player_id : team_id
+        self.player_first_color = {} # player_id : (frame_idx, color)
         self.kmeans = None
 
-    def get_player_color(self, frame, bbox):
-        cropped = sv.crop_image(frame, np.array(bbox, dtype=int))
-        if cropped is None or cropped.size == 0:
-            return None
-
-        h, w, _ = cropped.shape
-
-        # Seleccionar una región amplia y representativa del cuerpo (parte superior-central)
-        start_y, end_y = 0, int(h * 0.6)  
-        start_x, end_x = int(w * 0.2), int(w * 0.8)  
-        region = cropped[start_y:end_y, start_x:end_x]
-
-        if region is None or region.size == 0:
-            return None
-
-        # Aplanar a una lista de píxeles
-        image_2d = region.reshape(-1, 3)
-        image_2d = np.unique(image_2d, axis=0)
-
-        if len(image_2d) < 2:
-            return None
-
-        # Aplicar KMeans para encontrar el color dominante
-        kmeans = KMeans(n_clusters=min(3, len(image_2d)), random_state=42).fit(image_2d)
-        labels, counts = np.unique(kmeans.labels_, return_counts=True)
-        dominant_cluster = labels[np.argmax(counts)]
-
-        return kmeans.cluster_centers_[dominant_cluster]
+        self.thumbnail_size = thumbnail_size
+        self.random_state = random_state
+        self.color_samples = []    # colores (N, 3) de cada frame de calentamiento
+        self.num_fitted_samples = 0
+
+        self.track_colors = {}     # player_id : colores muestreados para la votación
+        self.player_team_confidence = {} # player_id : fracción de votos del equipo elegido
+
+    def get_player_colors(self, frame, bboxes):
+        """
+        Color (Lab) de cada caja como array (N, 3); las cajas sin píxeles quedan a NaN.
+        """
+        colors = np.full((len(bboxes), 3), np.nan, dtype=np.float32)
+        if len(bboxes) == 0:
+            return colors
+
+        frame_height, frame_width = frame.shape[:2]
+        size = self.thumbnail_size
+        thumbnails = np.zeros((len(bboxes), size * size, 3), dtype=np.uint8)
+        valid = np.zeros(len(bboxes), dtype=bool)
+
+        boxes = np.array(bboxes, dtype=int).reshape(-1, 4)
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_height)
+        for i, (x1, y1, x2, y2) in enumerate(boxes.tolist()):
+            # Región amplia y representativa del cuerpo (parte superior-central)
+            w, h = x2 - x1, y2 - y1
+            region = frame[y1:y1 + int(h * 0.6), x1 + int(w * 0.2):x1 + int(w * 0.8)]
+            if region.size == 0:
+                continue
+            thumbnails[i] = cv2.resize(region, (size, size), interpolation=cv2.INTER_AREA).reshape(-1, 3)
+            valid[i] = True
+
+        # Una sola conversión a Lab para todas las miniaturas del frame
+        lab = cv2.cvtColor(thumbnails.reshape(-1, 1, 3), cv2.COLOR_BGR2LAB).reshape(len(bboxes), -1, 3)
+        colors[valid] = np.median(lab[valid], axis=1)
+        return colors
 
+    def get_player_color(self, frame, bbox):
+        color = self.get_player_colors(frame, [bbox])[0]
+        return None if np.isnan(color[0]) else color
 
     def assign_team_color(self, frame, player_detections):
-        player_colors = []
-        for _, detection in player_detections.items():
-            bbox = detection.get("bbox")
-            color = self.get_player_color(frame, bbox)
-            if color is not None:
-                player_colors.append(color)
-
-        if len(player_colors) < 2:
+        """
+        Añade los colores de los jugadores del frame a las muestras para ajustar los equipos.
+        """
+        colors = self.get_player_colors(frame, [detection.get("bbox") for detection in player_detections.values()])
+        colors = colors[~np.isnan(colors[:, 0])]
+        if len(colors):
+            self.color_samples.append(colors)
+
+    def fit(self):
+        """
+        Ajusta el modelo de dos equipos con todas las muestras acumuladas.
+        """
+        self.num_fitted_samples = len(self.color_samples)
+        colors = np.concatenate(self.color_samples) if self.color_samples else np.zeros((0, 3), np.float32)
+        if len(colors) < 2:
             return
 
-        kmeans = KMeans(n_clusters=2, random_state=42)
-        kmeans.fit(np.array(player_colors))
-        self.kmeans = kmeans
-        self.team_colors[1], self.team_colors[2] = kmeans.cluster_centers_
+        self.kmeans = MiniBatchKMeans(n_clusters=2, random_state=self.random_state, n_init=3).fit(colors)
+        lab_centers = np.clip(np.round(self.kmeans.cluster_centers_), 0, 255).astype(np.uint8).reshape(-1, 1, 3)
+        self.team_colors[1], self.team_colors[2] = cv2.cvtColor(lab_centers, cv2.COLOR_LAB2BGR).reshape(-1, 3).astype(np.float64)
+
+    def get_model(self):
+        if self.num_fitted_samples != len(self.color_samples):
+            self.fit()
+        return self.kmeans
+
+    def get_player_teams(self, frame, player_track):
+        """
+        Equipo de cada jugador de un frame {player_id: team_id}. Los jugadores nuevos se
+        clasifican juntos y su equipo se mantiene el resto del video; 0 si no se puede calcular.
+        """
+        kmeans = self.get_model()
+        new_ids = [player_id for player_id in player_track if player_id not in self.player_team_dict]
+        if kmeans is not None and new_ids:
+            colors = self.get_player_colors(frame, [player_track[player_id]["bbox"] for player_id in new_ids])
+            valid = ~np.isnan(colors[:, 0])
+            if valid.any():
+                teams = kmeans.predict(colors[valid]) + 1
+                for player_id, team_id in zip(np.array(new_ids)[valid].tolist(), teams.tolist()):
+                    self.player_team_dict[player_id] = team_id
+
+        return {player_id: self.player_team_dict.get(player_id, 0) for player_id in player_track}
 
     def get_player_team(self, frame, bbox, player_id):
-        if player_id in self.player_team_dict:
+        return self.get_player_teams(frame, {player_id: {"bbox": bbox}})[player_id]
+
+    def collect_player_colors(self, frame, player_track, frame_idx):
+        """
+        Guarda el color de cada jugador la primera vez que se puede calcular, para poder
+        asignarle equipo más tarde sin conservar el frame.
+        """
+        new_ids = [player_id for player_id in player_track if player_id not in self.player_first_color]
+        if not new_ids:
+            return
+
+        colors = self.get_player_colors(frame, [player_track[player_id]["bbox"] for player_id in new_ids])
+        for player_id, color in zip(new_ids, colors):
+            if not np.isnan(color[0]):
+                self.player_first_color[player_id] = (frame_idx, color)
+
+    def collect_track_colors(self, frame, player_track):
+        """
+        Guarda el color de cada jugador del frame para vote_teams. Los colores también se usan
+        como muestras para ajustar el modelo de equipos.
+        """
+        player_ids = list(player_track)
+        colors = self.get_player_colors(frame, [player_track[player_id]["bbox"] for player_id in player_ids])
+        valid = ~np.isnan(colors[:, 0])
+        if not valid.any():
+            return
+
+        self.color_samples.append(colors[valid])
+        for player_id, color in zip(np.array(player_ids)[valid].tolist(), colors[valid]):
+            self.track_colors.setdefault(player_id, []).append(color)
+
+    def vote_teams(self):
+        """
+        Decide el equipo de cada pista muestreada por mayoría de votos entre sus colores.
+        Los empates se resuelven con el color medio de la pista. Devuelve {player_id: confianza}.
+        """
+        kmeans = self.get_model()
+        if kmeans is None or not self.track_colors:
+            return {}
+
+        player_ids = list(self.track_colors)
+        counts = np.array([len(self.track_colors[player_id]) for player_id in player_ids])
+        colors = np.concatenate([np.array(self.track_colors[player_id]) for player_id in player_ids])
+
+        # Fracción de votos del equipo 2 en cada pista
+        owners = np.repeat(np.arange(len(player_ids)), counts)
+        team2_share = np.bincount(owners, weights=kmeans.predict(colors), minlength=len(player_ids)) / counts
+
+        mean_colors = np.add.reduceat(colors, np.concatenate([[0], np.cumsum(counts)[:-1]])) / counts[:, None]
+        ties = kmeans.predict(mean_colors.astype(colors.dtype)) + 1
+        teams = np.where(team2_share > 0.5, 2, np.where(team2_share < 0.5, 1, ties))
+        confidences = np.maximum(team2_share, 1 - team2_share)
+
+        for player_id, team_id, confidence in zip(player_ids, teams.tolist(), confidences.tolist()):
+            self.player_team_dict[player_id] = team_id
+            self.player_team_confidence[player_id] = confidence
+        return dict(self.player_team_confidence)
+
+    def get_deferred_player_team(self, player_id, frame_idx):
+        """
+        Equivalente a get_player_team usando los colores guardados con collect_player_colors:
+        antes del primer color válido del jugador devuelve 0, igual que get_player_team.
+        Las pistas decididas por votación tienen su equipo desde el primer frame.
+        """
+        if player_id in self.player_team_confidence:
             return self.player_team_dict[player_id]
-        if self.kmeans is None:
+
+        kmeans = self.get_model()
+        if kmeans is None:
             return 0
 
-        color = self.get_player_color(frame, bbox)
-        if color is None:
+        first_color = self.player_first_color.get(player_id)
+        if first_color is None or frame_idx < first_color[0]:
             return 0
 
-        team_id = self.kmeans.predict([color])[0] + 1
-        self.player_team_dict[player_id] = team_id
-        return team_id
+        if player_id not in self.player_team_dict:
+            self.player_team_dict[player_id] = int(kmeans.predict(first_color[1][np.newaxis])[0]) + 1
+        return self.player_team_dict[player_id]
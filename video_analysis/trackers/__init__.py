@@ -1 +1,2 @@
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .ball_tracker import BallTracker, interpolate_gaps
\ No newline at end of file
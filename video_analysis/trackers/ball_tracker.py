@@ -0,0 +1,198 @@
+import numpy as np
+
+
+def interpolate_gaps(boxes, confidence, max_gap, gap_confidence=0.5):
+    """
+    Rellena los huecos de hasta `max_gap` frames entre dos detecciones interpolando
+    linealmente las cajas (F, 4) (NaN en los frames sin balón). La confianza de cada frame
+    rellenado es la interpolada entre los extremos por `gap_confidence`. Los huecos al
+    principio o al final no se tocan. Devuelve (cajas, confianzas, máscara de rellenados).
+    """
+    boxes = boxes.copy()
+    confidence = confidence.copy()
+    interpolated = np.zeros(len(boxes), dtype=bool)
+
+    measured = np.flatnonzero(~np.isnan(boxes[:, 0]))
+    missing = np.flatnonzero(np.isnan(boxes[:, 0]))
+    if len(measured) < 2 or not len(missing):
+        return boxes, confidence, interpolated
+
+    # Detecciones anterior y siguiente de cada frame sin balón
+    following = np.searchsorted(measured, missing)
+    inside = (following > 0) & (following < len(measured))
+    missing, following = missing[inside], following[inside]
+    after = measured[following]
+    before = measured[following - 1]
+    short = after - before - 1 <= max_gap
+    missing, before, after = missing[short], before[short], after[short]
+
+    t = ((missing - before) / (after - before))[:, None]
+    boxes[missing] = boxes[before] * (1 - t) + boxes[after] * t
+    confidence[missing] = (confidence[before] * (1 - t[:, 0]) + confidence[after] * t[:, 0]) * gap_confidence
+    interpolated[missing] = True
+    return boxes, confidence, interpolated
+
+
+class BallTracker:
+    """
+    Seguimiento del balón con un filtro de Kalman de aceleración constante sobre el centro
+    de su caja (estado x, y, vx, vy, ax, ay en píxeles y frames). En cada frame se predice
+    la posición y, de todas las detecciones de balón, se queda la más cercana a la
+    predicción (distancia de Mahalanobis) dentro de la puerta `gate`; el resto se descartan
+    como falsos positivos. Tras `max_misses` frames sin detecciones dentro de la puerta el
+    balón se da por perdido y el filtro se reinicia con la detección más confiable.
+
+    El filtro solo decide qué detección es el balón: la caja de cada frame es la detectada.
+    Los huecos de hasta `max_gap` frames se rellenan con interpolate_gaps. El estado se
+    conserva entre llamadas a `track`, así que los frames deben llegar en orden. Para los
+    huecos entre dos llamadas se guardan los últimos `max_gap + 1` frames: la segunda
+    rellena sus frames y `get_revisions()` devuelve los de la anterior que ha rellenado.
+    `get_trajectory()` devuelve la trayectoria de todo el video con todos los huecos rellenados.
+    """
+    def __init__(self, max_gap=5, gate=13.8, max_misses=2, measurement_std=6.0, jerk_std=30.0,
+                 gap_confidence=0.5):
+        self.max_gap = max_gap
+        self.gate = gate  # chi-cuadrado con 2 grados de libertad (13.8: 99.9%)
+        self.max_misses = max_misses
+        self.gap_confidence = gap_confidence
+
+        # Modelo de aceleración constante por eje, con ruido en la sobreaceleración
+        transition = np.array([[1.0, 1.0, 0.5], [0.0, 1.0, 1.0], [0.0, 0.0, 1.0]])
+        jerk = np.array([[1 / 6], [1 / 2], [1.0]])
+        self.F = np.kron(transition, np.eye(2))
+        self.Q = np.kron(jerk @ jerk.T, np.eye(2)) * jerk_std ** 2
+        self.H = np.hstack([np.eye(2), np.zeros((2, 4))])
+        self.R = np.eye(2) * measurement_std ** 2
+        self.initial_covariance = np.diag([measurement_std ** 2] * 2 + [30.0 ** 2] * 2 + [5.0 ** 2] * 2)
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.covariance = None
+        self.misses = 0
+        # Cajas y confianzas sin rellenar de cada llamada, que se unen en get_trajectory
+        self.chunks = []
+        self.num_frames = 0
+        # Últimos max_gap + 1 frames (sin rellenar y si ya se rellenaron), para los huecos
+        # que empiezan en una llamada y terminan en la siguiente
+        self.recent_boxes = np.zeros((0, 4), dtype=np.float32)
+        self.recent_confidence = np.zeros(0, dtype=np.float32)
+        self.recent_interpolated = np.zeros(0, dtype=bool)
+        self.revisions = self.get_empty_revisions()
+        self.stats = {"frames": 0, "detected": 0, "rejected": 0, "interpolated": 0}
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    @staticmethod
+    def get_empty_revisions():
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    def get_revisions(self):
+        """
+        Frames de llamadas anteriores rellenados en la última llamada a `track` porque su
+        hueco terminaba en ella: (índices de frame (n,), cajas (n, 4), confianzas (n,)).
+        Son siempre de los últimos `max_gap` frames anteriores a esa llamada.
+        """
+        return self.revisions
+
+    # =======================
+    # FILTRO DE KALMAN
+    # =======================
+    def predict(self):
+        self.state = self.F @ self.state
+        self.covariance = self.F @ self.covariance @ self.F.T + self.Q
+
+    def correct(self, center):
+        innovation_covariance = self.H @ self.covariance @ self.H.T + self.R
+        gain = self.covariance @ self.H.T @ np.linalg.inv(innovation_covariance)
+        self.state = self.state + gain @ (center - self.H @ self.state)
+        self.covariance = (np.eye(6) - gain @ self.H) @ self.covariance
+
+    def select(self, boxes, confidence):
+        """
+        Avanza el filtro un frame con las detecciones de balón `boxes` (n, 4) y devuelve el
+        índice de la elegida, o -1 si ninguna es el balón.
+        """
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        if self.state is None:
+            if not len(boxes):
+                return -1
+            best = int(np.argmax(confidence))
+            self.state = np.concatenate([centers[best], np.zeros(4)])
+            self.covariance = self.initial_covariance.copy()
+            self.misses = 0
+            return best
+
+        self.predict()
+        best = -1
+        if len(boxes):
+            innovation = centers - self.H @ self.state
+            innovation_covariance = self.H @ self.covariance @ self.H.T + self.R
+            distance = np.einsum("ni,ij,nj->n", innovation, np.linalg.inv(innovation_covariance), innovation)
+            if distance.min() <= self.gate:
+                best = int(np.argmin(distance))
+            self.stats["rejected"] += len(boxes) - (best != -1)
+
+        if best == -1:
+            self.misses += 1
+            if self.misses >= self.max_misses:
+                self.state = None
+            return -1
+
+        self.misses = 0
+        self.correct(centers[best])
+        return best
+
+    # =======================
+    # TRAYECTORIA
+    # =======================
+    def track(self, candidates):
+        """
+        Sigue el balón en frames consecutivos. `candidates` tiene por frame una tupla
+        (cajas (n, 4), confianzas (n,)) con todas las detecciones de balón. Devuelve las
+        cajas (F, 4) en float32, con NaN en los frames sin balón, y su confianza (F,).
+        """
+        boxes = np.full((len(candidates), 4), np.nan, dtype=np.float32)
+        confidence = np.zeros(len(candidates), dtype=np.float32)
+        for frame_idx, (frame_boxes, frame_confidence) in enumerate(candidates):
+            best = self.select(np.asarray(frame_boxes, dtype=np.float64).reshape(-1, 4),
+                               np.asarray(frame_confidence, dtype=np.float64).reshape(-1))
+            if best != -1:
+                boxes[frame_idx] = frame_boxes[best]
+                confidence[frame_idx] = frame_confidence[best]
+
+        # Los huecos que empiezan en la llamada anterior se rellenan con sus últimos frames
+        history = len(self.recent_boxes)
+        filled_boxes, filled_confidence, interpolated = interpolate_gaps(
+            np.concatenate([self.recent_boxes, boxes]), np.concatenate([self.recent_confidence, confidence]),
+            self.max_gap, self.gap_confidence)
+        revised = np.flatnonzero(interpolated[:history] & ~self.recent_interpolated)
+        self.revisions = (self.num_frames - history + revised, filled_boxes[revised], filled_confidence[revised])
+
+        keep = self.max_gap + 1
+        interpolated[:history] |= self.recent_interpolated
+        self.recent_boxes = np.concatenate([self.recent_boxes, boxes])[-keep:]
+        self.recent_confidence = np.concatenate([self.recent_confidence, confidence])[-keep:]
+        self.recent_interpolated = interpolated[-keep:]
+        self.chunks.append((boxes, confidence))
+        self.num_frames += len(boxes)
+
+        self.stats["frames"] += len(candidates)
+        self.stats["detected"] += int((~np.isnan(boxes[:, 0])).sum())
+        self.stats["interpolated"] += int(interpolated[history:].sum()) + len(revised)
+        return filled_boxes[history:], filled_confidence[history:]
+
+    def get_trajectory(self):
+        """
+        Trayectoria de todos los frames desde el último reset, como arrays densos:
+        "boxes" (F, 4) (NaN sin balón), "confidence" (F,) e "interpolated" (F,).
+        """
+        if len(self.chunks) != 1:
+            boxes = np.concatenate([chunk_boxes for chunk_boxes, _ in self.chunks] + [np.zeros((0, 4), np.float32)])
+            confidence = np.concatenate([chunk_confidence for _, chunk_confidence in self.chunks]
+                                        + [np.zeros(0, np.float32)])
+            self.chunks = [(boxes, confidence)]
+        boxes, confidence = self.chunks[0]
+        boxes, confidence, interpolated = interpolate_gaps(boxes, confidence, self.max_gap, self.gap_confidence)
+        return {"boxes": boxes, "confidence": confidence, "interpolated": interpolated}
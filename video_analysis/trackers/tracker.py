@@ -4,30 +4,63 @@ import pickle
 import os
 import numpy as np
 import torch
+from utils import iter_frame_batches
+from .ball_tracker import BallTracker
 
 class Tracker:
-    def __init__(self, model_path):
+    def __init__(self, model_path, model=None):
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = YOLO(model_path).to(device)
+        # Sin modelo (model_path=None) el Tracker solo sirve para dibujar pistas ya calculadas.
+        # `model` permite pasar un modelo ya cargado (p. ej. con inference.load_model)
+        if model is None and model_path is not None:
+            model = YOLO(model_path).to(device)
+        self.model = model
         self.device = device
         self.tracker = sv.ByteTrack()
         self.smoother = sv.DetectionsSmoother(length=5)
+        self.ball_tracker = BallTracker()
+
+        # Anotadores reutilizados en todos los frames
+        self.triangle_annotator = sv.TriangleAnnotator(base=14, height=18, color=sv.Color(r=128, g=255, b=0))
+        self.circle_annotator = sv.CircleAnnotator(thickness=2, color=sv.Color(r=128, g=255, b=0))
+        self.ellipse_annotator = sv.EllipseAnnotator()
+        self.bbox_annotator = sv.RoundBoxAnnotator()
+        self.label_annotator = sv.LabelAnnotator(text_position=sv.Position.TOP_CENTER)
+        self.player_triangle_annotator = sv.TriangleAnnotator(base=18, height=18, color=sv.Color.RED)
+        self.player_annotators = {}  # paleta de colores de equipo : (elipse, etiqueta)
+
+    def reset(self):
+        """
+        Reinicia el estado de tracking (ByteTrack, suavizado y balón) para empezar otro
+        video con el mismo modelo, igual que con un Tracker nuevo.
+        """
+        self.tracker.reset()
+        self.smoother = sv.DetectionsSmoother(length=5)
+        self.ball_tracker.reset()
 
     def detect_frames(self, frames):
+        """
+        `frames` puede ser una lista de frames o un VideoDecoder (decodifica mientras se infiere).
+        """
         batch_size = 20
         detections = []
-        for i in range(0, len(frames), batch_size):
-            detections_batch = self.model.predict(frames[i:i + batch_size], conf=0.5, device=self.device)
+        for batch in iter_frame_batches(frames, batch_size):
+            detections_batch = self.model.predict(batch, conf=0.5, device=self.device)
             detections += detections_batch
         return detections
 
-    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None):
-
+    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None, detections=None):
+        """
+        Trackea jugadores, árbitros y red, y localiza el balón en cada frame con el
+        BallTracker, que elige entre todas sus detecciones y rellena los huecos cortos.
+        Si se pasan `detections` (p. ej. de JointInference) no se vuelve a ejecutar el modelo.
+        """
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path, 'rb') as f:
                 return pickle.load(f)
 
-        detections = self.detect_frames(frames)
+        if detections is None:
+            detections = self.detect_frames(frames)
 
         tracks = {
             "players": [],
@@ -36,6 +69,7 @@ class Tracker:
             "net": []
         }
 
+        ball_candidates = []
         for frame_idx, detection in enumerate(detections):
             class_names = detection.names
             class_id_map = {v: k for k, v in class_names.items()}
@@ -46,7 +80,6 @@ class Tracker:
 
             tracks["players"].append({})
             tracks["referees"].append({})
-            tracks["ball"].append({})
             tracks["net"].append({})
 
             # Para jugadores, árbitros y red (trackeados)
@@ -62,17 +95,14 @@ class Tracker:
                 elif class_id == class_id_map["net"]:
                     tracks["net"][frame_idx][track_id] = {"bbox": bbox}
 
-            # Para el balón (no trackeado)
-            ball_found = False
-            for i in range(len(sv_detections.xyxy)):
-                class_id = int(sv_detections.class_id[i])
-                if class_id == class_id_map["basketball"]:
-                    bbox = sv_detections.xyxy[i].tolist()
-                    tracks["ball"][frame_idx][1] = {"bbox": bbox}  # Solo un balón con ID 1
-                    ball_found = True
+            # Para el balón, todas las detecciones (el BallTracker elige una)
+            is_ball = sv_detections.class_id == class_id_map["basketball"]
+            ball_confidence = sv_detections.confidence[is_ball] if sv_detections.confidence is not None else None
+            ball_candidates.append((sv_detections.xyxy[is_ball],
+                                    ball_confidence if ball_confidence is not None else np.ones(is_ball.sum())))
 
-            if not ball_found:
-                tracks["ball"][frame_idx][1] = {}  # Marcado como no encontrado
+        ball_boxes, _ = self.ball_tracker.track(ball_candidates)
+        tracks["ball"] = self.get_ball_tracks(ball_boxes)
 
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
@@ -80,70 +110,100 @@ class Tracker:
 
         return tracks
 
+    @staticmethod
+    def get_ball_tracks(ball_boxes):
+        """
+        Pasa las cajas del balón (F, 4) (NaN: sin balón) al formato de `tracks["ball"]`:
+        un balón con ID 1 por frame, con diccionario vacío si no se encontró.
+        """
+        found = ~np.isnan(ball_boxes[:, 0])
+        return [{1: {"bbox": bbox}} if is_found else {1: {}}
+                for bbox, is_found in zip(ball_boxes.tolist(), found.tolist())]
+
+    def get_ball_trajectory(self):
+        """
+        Trayectoria densa del balón en todo el video (ver BallTracker.get_trajectory).
+        """
+        return self.ball_tracker.get_trajectory()
+
+    def get_player_annotators(self, palette):
+        """
+        Anotadores de elipse y etiqueta para una paleta de colores BGR (uno por equipo).
+        Se crean una vez por combinación de colores y se reutilizan en el resto de frames.
+        """
+        if palette not in self.player_annotators:
+            color_palette = sv.ColorPalette([sv.Color(r=c[2], g=c[1], b=c[0]) for c in palette])
+            self.player_annotators[palette] = (
+                sv.EllipseAnnotator(color=color_palette, thickness=3),
+                sv.LabelAnnotator(text_position=sv.Position.BOTTOM_CENTER, color=color_palette)
+            )
+        return self.player_annotators[palette]
+
     def draw_annotations(self, frames, tracks, ball_possession):
-        triangle_annotator = sv.TriangleAnnotator(base=14, height=18, color=sv.Color(r=128, g=255, b=0))
-        circle_annotator = sv.CircleAnnotator(thickness=2, color=sv.Color(r=128, g=255, b=0))
-        ellipse_annotator = sv.EllipseAnnotator()
-        bbox_annotator = sv.RoundBoxAnnotator()
-        label_annotator = sv.LabelAnnotator(text_position=sv.Position.TOP_CENTER)
-        player_triangle_annotator = sv.TriangleAnnotator(base=18, height=18, color=sv.Color.RED)
-
-        
         output_frames = []
         for frame_idx, frame in enumerate(frames):
-            #frame = frame.copy()
-
-            # Jugadores
-            players = tracks["players"][frame_idx]
-            player_with_ball_id = ball_possession[frame_idx]
-            for track_id, player in players.items():
-                player_color = player.get("team_color",(0,0,255))
-                player_ellipse_annotator = sv.EllipseAnnotator(color=sv.Color(r=player_color[2], g=player_color[1], b=player_color[0]),thickness=3)
-                player_label_annotator = sv.LabelAnnotator(text_position=sv.Position.BOTTOM_CENTER, color=sv.Color(r=player_color[2], g=player_color[1], b=player_color[0]))
-                det = sv.Detections(
-                    xyxy=np.array([player["bbox"]]),
-                    class_id=np.array([0]),
-                    tracker_id=np.array([int(track_id)])
-                )
-                frame = player_ellipse_annotator.annotate(scene=frame, detections=det)
-                frame = player_label_annotator.annotate(scene=frame, detections=det, labels=[f"Player #{track_id}"])
-                if track_id == player_with_ball_id:
-                    frame = player_triangle_annotator.annotate(scene=frame, detections=det)
-
-            # Árbitros
-            referees = tracks["referees"][frame_idx]
-            for rid, rdata in referees.items():
-                det = sv.Detections(
-                    xyxy=np.array([rdata["bbox"]]),
-                    class_id=np.array([1]),
-                    tracker_id=np.array([int(rid)])
-                )
-                frame = ellipse_annotator.annotate(scene=frame, detections=det)
-                frame = label_annotator.annotate(scene=frame, detections=det, labels=["Referee"])
-
-            # Balón
-            ball_data = tracks["ball"][frame_idx].get(1)
-            if ball_data and "bbox" in ball_data:
-                bbox = ball_data["bbox"]
-                det = sv.Detections(
-                    xyxy=np.array([bbox]),
-                    class_id=np.array([2]),
-                    tracker_id=np.array([1])
-                )
-                frame = circle_annotator.annotate(scene=frame, detections=det)
-                frame = triangle_annotator.annotate(scene=frame, detections=det)
-
-            # Red
-            nets = tracks["net"][frame_idx]
-            for nid, net_data in nets.items():
-                det = sv.Detections(
-                    xyxy=np.array([net_data["bbox"]]),
-                    class_id=np.array([3]),
-                    tracker_id=np.array([int(nid)])
-                )
-                frame = bbox_annotator.annotate(scene=frame, detections=det)
-                frame = label_annotator.annotate(scene=frame, detections=det, labels=["Net"])
-
+            frame = self.draw_frame(frame, frame_idx, tracks, ball_possession[frame_idx])
             output_frames.append(frame)
 
-        return output_frames
\ No newline at end of file
+        return output_frames
+
+    def draw_frame(self, frame, frame_idx, tracks, player_with_ball_id):
+        """
+        Dibuja jugadores, árbitros, balón y red de un único frame.
+        """
+        #frame = frame.copy()
+
+        # Jugadores: una sola Detections y una llamada por anotador, con el color por equipo
+        players = tracks["players"][frame_idx]
+        if players:
+            track_ids = list(players.keys())
+            colors = [tuple(float(c) for c in player.get("team_color", (0, 0, 255))) for player in players.values()]
+            palette = list(dict.fromkeys(colors))
+            det = sv.Detections(
+                xyxy=np.array([player["bbox"] for player in players.values()]),
+                class_id=np.array([palette.index(color) for color in colors]),
+                tracker_id=np.array([int(track_id) for track_id in track_ids])
+            )
+            player_ellipse_annotator, player_label_annotator = self.get_player_annotators(tuple(palette))
+            frame = player_ellipse_annotator.annotate(scene=frame, detections=det)
+            frame = player_label_annotator.annotate(scene=frame, detections=det,
+                                                    labels=[f"Player #{track_id}" for track_id in track_ids])
+            if player_with_ball_id in players:
+                frame = self.player_triangle_annotator.annotate(scene=frame,
+                                                                detections=det[track_ids.index(player_with_ball_id)])
+
+        # Árbitros
+        referees = tracks["referees"][frame_idx]
+        if referees:
+            det = sv.Detections(
+                xyxy=np.array([rdata["bbox"] for rdata in referees.values()]),
+                class_id=np.full(len(referees), 1),
+                tracker_id=np.array([int(rid) for rid in referees])
+            )
+            frame = self.ellipse_annotator.annotate(scene=frame, detections=det)
+            frame = self.label_annotator.annotate(scene=frame, detections=det, labels=["Referee"] * len(referees))
+
+        # Balón
+        ball_data = tracks["ball"][frame_idx].get(1)
+        if ball_data and "bbox" in ball_data:
+            bbox = ball_data["bbox"]
+            det = sv.Detections(
+                xyxy=np.array([bbox]),
+                class_id=np.array([2]),
+                tracker_id=np.array([1])
+            )
+            frame = self.circle_annotator.annotate(scene=frame, detections=det)
+            frame = self.triangle_annotator.annotate(scene=frame, detections=det)
+
+        # Red
+        nets = tracks["net"][frame_idx]
+        if nets:
+            det = sv.Detections(
+                xyxy=np.array([net_data["bbox"] for net_data in nets.values()]),
+                class_id=np.full(len(nets), 3),
+                tracker_id=np.array([int(nid) for nid in nets])
+            )
+            frame = self.bbox_annotator.annotate(scene=frame, detections=det)
+            frame = self.label_annotator.annotate(scene=frame, detections=det, labels=["Net"] * len(nets))
+
+        return frame
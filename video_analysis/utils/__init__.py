@@ -1,3 +1,5 @@
-from .video_utils import read_video, save_video, get_metadata, save_events, frame_to_time, save_video2
+from .video_utils import read_video, read_video_chunks, VideoDecoder, iter_frame_batches, save_video, save_video_stream, FFmpegWriter, get_metadata, save_events, frame_to_time, save_video2
 from .bbox_utils import get_center_of_bbox, get_width_of_bbox, measure_distance, measure_xy_distance, get_foot_position, get_key_points
-from .team_utils import assign_teams
\ No newline at end of file
+from .team_utils import assign_teams, assign_teams_frame, collect_team_colors, assign_teams_deferred, is_team_sample_frame, get_team_vote_stride, check_team_mode, TEAM_WARMUP_FRAMES, TEAM_SAMPLE_STRIDE, TEAM_MODES
+from .keypoint_utils import keypoints_to_array
+from .track_store import TrackStore, TrackView, TrackFrames, TRACK_CLASSES, get_ball_boxes
\ No newline at end of file
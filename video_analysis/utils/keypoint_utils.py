@@ -0,0 +1,22 @@
+import numpy as np
+
+def keypoints_to_array(court_keypoints, num_keypoints=18):
+    """
+    Convierte los keypoints de la cancha de varios frames (lista de Keypoints de ultralytics
+    o array) en un array (F, K, 2) float32 con la primera detección de cada frame.
+    Los frames sin detección quedan a (0, 0), igual que un keypoint no detectado.
+    """
+    if isinstance(court_keypoints, np.ndarray):
+        return court_keypoints.astype(np.float32, copy=True)
+
+    xy = np.zeros((len(court_keypoints), num_keypoints, 2), dtype=np.float32)
+    for frame_idx, keypoints in enumerate(court_keypoints):
+        if keypoints is None or keypoints.xy is None or len(keypoints.xy) == 0:
+            continue
+        frame_xy = keypoints.xy[0]
+        if hasattr(frame_xy, "cpu"):
+            frame_xy = frame_xy.cpu().numpy()
+        frame_xy = frame_xy[:num_keypoints]
+        xy[frame_idx, :len(frame_xy)] = frame_xy
+
+    return xy
@@ -1,15 +1,80 @@
 from team_assigner import TeamAssigner
 
-def assign_teams(video_frames, tracks):
-    """ Asigna equipos a los jugadores usando KMeans clustering. """
-    team_assigner = TeamAssigner()
-    for i in range(min(len(video_frames), 200)):  # Analizar los primeros 200 frames
-        team_assigner.assign_team_color(video_frames[i], tracks['players'][i])
+# Número de frames iniciales usados para ajustar los colores de los equipos
+TEAM_WARMUP_FRAMES = 200
+# De esos frames se toma uno de cada TEAM_SAMPLE_STRIDE como muestra de colores
+TEAM_SAMPLE_STRIDE = 5
+
+# Frames repartidos por todo el video que se muestrean en el modo por votación
+TEAM_VOTE_SAMPLES = 60
+
+# Modos de asignación: primer color válido de cada pista o votación por pista
+TEAM_MODES = ("first_sighting", "vote")
+
+# Color para jugadores a los que no se ha podido asignar equipo (0)
+UNKNOWN_TEAM_COLOR = (0, 0, 255)
+
+def is_team_sample_frame(frame_idx):
+    return frame_idx < TEAM_WARMUP_FRAMES and frame_idx % TEAM_SAMPLE_STRIDE == 0
+
+def get_team_vote_stride(num_frames, num_samples=TEAM_VOTE_SAMPLES):
+    """ Paso entre frames para tomar unas `num_samples` muestras de todo el video. """
+    return max(1, num_frames // num_samples)
+
+def check_team_mode(team_mode):
+    if team_mode not in TEAM_MODES:
+        raise ValueError(f"Modo de asignación de equipos desconocido: {team_mode}")
+
+def assign_teams(video_frames, tracks, team_mode="first_sighting", team_assigner=None):
+    """
+    Asigna equipos a los jugadores según el color de la camiseta (ver TeamAssigner).
+    Con `team_mode="vote"` se muestrean frames de todo el video y cada pista toma el equipo
+    mayoritario entre sus muestras (las confianzas quedan en `player_team_confidence`).
+    """
+    check_team_mode(team_mode)
+    team_assigner = team_assigner or TeamAssigner()
+    if team_mode == "vote":
+        for i in range(0, len(video_frames), get_team_vote_stride(len(video_frames))):
+            team_assigner.collect_track_colors(video_frames[i], tracks['players'][i])
+        team_assigner.vote_teams()
+    else:
+        for i in range(0, min(len(video_frames), TEAM_WARMUP_FRAMES), TEAM_SAMPLE_STRIDE):
+            team_assigner.assign_team_color(video_frames[i], tracks['players'][i])
 
     for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num], track['bbox'], player_id)
-            tracks['players'][frame_num][player_id]['team'] = team
-            tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
+        assign_teams_frame(team_assigner, video_frames[frame_num], player_track)
             
-    return tracks
\ No newline at end of file
+    return tracks
+
+def assign_teams_frame(team_assigner, frame, player_track):
+    """ Asigna equipo y color a los jugadores de un único frame con un TeamAssigner ya ajustado. """
+    for player_id, team in team_assigner.get_player_teams(frame, player_track).items():
+        player_track[player_id]['team'] = team
+        player_track[player_id]['team_color'] = team_assigner.team_colors.get(team, UNKNOWN_TEAM_COLOR)
+
+def collect_team_colors(team_assigner, frame, frame_idx, player_track, vote_stride=None):
+    """
+    Extrae del frame todo lo que la asignación de equipos necesita, para poder descartarlo
+    a continuación: muestras de colores durante el calentamiento (o, con `vote_stride`, uno
+    de cada `vote_stride` frames para la votación) y primer color de cada jugador.
+    """
+    if vote_stride is not None:
+        if frame_idx % vote_stride == 0:
+            team_assigner.collect_track_colors(frame, player_track)
+    elif is_team_sample_frame(frame_idx):
+        team_assigner.assign_team_color(frame, player_track)
+
+    team_assigner.collect_player_colors(frame, player_track, frame_idx)
+
+def assign_teams_deferred(team_assigner, tracks):
+    """ Asigna equipos a todos los frames a partir de los colores recogidos con collect_team_colors. """
+    if team_assigner.track_colors:
+        team_assigner.vote_teams()
+
+    for frame_num, player_track in enumerate(tracks['players']):
+        for player_id, track in player_track.items():
+            team = team_assigner.get_deferred_player_team(player_id, frame_num)
+            track['team'] = team
+            track['team_color'] = team_assigner.team_colors.get(team, UNKNOWN_TEAM_COLOR)
+
+    return tracks
@@ -0,0 +1,231 @@
+from collections.abc import Mapping, Sequence
+import numpy as np
+
+# Clases de objetos, en el orden de las claves del diccionario `tracks`
+TRACK_CLASSES = ("players", "referees", "ball", "net")
+NO_TEAM = -128  # jugador sin equipo asignado (sin clave "team" en el formato de diccionarios)
+
+TRACK_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("track_id", np.int32),
+    ("cls", np.int8),
+    ("bbox", np.float32, (4,)),       # NaN: pista sin caja ({} en el formato de diccionarios)
+    ("team", np.int8),
+    ("court_xy", np.float64, (2,)),   # NaN: sin posición en la pista táctica
+])
+
+
+class TrackStore:
+    """
+    Pistas de todo el video en una única tabla estructurada de NumPy (una fila por objeto
+    y frame, ordenadas por frame y clase) en lugar de listas de diccionarios anidados.
+    Las cajas se guardan en float32, como las devuelve el modelo, y el color de cada
+    equipo una sola vez en `team_colors`.
+
+    `offsets` indexa las filas de cada (frame, clase): las de la clase `c` en el frame `f`
+    son `rows[offsets[f * C + c]:offsets[f * C + c + 1]]`. `view()` y `court_view()`
+    devuelven vistas de solo lectura con el formato de diccionarios de siempre para los
+    módulos que todavía lo recorren.
+    """
+    def __init__(self, rows, num_frames, team_colors=None):
+        self.rows = rows
+        self.num_frames = num_frames
+        self.team_colors = dict(team_colors or {})
+
+        num_classes = len(TRACK_CLASSES)
+        segment = rows["frame"].astype(np.int64) * num_classes + rows["cls"]
+        counts = np.bincount(segment, minlength=num_frames * num_classes)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def from_tracks(cls, tracks, court_player_positions=None, team_colors=None):
+        """
+        Crea la tabla a partir de `tracks` (formato de Tracker.get_object_tracks, con los equipos
+        ya asignados o no) y, opcionalmente, de las posiciones de Transformer.transform_players.
+        """
+        num_frames = len(tracks["players"])
+        team_colors = dict(team_colors or {})
+        no_bbox = (np.nan,) * 4
+        no_position = (np.nan, np.nan)
+
+        records = []
+        for frame_idx in range(num_frames):
+            court_positions = court_player_positions[frame_idx] if court_player_positions is not None else {}
+            for class_idx, name in enumerate(TRACK_CLASSES):
+                for track_id, info in tracks[name][frame_idx].items():
+                    team = info.get("team", NO_TEAM)
+                    if team != NO_TEAM and "team_color" in info:
+                        team_colors.setdefault(team, info["team_color"])
+                    position = court_positions.get(track_id) if class_idx == 0 else None
+                    records.append((frame_idx, track_id, class_idx, info.get("bbox") or no_bbox, team,
+                                    position["position"] if position else no_position))
+
+        return cls(np.array(records, dtype=TRACK_DTYPE), num_frames, team_colors)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.offsets.nbytes
+
+    def get_rows(self, class_name, frame_idx):
+        segment = frame_idx * len(TRACK_CLASSES) + TRACK_CLASSES.index(class_name)
+        return self.rows[self.offsets[segment]:self.offsets[segment + 1]]
+
+    def get_class_rows(self, class_name):
+        return self.rows[self.rows["cls"] == TRACK_CLASSES.index(class_name)]
+
+    # =======================
+    # ACCESO VECTORIZADO
+    # =======================
+    def dense_boxes(self, class_name):
+        """
+        Cajas de una clase en formato denso y rellenado: ids (F, N), cajas (F, N, 4) y máscara
+        de cajas válidas (F, N). Cada frame conserva el orden de sus pistas.
+        """
+        rows = self.get_class_rows(class_name)
+        frames = rows["frame"].astype(np.int64)
+        counts = np.bincount(frames, minlength=self.num_frames)
+        max_tracks = int(counts.max(initial=0))
+
+        # Posición de cada fila dentro de su frame
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        slots = np.arange(len(rows)) - starts[frames]
+        valid_rows = ~np.isnan(rows["bbox"][:, 0])
+
+        ids = np.full((self.num_frames, max_tracks), -1, dtype=np.int64)
+        boxes = np.zeros((self.num_frames, max_tracks, 4), dtype=np.float64)
+        valid = np.zeros((self.num_frames, max_tracks), dtype=bool)
+        ids[frames[valid_rows], slots[valid_rows]] = rows["track_id"][valid_rows]
+        boxes[frames[valid_rows], slots[valid_rows]] = rows["bbox"][valid_rows]
+        valid[frames[valid_rows], slots[valid_rows]] = True
+        return ids, boxes, valid
+
+    def track_boxes(self, class_name, track_id):
+        """
+        Caja de una pista en cada frame (F, 4) y máscara de frames en los que tiene caja (F,).
+        """
+        rows = self.get_class_rows(class_name)
+        rows = rows[(rows["track_id"] == track_id) & ~np.isnan(rows["bbox"][:, 0])]
+
+        boxes = np.zeros((self.num_frames, 4), dtype=np.float64)
+        present = np.zeros(self.num_frames, dtype=bool)
+        boxes[rows["frame"]] = rows["bbox"]
+        present[rows["frame"]] = True
+        return boxes, present
+
+    # =======================
+    # COMPATIBILIDAD CON EL FORMATO DE DICCIONARIOS
+    # =======================
+    def frame_tracks(self, class_name, frame_idx):
+        """
+        Diccionario {track_id: {"bbox": [...], "team": ..., "team_color": ...}} de un frame.
+        """
+        rows = self.get_rows(class_name, frame_idx)
+        tracks = {}
+        for track_id, bbox, team in zip(rows["track_id"].tolist(), rows["bbox"].tolist(), rows["team"].tolist()):
+            if bbox[0] != bbox[0]:  # NaN
+                tracks[track_id] = {}
+                continue
+            info = {"bbox": bbox}
+            if team != NO_TEAM:
+                info["team"] = team
+                info["team_color"] = self.team_colors[team]
+            tracks[track_id] = info
+        return tracks
+
+    def frame_court_positions(self, frame_idx):
+        """
+        Diccionario {player_id: {"position", "team_color", "team"}} de un frame, como
+        Transformer.transform_players.
+        """
+        rows = self.get_rows("players", frame_idx)
+        positions = {}
+        for track_id, court_xy, team in zip(rows["track_id"].tolist(), rows["court_xy"].tolist(), rows["team"].tolist()):
+            if court_xy[0] != court_xy[0]:  # NaN
+                continue
+            positions[track_id] = {
+                "position": court_xy,
+                "team_color": self.team_colors[team] if team != NO_TEAM else [0, 0, 0],
+                "team": team if team != NO_TEAM else -1,
+            }
+        return positions
+
+    def view(self):
+        return TrackView(self)
+
+    def court_view(self):
+        return FrameSequence(self, self.frame_court_positions)
+
+
+class FrameSequence(Sequence):
+    """
+    Lista de solo lectura con un diccionario por frame, creado al acceder a él.
+    """
+    def __init__(self, store, get_frame):
+        self.store = store
+        self.get_frame = get_frame
+
+    def __len__(self):
+        return self.store.num_frames
+
+    def __getitem__(self, frame_idx):
+        if isinstance(frame_idx, slice):
+            return [self.get_frame(i) for i in range(*frame_idx.indices(len(self)))]
+        if frame_idx < 0:
+            frame_idx += len(self)
+        if not 0 <= frame_idx < len(self):
+            raise IndexError("Frame fuera de rango.")
+        return self.get_frame(frame_idx)
+
+
+class TrackFrames(FrameSequence):
+    """
+    Pistas de una clase (`tracks["players"]`, ...) respaldadas por un TrackStore.
+    """
+    def __init__(self, store, class_name):
+        super().__init__(store, self.get_frame_tracks)
+        self.class_name = class_name
+
+    def get_frame_tracks(self, frame_idx):
+        return self.store.frame_tracks(self.class_name, frame_idx)
+
+    def __reduce__(self):
+        return TrackFrames, (self.store, self.class_name)
+
+
+class TrackView(Mapping):
+    """
+    Vista de solo lectura de un TrackStore con la forma de `tracks`:
+    `view["players"][frame_idx]` es el diccionario de pistas del frame.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.frames = {name: TrackFrames(store, name) for name in TRACK_CLASSES}
+
+    def __getitem__(self, class_name):
+        return self.frames[class_name]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def get_ball_boxes(ball_tracks, num_frames=None):
+    """
+    Caja del balón (ID 1) en cada frame (F, 4) y máscara de frames con balón (F,) a partir
+    de `tracks["ball"]`. Con la vista de un TrackStore se leen directamente de la tabla.
+    """
+    if isinstance(ball_tracks, TrackFrames):
+        boxes, present = ball_tracks.store.track_boxes(ball_tracks.class_name, 1)
+        return boxes[:num_frames], present[:num_frames]
+
+    num_frames = len(ball_tracks) if num_frames is None else num_frames
+    boxes = np.zeros((num_frames, 4), dtype=np.float64)
+    present = np.zeros(num_frames, dtype=bool)
+    for frame_idx in range(num_frames):
+        bbox = ball_tracks[frame_idx].get(1, {}).get("bbox", [])
+        if bbox:
+            boxes[frame_idx] = bbox
+            present[frame_idx] = True
+    return boxes, present
@@ -1,9 +1,19 @@
 import cv2
+import queue
+import subprocess
+import threading
+import time
 from typing import NamedTuple
-from moviepy import ImageSequenceClip
+from imageio_ffmpeg import get_ffmpeg_exe
 import numpy as np
 import json
 
+# Parámetros por defecto del codificador H.264
+DEFAULT_PRESET = "medium"
+DEFAULT_CRF = 23
+DEFAULT_THREADS = 4
+DEFAULT_BITRATE = "1M"
+
 class VideoMetadata(NamedTuple):
     fps: float
     num_frames: int
@@ -24,51 +34,285 @@ def get_metadata(video_path):
     finally:
         vc.release()
 
+class VideoDecoder:
+    """
+    Decodifica un video en un hilo en segundo plano que va llenando una cola acotada de
+    cuadros, de forma que la decodificación se solapa con lo que haga el consumidor
+    (p. ej. la inferencia). Se puede iterar cuadro a cuadro o por bloques con `batches`,
+    y cada iteración vuelve a abrir el video.
+
+    - `start` / `end`: rango de cuadros [start, end) a decodificar.
+    - `stride`: devuelve un cuadro de cada `stride` (los demás solo se avanzan con grab()).
+    - `scale`: factor de reducción aplicado al decodificar (p. ej. 0.5).
+    - `queue_size`: cuadros decodificados que pueden esperar en la cola.
+
+    `get_stats()` devuelve los cuadros decodificados y los FPS de decodificación de la última iteración.
+    """
+    def __init__(self, video_path, start=0, end=None, stride=1, scale=None, queue_size=32):
+        if start < 0 or (end is not None and end < start):
+            raise ValueError("Rango de cuadros no válido.")
+        if stride < 1:
+            raise ValueError("El paso entre cuadros debe ser al menos 1.")
+        if scale is not None and scale <= 0:
+            raise ValueError("El factor de escala debe ser positivo.")
+        if queue_size < 1:
+            raise ValueError("La cola debe admitir al menos un cuadro.")
+
+        self.video_path = video_path
+        self.start = start
+        self.end = end
+        self.stride = stride
+        self.scale = scale
+        self.queue_size = queue_size
+
+        self.num_frames = 0
+        self.decode_seconds = 0.0
+
+    def open(self):
+        """
+        Abre el video situado en `start`. Si el contenedor no permite buscar con precisión
+        se vuelve a abrir y se avanza cuadro a cuadro, lo que funciona con cualquier códec.
+        """
+        cap = cv2.VideoCapture(self.video_path)
+        if self.start == 0:
+            return cap
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == self.start:
+            return cap
+
+        cap.release()
+        cap = cv2.VideoCapture(self.video_path)
+        for _ in range(self.start):
+            if not cap.grab():
+                break
+        return cap
+
+    def decode(self, frames_queue, stop):
+        """
+        Bucle del hilo decodificador. Termina con None en la cola, o con la excepción producida.
+        """
+        cap = None
+        try:
+            start_time = time.perf_counter()
+            cap = self.open()
+            frame_idx = self.start
+            while not stop.is_set() and (self.end is None or frame_idx < self.end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if self.scale is not None and self.scale != 1:
+                    frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+                frame_idx += 1
+
+                # Cuadros intermedios: se avanzan sin convertirlos a BGR
+                skipped = 0
+                while skipped < self.stride - 1 and (self.end is None or frame_idx < self.end) and cap.grab():
+                    skipped += 1
+                    frame_idx += 1
+
+                self.num_frames += 1
+                self.decode_seconds += time.perf_counter() - start_time
+                self.put(frames_queue, frame, stop)
+                start_time = time.perf_counter()
+            self.put(frames_queue, None, stop)
+        except BaseException as e:
+            self.put(frames_queue, e, stop)
+        finally:
+            if cap is not None:
+                cap.release()
+
+    @staticmethod
+    def put(frames_queue, item, stop):
+        # Espera a que haya hueco en la cola salvo que el consumidor haya terminado
+        while not stop.is_set():
+            try:
+                frames_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        self.num_frames = 0
+        self.decode_seconds = 0.0
+
+        frames_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        thread = threading.Thread(target=self.decode, args=(frames_queue, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frames_queue.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def batches(self, batch_size):
+        """
+        Genera listas de como mucho `batch_size` cuadros consecutivos.
+        """
+        if batch_size < 1:
+            raise ValueError("El tamaño de bloque debe ser al menos 1.")
+
+        batch = []
+        for frame in self:
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def get_stats(self):
+        fps = self.num_frames / self.decode_seconds if self.decode_seconds else 0.0
+        return {"frames": self.num_frames, "decode_seconds": round(self.decode_seconds, 3), "decode_fps": round(fps, 1)}
+
+
+def iter_frame_batches(frames, batch_size):
+    """
+    Recorre por bloques una lista de cuadros o un VideoDecoder; con un VideoDecoder el
+    siguiente bloque se decodifica mientras se procesa el actual.
+    """
+    if isinstance(frames, VideoDecoder):
+        yield from frames.batches(batch_size)
+        return
+    for i in range(0, len(frames), batch_size):
+        yield frames[i:i + batch_size]
+
 def read_video(video_path):
     """
     Lee un video y devuelve una lista de cuadros.
     """
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    cap.release()
-    return frames
+    return list(VideoDecoder(video_path))
+
+def read_video_chunks(video_path, chunk_size=64):
+    """
+    Lee un video por bloques y va devolviendo listas de como mucho `chunk_size` cuadros,
+    de forma que nunca hay más de un bloque decodificado en memoria (más la cola del
+    VideoDecoder, que decodifica el siguiente bloque en segundo plano).
+    """
+    return VideoDecoder(video_path, queue_size=chunk_size).batches(chunk_size)
+
+class FFmpegWriter:
+    """
+    Codifica cuadros BGR en H.264 enviándolos directamente a un proceso de FFmpeg por stdin
+    (`-pix_fmt bgr24`), sin conversiones a RGB ni copias intermedias. El video se genera en
+    yuv420p con `+faststart` para que los navegadores lo reproduzcan mientras se descarga.
+    yuv420p necesita ancho y alto pares, así que los cuadros de tamaño impar se rellenan
+    con una fila o columna negra. `threads=0` deja que FFmpeg elija el número de hilos y
+    `bitrate` (None lo omite) se pasa como `-b:v` junto al CRF, igual que con MoviePy.
+    """
+    def __init__(self, output_video_path, width, height, fps=24, preset=DEFAULT_PRESET, crf=DEFAULT_CRF,
+                 threads=DEFAULT_THREADS, bitrate=DEFAULT_BITRATE):
+        self.output_video_path = output_video_path
+        self.width = width
+        self.height = height
+        self.num_frames = 0
+
+        command = [
+            get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "-",
+            "-an",
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-threads", str(threads),
+        ]
+        if bitrate is not None:
+            command += ["-b:v", str(bitrate)]
+        command += ["-pix_fmt", "yuv420p", "-movflags", "+faststart", output_video_path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write_frame(self, frame):
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"Tamaño de cuadro {frame.shape[1]}x{frame.shape[0]} distinto del video "
+                             f"({self.width}x{self.height}).")
+        try:
+            # El buffer se escribe tal cual; solo se copia si el cuadro no es contiguo
+            self.process.stdin.write(memoryview(np.ascontiguousarray(frame, dtype=np.uint8)))
+        except BrokenPipeError:
+            self.close()  # FFmpeg ha terminado antes de tiempo: close() lanza su error
+        self.num_frames += 1
+
+    def close(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        error = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"❌ Error al codificar el video con FFmpeg: {error}")
 
-def save_video(output_video_frames, output_video_path, fps=24):
+    def abort(self):
+        """
+        Corta la codificación sin esperar a FFmpeg (p. ej. si falla quien genera los cuadros).
+        """
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.kill()
+        process.communicate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def save_video(output_video_frames, output_video_path, fps=24, preset=DEFAULT_PRESET, crf=DEFAULT_CRF,
+               threads=DEFAULT_THREADS, bitrate=DEFAULT_BITRATE):
     """
-    Guarda un video en formato H.264 optimizado usando MoviePy para compatibilidad con navegadores.
-    Usa multi-threading y ajustes eficientes para reducir el tiempo de procesamiento.
+    Guarda un video en formato H.264 compatible con navegadores (ver FFmpegWriter).
+    Los cuadros BGR de OpenCV se envían tal cual al codificador, sin copias del video.
     """
     if not output_video_frames:
         raise ValueError("No hay cuadros para guardar.")
 
-    height, width = output_video_frames[0].shape[:2]
-    print(f"Guardando video en formato H.264: {width}x{height} a {fps} FPS.")
+    save_video_stream([output_video_frames], output_video_path, fps=fps, preset=preset, crf=crf, threads=threads,
+                      bitrate=bitrate)
+
+def save_video_stream(frame_chunks, output_video_path, fps=24, preset=DEFAULT_PRESET, crf=DEFAULT_CRF,
+                      threads=DEFAULT_THREADS, bitrate=DEFAULT_BITRATE):
+    """
+    Versión en streaming de save_video: consume bloques de cuadros (BGR) a medida que
+    se generan y los va escribiendo en el codificador, sin acumular el video en memoria.
+    FFmpeg codifica en su propio proceso mientras se producen los siguientes cuadros.
+    Devuelve el número de cuadros escritos.
+    """
+    writer = None
 
     try:
-        # Convertir frames de BGR (OpenCV) a RGB en un solo paso con NumPy
-        video_frames_rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in output_video_frames]
-
-        # Crear clip de video con MoviePy
-        clip = ImageSequenceClip(video_frames_rgb, fps=fps)
-
-        # Guardar en formato H.264 optimizado
-        clip.write_videofile(
-            output_video_path,
-            codec="libx264",
-            audio_codec="aac",
-            preset="medium",  # Cambiado de "slow" a "medium" para más velocidad
-            threads=4,  # Usa 4 hilos para acelerar la codificación
-            ffmpeg_params=["-crf", "23", "-b:v", "1M"]  # Control de calidad y bitrate
-        )
-
-        print(f"✅ Video guardado con éxito en formato compatible: {output_video_path}")
-    except Exception as e:
-        raise RuntimeError(f"❌ Error al guardar el video con MoviePy: {e}")
+        for chunk in frame_chunks:
+            for frame in chunk:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    print(f"Guardando video en formato H.264: {width}x{height} a {fps} FPS.")
+                    writer = FFmpegWriter(output_video_path, width, height, fps=fps,
+                                          preset=preset, crf=crf, threads=threads, bitrate=bitrate)
+                writer.write_frame(frame)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is None:
+        raise ValueError("No hay cuadros para guardar.")
+    writer.close()
+
+    print(f"✅ Video guardado con éxito en formato compatible: {output_video_path}")
+    return writer.num_frames
 
 def save_events(events, output_path):
     # Convertir correctamente los tipos
@@ -30,4 +30,9 @@ class Homography:
         points = cv2.perspectiveTransform(points, self.H)
         return points.reshape(-1,2).astype(np.float32)
 
-
+    def reprojection_error(self, source: np.ndarray, target: np.ndarray) -> float:
+        """
+        Error medio (en píxeles de la pista táctica) al proyectar `source` sobre `target`.
+        """
+        projected = self.transform_points(source.astype(np.float32))
+        return float(np.linalg.norm(projected - target.astype(np.float32), axis=1).mean())
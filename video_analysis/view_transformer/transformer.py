@@ -3,15 +3,14 @@ import sys
 import pathlib
 import numpy as np
 import cv2 
-from copy import deepcopy
 from .homography import Homography
-from utils import measure_distance
+from utils import keypoints_to_array
 
 folder_path = pathlib.Path(__file__).parent.resolve()
 sys.path.append(os.path.join(folder_path, "../"))
 
 class Transformer:
-    def __init__(self, court_pic_path):
+    def __init__(self, court_pic_path, homography_tolerance=0.0):
         self.court_pic_path = court_pic_path
         self.width = 300
         self.height = 161 
@@ -50,99 +49,151 @@ class Transformer:
             (int(((real_width-5.79)/real_width)*self.width),int((10/real_height)*self.height)),
         ]
 
-    def validate_kp(self, kp):
+        # Caché de homografía: se reutiliza la última matriz si los keypoints válidos son
+        # los mismos y ninguno se ha movido más de `homography_tolerance` píxeles
+        self.homography_tolerance = homography_tolerance
+        self.reset_homography_cache()
+
+    def reset_homography_cache(self):
+        self.homography_cache = None
+        self.homography_stats = {"hits": 0, "misses": 0, "failures": 0,
+                                 "reprojection_error_sum": 0.0, "max_reprojection_error": 0.0}
+
+    def get_homography(self, valid_indices, source_points, target_points):
         """
-        Valida los puntos clave detectados comparandolos con los puntos del boceto
+        Devuelve la homografía del frame, reutilizando la de la caché si los keypoints
+        apenas se han movido desde que se calculó. Lanza ValueError si no se puede calcular.
         """
-        kp = deepcopy(kp)
+        cache = self.homography_cache
+        stats = self.homography_stats
+
+        if (cache is not None and cache["indices"] == valid_indices
+                and np.abs(cache["source"] - source_points).max() <= self.homography_tolerance):
+            homography = cache["homography"]
+            stats["hits"] += 1
+        else:
+            try:
+                homography = Homography(source_points, target_points)
+            except (ValueError, cv2.error):
+                stats["failures"] += 1
+                raise
+            self.homography_cache = {"indices": valid_indices, "source": source_points, "homography": homography}
+            stats["misses"] += 1
+
+        error = homography.reprojection_error(source_points, target_points)
+        stats["reprojection_error_sum"] += error
+        stats["max_reprojection_error"] = max(stats["max_reprojection_error"], error)
+        return homography
+
+    def get_homography_stats(self):
+        """
+        Tasa de aciertos de la caché y error de reproyección de los keypoints (píxeles de la pista táctica).
+        """
+        stats = self.homography_stats
+        computed = stats["hits"] + stats["misses"]
+        return {
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "failures": stats["failures"],
+            "hit_rate": stats["hits"] / computed if computed else 0.0,
+            "mean_reprojection_error": stats["reprojection_error_sum"] / computed if computed else 0.0,
+            "max_reprojection_error": stats["max_reprojection_error"],
+        }
 
-        for frame_id, frame_kp in enumerate(kp):
-            frame_kp = frame_kp.xy.tolist()[0]
+    def validate_kp(self, kp):
+        """
+        Valida los puntos clave detectados comparandolos con los puntos del boceto.
 
-            detected_indices = [i for i,kp in enumerate(frame_kp) if kp[0] > 0 and kp[1] > 0]
+        Acepta la lista de Keypoints de ultralytics (o un array (F, K, 2)) y devuelve un
+        array (F, K, 2) float32 con los keypoints inválidos puestos a (0, 0). Se procesan
+        todos los frames a la vez; el único bucle es sobre la posición del keypoint.
+        """
+        xy = keypoints_to_array(kp, len(self.key_points))
+        num_frames, num_kp = xy.shape[:2]
+        if num_frames == 0:
+            return xy
 
-            # Necesitamos al menos 3 puntos detectados para validar
-            if len(detected_indices) < 3:
-                continue
+        points = xy.astype(np.float64)
+        tactical = np.array(self.key_points, dtype=np.float64)[:num_kp]
+        tactical_dist = np.sqrt(((tactical[:, None, :] - tactical[None, :, :]) ** 2).sum(-1))
 
-            invalid_kp = []
-            for i in detected_indices:
-                # Si es el (0,0) pasamos
-                if frame_kp[i][0] == 0 and frame_kp[i][1] == 0:
-                    continue
+        frames = np.arange(num_frames)
+        detected = (points[..., 0] > 0) & (points[..., 1] > 0)
 
-                # Escogemos otros dos de forma aleatoria
-                other_indices = [ii for ii in detected_indices if ii != i and ii not in invalid_kp]
-                if len(other_indices) < 2:
-                    continue
+        # Necesitamos al menos 3 puntos detectados para validar
+        enough = detected.sum(axis=1) >= 3
 
-                j, k = other_indices[0], other_indices[1] #Tomamos los dos primeros por simplicidad
+        # Índices detectados de cada frame en orden ascendente (los no detectados al final)
+        detected_order = np.argsort(~detected, axis=1, kind="stable")
+        invalid = np.zeros_like(detected)
 
-                # Calculamos las distancias entre los detectados
-                d_ij = measure_distance(frame_kp[i], frame_kp[j])
-                d_ik = measure_distance(frame_kp[i], frame_kp[k])
+        for position in range(num_kp):
+            i = detected_order[:, position]
+            active = enough & detected[frames, i]
 
-                # Calculamos las distancias entre los reales
-                t_ij = measure_distance(self.key_points[i], self.key_points[j])
-                t_ik = measure_distance(self.key_points[i], self.key_points[k])
+            # Tomamos los dos primeros detectados que no sean i ni se hayan invalidado
+            candidates = detected & ~invalid
+            candidates[frames, i] = False
+            has_two = candidates.sum(axis=1) >= 2
+            candidate_order = np.argsort(~candidates, axis=1, kind="stable")
+            j, k = candidate_order[:, 0], candidate_order[:, 1]
 
-                # Calculamos las proporciones y comparamos
-                if t_ij > 0 and t_ik > 0:
-                    prop_detected = d_ij / d_ik if d_ik > 0 else float('inf')
-                    prop_tactical = t_ij / t_ik if t_ik > 0 else float('inf')
+            # Distancias entre los detectados y entre los reales
+            d_ij = np.sqrt(((points[frames, i] - points[frames, j]) ** 2).sum(-1))
+            d_ik = np.sqrt(((points[frames, i] - points[frames, k]) ** 2).sum(-1))
+            t_ij = tactical_dist[i, j]
+            t_ik = tactical_dist[i, k]
 
-                    error = (prop_detected - prop_tactical) / prop_tactical
-                    error = abs(error)
+            # Calculamos las proporciones y comparamos
+            with np.errstate(divide="ignore", invalid="ignore"):
+                prop_detected = np.where(d_ik > 0, d_ij / np.where(d_ik > 0, d_ik, 1), np.inf)
+                prop_tactical = t_ij / t_ik
+                error = np.abs((prop_detected - prop_tactical) / prop_tactical)
 
-                    if error >0.8:  # 80% error margin                        
-                        kp[frame_id].xy[0][i] *= 0
-                        kp[frame_id].xyn[0][i] *= 0
-                        invalid_kp.append(i)
+            reject = active & has_two & (t_ij > 0) & (t_ik > 0) & (error > 0.8)  # 80% error margin
+            invalid[frames[reject], i[reject]] = True
 
-        return kp
+        xy[invalid] = 0
+        return xy
 
 
     def transform_players(self, kp, player_tracks):
         """
-        Transforma las coordenadas de los jugadores desde el video a la cancha
+        Transforma las coordenadas de los jugadores desde el video a la cancha.
+        `kp` es el array (F, K, 2) de validate_kp (o una lista de Keypoints de ultralytics).
         """
         court_player_positions = []
+        kp = kp if isinstance(kp, np.ndarray) else keypoints_to_array(kp, len(self.key_points))
+        key_points = np.array(self.key_points, dtype=np.float32)
 
         for frame_id, (frame_kp, frame_tracks) in enumerate(zip(kp,player_tracks)):
             court_positions = {}
 
-            frame_kp = frame_kp.xy.tolist()[0]
-
-            if frame_kp is None or len(frame_kp) == 0:
-                court_player_positions.append(court_positions)
-                continue
-
-            detected_kp = frame_kp
-
-            valid_indices = [i for i,kp in enumerate(detected_kp) if kp[0] > 0 and kp[1] > 0]
+            valid_indices = np.flatnonzero((frame_kp[:, 0] > 0) & (frame_kp[:, 1] > 0))
 
             if len(valid_indices) < 4:
                 court_player_positions.append(court_positions)
                 continue
 
-            source_points = np.array([detected_kp[i] for i in valid_indices], dtype=np.float32)
-            target_points = np.array([self.key_points[i] for i in valid_indices], dtype=np.float32)
+            source_points = frame_kp[valid_indices].astype(np.float32)
+            target_points = key_points[valid_indices]
 
             try:
-                homography = Homography(source_points, target_points)
-
-                for player_id, player_data in frame_tracks.items():
-                    bbox = player_data["bbox"]
-                    player_position = np.array([[bbox[0] + (bbox[2] - bbox[0]) / 2, bbox[3]]])
+                homography = self.get_homography(tuple(valid_indices.tolist()), source_points, target_points)
 
-                    court_position = homography.transform_points(player_position)
+                # Proyectar los pies de todos los jugadores del frame en una sola llamada
+                player_ids = list(frame_tracks.keys())
+                bboxes = np.array([frame_tracks[player_id]["bbox"] for player_id in player_ids], dtype=np.float64).reshape(-1, 4)
+                player_positions = np.stack([bboxes[:, 0] + (bboxes[:, 2] - bboxes[:, 0]) / 2, bboxes[:, 3]], axis=1)
+                court_points = homography.transform_points(player_positions)
 
-                    if court_position[0][0] < 0 or court_position[0][0] > self.width or court_position[0][1] < 0 or court_position[0][1] > self.height:
+                for player_id, court_position in zip(player_ids, court_points):
+                    if court_position[0] < 0 or court_position[0] > self.width or court_position[1] < 0 or court_position[1] > self.height:
                         continue
 
                     team_color = frame_tracks[player_id].get("team_color", [0,0,0])
                     court_positions[player_id] = {
-                        "position": court_position[0].tolist(),
+                        "position": court_position.tolist(),
                         "team_color": team_color,
                         "team": frame_tracks[player_id].get("team", -1)
                     }
@@ -159,58 +210,78 @@ class Transformer:
         """
         Dibuja la cancha y las posiciones de los jugadores.
         """
-        court_image = cv2.imread(court_image_path)
-        court_image = cv2.resize(court_image, (width, height))
+        court_image = self.load_court_image(court_image_path, width, height)
 
         output_video_frames = []
         for frame_idx, frame in enumerate(video_frames):
-            #frame = frame.copy()
-
-            # Posición en la que dibujamos el overlay
-            frame_height, frame_width = frame.shape[:2]
-            gap = 20
-            total_width = width * 2 + gap
-            start_x = (frame_width - total_width) // 2
-
-            x1 = start_x 
-            x2 = x1 + width
-            y2 = frame_height - 40
-            y1 = y2 - height
-            
-            alpha = 0.8  # Transparencia
-            overlay = frame[y1:y2, x1:x2]
-            cv2.addWeighted(court_image, alpha, overlay, 1 - alpha, 0, frame[y1:y2, x1:x2])
-            
-            # Dibujar keypoints de la cancha táctica
-            #for keypoint_index, keypoint in enumerate(tactical_court_keypoints):
-            #    x, y = keypoint
-            #    x += self.start_x
-            #    y += self.start_y
-            #    cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
-            #    cv2.putText(frame, str(keypoint_index), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            
+            frame_positions = None
+            frame_assignments = None
+            player_with_ball = -1
+
             # Mapear posiciones de los jugadores
             if tactical_player_positions and player_assignment and frame_idx < len(tactical_player_positions):
                 frame_positions = tactical_player_positions[frame_idx]
                 frame_assignments = player_assignment[frame_idx] if frame_idx < len(player_assignment) else {}
                 player_with_ball = ball_possession[frame_idx] if ball_possession and frame_idx < len(ball_possession) else -1
-                
-                for player_id, player_data in frame_positions.items():
-                    # Establecer el color según el equipo
-                    x, y = int(player_data["position"][0]) + x1, int(player_data["position"][1]) + y1
-                    color = tuple(map(int, player_data.get("team_color", [0, 0, 0])))
-
-                    # Dibujar círculo en la posición del jugador
-                    cv2.circle(frame, (x, y), 6, color, -1)
-                    
-                    # Mostrar ID del jugador
-                    #cv2.putText(frame, str(player_id), (x-4, y+4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
-                    
-                    # Resaltar jugador con balón
-                    if player_id == player_with_ball:
-                        cv2.circle(frame, (x, y), 8, (0, 0, 255), 2)
-            
+
+            frame = self.draw_court_overlay_frame(frame, court_image, width, height,
+                                                  frame_positions, frame_assignments, player_with_ball)
             output_video_frames.append(frame)
 
         return output_video_frames
-    
\ No newline at end of file
+
+    def load_court_image(self, court_image_path, width, height):
+        """
+        Carga el boceto de la cancha redimensionado al tamaño del overlay.
+        """
+        court_image = cv2.imread(court_image_path)
+        return cv2.resize(court_image, (width, height))
+
+    def draw_court_overlay_frame(self, frame, court_image, width, height, frame_positions=None, frame_assignments=None, player_with_ball=-1):
+        """
+        Dibuja la cancha y las posiciones de los jugadores en un único frame.
+        """
+        #frame = frame.copy()
+
+        # Posición en la que dibujamos el overlay
+        frame_height, frame_width = frame.shape[:2]
+        gap = 20
+        total_width = width * 2 + gap
+        start_x = (frame_width - total_width) // 2
+
+        x1 = start_x 
+        x2 = x1 + width
+        y2 = frame_height - 40
+        y1 = y2 - height
+        
+        alpha = 0.8  # Transparencia
+        overlay = frame[y1:y2, x1:x2]
+        cv2.addWeighted(court_image, alpha, overlay, 1 - alpha, 0, frame[y1:y2, x1:x2])
+        
+        # Dibujar keypoints de la cancha táctica
+        #for keypoint_index, keypoint in enumerate(tactical_court_keypoints):
+        #    x, y = keypoint
+        #    x += self.start_x
+        #    y += self.start_y
+        #    cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
+        #    cv2.putText(frame, str(keypoint_index), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        
+        if frame_positions is None:
+            return frame
+
+        for player_id, player_data in frame_positions.items():
+            # Establecer el color según el equipo
+            x, y = int(player_data["position"][0]) + x1, int(player_data["position"][1]) + y1
+            color = tuple(map(int, player_data.get("team_color", [0, 0, 0])))
+
+            # Dibujar círculo en la posición del jugador
+            cv2.circle(frame, (x, y), 6, color, -1)
+            
+            # Mostrar ID del jugador
+            #cv2.putText(frame, str(player_id), (x-4, y+4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+            
+            # Resaltar jugador con balón
+            if player_id == player_with_ball:
+                cv2.circle(frame, (x, y), 8, (0, 0, 255), 2)
+
+        return frame